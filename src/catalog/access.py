@@ -0,0 +1,52 @@
+"""Access rules of the users to the tools of catalog application"""
+
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+from .fragments import bump_access_versions
+from .models import AgriculturalTool, ToolAccess
+
+
+# Time in seconds during which the tools accessible by a user are kept in cache
+ACCESSIBLE_TOOLS_CACHE_TIMEOUT = 60 * 60
+
+
+def accessible_tools_cache_key(user_id):
+    """Return the cache key of the ids of the tools accessible by a user"""
+    return f"catalog:accessible_tools:{user_id}"
+
+
+def accessible_tools_filter(user):
+    """
+    Return the filter selecting the tools a user can access: the tools the user is in charge of and
+    the tools the user was given access to. The access is checked with an EXISTS subquery rather than
+    a join, so that the tools do not need to be deduplicated.
+    """
+    return Q(user=user) | Exists(ToolAccess.objects.filter(tool=OuterRef("pk"), user=user))
+
+
+def accessible_tool_ids(user):
+    """Return the ids of the tools a user can access, kept in cache until the accesses of the user change"""
+    key = accessible_tools_cache_key(user.pk)
+    tool_ids = cache.get(key)
+    if tool_ids is None:
+        tool_ids = list(AgriculturalTool.objects.filter(accessible_tools_filter(user)).values_list("id", flat=True))
+        cache.set(key, tool_ids, ACCESSIBLE_TOOLS_CACHE_TIMEOUT)
+    return tool_ids
+
+
+async def aaccessible_tool_ids(user):
+    """Async version of accessible_tool_ids"""
+    key = accessible_tools_cache_key(user.pk)
+    tool_ids = await cache.aget(key)
+    if tool_ids is None:
+        queryset = AgriculturalTool.objects.filter(accessible_tools_filter(user)).values_list("id", flat=True)
+        tool_ids = [tool_id async for tool_id in queryset]
+        await cache.aset(key, tool_ids, ACCESSIBLE_TOOLS_CACHE_TIMEOUT)
+    return tool_ids
+
+
+def invalidate_accessible_tools(*user_ids):
+    """Remove from the cache the tools accessible by the given users, and render again their list of tools"""
+    cache.delete_many([accessible_tools_cache_key(user_id) for user_id in user_ids if user_id is not None])
+    bump_access_versions(*user_ids)
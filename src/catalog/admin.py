@@ -1,9 +1,12 @@
 # Register your models here.
 from django.contrib import admin
 
-from .models import AgriculturalTool, BorrowTool, ToolAccess
+from .models import AgriculturalTool, BorrowTool, ExportBatch, ExportJob, MonthlyUsage, ToolAccess
 
 
 admin.site.register(AgriculturalTool)
 admin.site.register(BorrowTool)
 admin.site.register(ToolAccess)
+admin.site.register(ExportJob)
+admin.site.register(MonthlyUsage)
+admin.site.register(ExportBatch)
@@ -0,0 +1,104 @@
+"""Detection of the overlaps and gaps in the hour-meter readings of the borrows"""
+
+from typing import NamedTuple
+
+from django.contrib.auth.models import User
+
+from .exports import display_name
+from .models import AgriculturalTool, BorrowTool
+
+
+# Gap in hours under which two following borrows are considered continuous, to absorb the rounding of readings
+GAP_TOLERANCE = 0.05
+
+# Number of borrows fetched from the database at once while scanning the readings
+SCAN_CHUNK_SIZE = 5000
+
+# Order of the scan, read from the index on tool, start and end times
+SCAN_ORDERING = ("tool_id", "start_time_borrow", "end_time_borrow", "id")
+
+
+class MeterReading(NamedTuple):
+    """Hour-meter range of a borrow"""
+
+    id: int
+    tool_id: int
+    user_id: int
+    date_borrow: object
+    start_time_borrow: float
+    end_time_borrow: float
+
+
+class MeterAnomaly(NamedTuple):
+    """Overlap or gap between the hour-meter ranges of two borrows of a tool"""
+
+    kind: str
+    tool_id: int
+    # the borrow reaching the highest reading before `borrow`, and the borrow itself
+    previous: MeterReading
+    borrow: MeterReading
+    # hours of the overlap or of the gap
+    hours: float
+
+
+OVERLAP = "overlap"
+GAP = "gap"
+
+
+def scan_anomalies(borrows=None, min_gap=GAP_TOLERANCE):
+    """
+    Yield the anomalies of the hour-meter readings of the given borrows, by default all of them.
+
+    The borrows are streamed sorted by tool, start and end time, an order read from the index rather than sorted
+    in memory, and swept in a single pass: each borrow is compared to the one reaching the highest reading
+    before it. A borrow starting before that reading overlaps it, a borrow starting after it leaves a gap.
+    """
+    if borrows is None:
+        borrows = BorrowTool.objects.all()
+    rows = borrows.order_by(*SCAN_ORDERING).values_list(
+        "id", "tool_id", "user_id", "date_borrow", "start_time_borrow", "end_time_borrow"
+    )
+
+    reaching = None
+    for row in rows.iterator(chunk_size=SCAN_CHUNK_SIZE):
+        borrow = MeterReading(*row)
+        if reaching is None or reaching.tool_id != borrow.tool_id:
+            reaching = borrow
+            continue
+
+        if borrow.start_time_borrow < reaching.end_time_borrow:
+            overlap = min(borrow.end_time_borrow, reaching.end_time_borrow) - borrow.start_time_borrow
+            yield MeterAnomaly(OVERLAP, borrow.tool_id, reaching, borrow, overlap)
+        elif borrow.start_time_borrow - reaching.end_time_borrow > min_gap:
+            gap = borrow.start_time_borrow - reaching.end_time_borrow
+            yield MeterAnomaly(GAP, borrow.tool_id, reaching, borrow, gap)
+
+        if borrow.end_time_borrow > reaching.end_time_borrow:
+            reaching = borrow
+
+
+def describe_anomalies(anomalies):
+    """
+    Return the given anomalies as dicts ready to be displayed, with the names of their tools and members
+    read in one query each.
+    """
+    anomalies = list(anomalies)
+    tool_ids = {anomaly.tool_id for anomaly in anomalies}
+    user_ids = {borrow.user_id for anomaly in anomalies for borrow in (anomaly.previous, anomaly.borrow)}
+    tools = dict(AgriculturalTool.objects.filter(id__in=tool_ids).values_list("id", "name"))
+    users = {user.id: display_name(user) for user in User.objects.filter(id__in=user_ids)}
+
+    def describe(borrow):
+        return {**borrow._asdict(), "user": users.get(borrow.user_id, "")}
+
+    return [
+        {
+            "kind": anomaly.kind,
+            "tool_id": anomaly.tool_id,
+            "tool": tools.get(anomaly.tool_id, ""),
+            "previous": describe(anomaly.previous),
+            "borrow": describe(anomaly.borrow),
+            "hours": anomaly.hours,
+        }
+        for anomaly in anomalies
+    ]
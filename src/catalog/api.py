@@ -0,0 +1,186 @@
+"""
+Read-only JSON API of catalog application, for the mobile front-end and the scripts of the farm office.
+
+The clients are authenticated by the session of the site, and only see the tools they can access in the catalog,
+checked against the database on each request. Each response carries an ETag and a Last-Modified date taken from
+the versions of the cached fragments, which change with the data they describe, including the names of the users
+shown, so a client sending them back gets a 304 Not Modified answer without the data being read from the database.
+"""
+
+import functools
+import hashlib
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from cumaweb.mixins import load_user
+
+from .access import accessible_tools_filter
+from .fragments import aread_versions, atool_versions, catalog_version_keys, version_time
+from .images import IMAGE_VARIANTS, variant_url
+from .models import AgriculturalTool, BorrowTool
+from .pagination import HISTORY_PAGE_SIZE, ahistory_page
+
+
+class Validators(NamedTuple):
+    """Validators of a response, compared by the client to the ones of the data it already has"""
+
+    etag: str
+    last_modified: int | None
+
+
+def validators(versions, *parts):
+    """
+    Return the validators of a response built from data with the given versions, and from the other parts of the
+    request changing the response, such as the page asked.
+
+    The last modification date is unknown when one of the versions was made without the time it was made at.
+    """
+    key = " ".join([*versions, *(str(part) for part in parts)])
+    times = [version_time(version) for version in versions]
+    last_modified = None if None in times else max(times, default=None)
+    return Validators(quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()), last_modified)
+
+
+def set_validators(response, response_validators):
+    """Add the validators to a response, which the clients check again before each use of the data"""
+    response.headers["ETag"] = response_validators.etag
+    if response_validators.last_modified is not None:
+        response.headers["Last-Modified"] = http_date(response_validators.last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, response_validators):
+    """Return the 304 Not Modified response when the client already has the data, otherwise None"""
+    response = get_conditional_response(
+        request, etag=response_validators.etag, last_modified=response_validators.last_modified
+    )
+    return set_validators(response, response_validators) if response else None
+
+
+def api_response(data, response_validators):
+    """Return the JSON response of the data, with its validators"""
+    return set_validators(JsonResponse(data), response_validators)
+
+
+def api_error(message, status):
+    """Return the JSON response of an error"""
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_login_required(view):
+    """Decorator answering 401 to the anonymous users, where the pages send them to the login page"""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await load_user(request)
+        if not user.is_authenticated:
+            return api_error("Authentification requise", 401)
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def user_data(user):
+    """Return the JSON data of a user shown with a tool or a borrow"""
+    if user is None:
+        return None
+    return {"id": user.id, "username": user.username, "name": user.get_full_name() or user.username}
+
+
+def tool_data(tool):
+    """Return the JSON data of a tool, with the urls of the resized variants of its image rather than the original"""
+    return {
+        "id": tool.id,
+        "name": tool.name,
+        "description": tool.description,
+        "images": {variant: variant_url(tool.image, variant) for variant in IMAGE_VARIANTS} if tool.image else None,
+        "manager": user_data(tool.user),
+        "meter_reading": tool.meter_reading,
+        "last_borrow_date": tool.last_borrow_date,
+        "url": reverse("catalog:api_tool_detail", kwargs={"tool_id": tool.id}),
+        "borrows_url": reverse("catalog:api_tool_borrows", kwargs={"tool_id": tool.id}),
+    }
+
+
+def borrow_data(borrow):
+    """Return the JSON data of a borrow"""
+    return {
+        "id": borrow.id,
+        "user": user_data(borrow.user),
+        "date_borrow": borrow.date_borrow,
+        "start_time_borrow": borrow.start_time_borrow,
+        "end_time_borrow": borrow.end_time_borrow,
+        "comment": borrow.comment,
+    }
+
+
+async def tool_validators(request, tool_id, *parts):
+    """Return the validators of the data of a tool accessible by the user, or None if the user cannot access it"""
+    if not await AgriculturalTool.objects.filter(accessible_tools_filter(request.user), pk=tool_id).aexists():
+        return None
+    return validators([(await atool_versions([tool_id]))[tool_id]], *parts)
+
+
+@require_safe
+@api_login_required
+async def tool_list(request):
+    """List the tools accessible by the connected user, as the catalog does"""
+    accessible_tools = AgriculturalTool.objects.filter(accessible_tools_filter(request.user))
+    tool_ids = [tool_id async for tool_id in accessible_tools.values_list("id", flat=True).order_by("id")]
+    keys = catalog_version_keys(request.user.id, tool_ids)
+    versions = await aread_versions(keys)
+    response_validators = validators([versions[key] for key in keys])
+    if response := not_modified(request, response_validators):
+        return response
+
+    tools = AgriculturalTool.objects.filter(id__in=tool_ids).select_related("user").order_by("id")
+    return api_response({"tools": [tool_data(tool) async for tool in tools]}, response_validators)
+
+
+@require_safe
+@api_login_required
+async def tool_detail(request, tool_id):
+    """Show a tool accessible by the connected user, with the latest reading of its meter"""
+    response_validators = await tool_validators(request, tool_id)
+    if response_validators is None:
+        return api_error("Outil introuvable", 404)
+    if response := not_modified(request, response_validators):
+        return response
+
+    tool = await AgriculturalTool.objects.select_related("user", "last_borrow_user").filter(pk=tool_id).afirst()
+    if tool is None:
+        return api_error("Outil introuvable", 404)
+    data = tool_data(tool)
+    data["last_borrow_user"] = user_data(tool.last_borrow_user)
+    return api_response(data, response_validators)
+
+
+@require_safe
+@api_login_required
+async def tool_borrows(request, tool_id):
+    """
+    Show a page of the history of the borrows of a tool accessible by the connected user, most recent first.
+
+    The `after` parameter is the cursor of the page, given by the `next` url of the previous page.
+    """
+    cursor = request.GET.get("after", "")
+    response_validators = await tool_validators(request, tool_id, cursor, HISTORY_PAGE_SIZE)
+    if response_validators is None:
+        return api_error("Outil introuvable", 404)
+    if response := not_modified(request, response_validators):
+        return response
+
+    borrows = BorrowTool.objects.filter(tool_id=tool_id).select_related("user")
+    page, next_cursor = await ahistory_page(borrows, cursor, HISTORY_PAGE_SIZE)
+    next_url = None
+    if next_cursor:
+        url = reverse("catalog:api_tool_borrows", kwargs={"tool_id": tool_id})
+        next_url = f"{url}?{urlencode({'after': next_cursor})}"
+    return api_response({"borrows": [borrow_data(borrow) for borrow in page], "next": next_url}, response_validators)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog"
+
+    def ready(self):
+        # Tune the SQLite connections, opened once the applications are ready, register the checks of the
+        # project and connect the signal handlers
+        from cumaweb import checks, sqlite  # noqa: F401
+
+        from . import signals  # noqa: F401
@@ -0,0 +1,444 @@
+"""Helpers used to build the exports of catalog application"""
+
+import csv
+import datetime
+import io
+import json
+import re
+import tempfile
+from collections import Counter
+from wsgiref.util import FileWrapper
+
+import openpyxl
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .models import BorrowTool, ExportBatch
+
+
+EXCEL_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Number of borrows fetched from the database at once while writing an export
+ITERATOR_CHUNK_SIZE = 2000
+
+# Size in bytes of the chunks sent to the client when an export is streamed
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Formats of the exports, and content types of the formats streamed as text
+FORMAT_XLSX = "xlsx"
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+TEXT_CONTENT_TYPES = {
+    FORMAT_CSV: "text/csv; charset=utf-8",
+    FORMAT_JSONL: "application/x-ndjson; charset=utf-8",
+}
+
+# Ways to write the summary of hours per person
+SUMMARY_VALUES = "values"
+SUMMARY_FORMULAS = "formulas"
+
+# Wildcards of the criteria of SUMIFS, and the tilde escaping them, matched as themselves once escaped
+CRITERIA_WILDCARDS_RE = re.compile(r"([~*?])")
+
+# Comparison operators read at the start of a criterion of SUMIFS
+CRITERIA_OPERATORS = ("=", "<", ">")
+
+BORROW_HEADERS = [
+    "Nom Prénom",
+    "Date",
+    "Heure début",
+    "Heure fin",
+    "Durée (heures)",
+    "Nom",
+    "Total Heures par Personne",
+]
+
+
+def display_name(user):
+    """Return the full name of a user, or its username when no name is set"""
+    return user.get_full_name() or user.username
+
+
+def export_filename(tool, extension=FORMAT_XLSX):
+    """Return the name of the file exporting the borrows of a tool"""
+    today = datetime.date.today().strftime("%d_%m_%Y")
+    return f"{tool.name}_{today}.{extension}"
+
+
+def tool_borrows(tool, start_date, end_date):
+    """Return the borrows of a tool between two dates, in the order of the exports"""
+    return BorrowTool.objects.filter(
+        tool=tool,
+        date_borrow__gte=start_date,
+        date_borrow__lte=end_date
+    ).order_by("-date_borrow", "-start_time_borrow")
+
+
+def member_totals(borrows):
+    """
+    Return the hours and number of borrows of each user of the given borrows.
+
+    The totals are computed by the database in a single grouped query, keyed by user id so that two members
+    sharing the same name are not merged. The result maps each user id to a dict with the `name` to display,
+    followed by the username when the name is shared, the summed `hours` and the `count` of borrows.
+    """
+    rows = (
+        borrows.order_by()
+        .values("user_id", "user__username", "user__first_name", "user__last_name")
+        .annotate(hours=Sum(F("end_time_borrow") - F("start_time_borrow")), count=Count("id"))
+    )
+    totals = {}
+    for row in rows:
+        user = User(username=row["user__username"], first_name=row["user__first_name"], last_name=row["user__last_name"])
+        totals[row["user_id"]] = {
+            "name": display_name(user),
+            "username": user.username,
+            "hours": row["hours"],
+            "count": row["count"],
+        }
+
+    names = Counter(total["name"] for total in totals.values())
+    for total in totals.values():
+        if names[total["name"]] > 1:
+            total["name"] = f"{total['name']} ({total['username']})"
+    return dict(sorted(totals.items(), key=lambda item: item[1]["name"]))
+
+
+def sumifs_criterion(text):
+    """
+    Return the formula string of a SUMIFS criterion matching exactly the given text.
+
+    The wildcards are escaped with a tilde, a text starting with a comparison operator is compared with an equal
+    sign, and the quotes are doubled inside the formula string.
+    """
+    criterion = CRITERIA_WILDCARDS_RE.sub(r"~\1", text)
+    if criterion.startswith(CRITERIA_OPERATORS):
+        criterion = f"={criterion}"
+    return '"' + criterion.replace('"', '""') + '"'
+
+
+def member_summary_rows(totals, last_row, summary=SUMMARY_VALUES):
+    """
+    Return the cells of the summary of hours per person, given as (name, hours), written next to a list of
+    borrows ending at `last_row`: either the rounded hours or formulas bounded to the rows of the list.
+    """
+    rows = []
+    for name, hours in totals:
+        if summary == SUMMARY_FORMULAS:
+            value = f"=SUMIFS($E$2:$E${last_row}, $A$2:$A${last_row}, {sumifs_criterion(name)})"
+        else:
+            value = round(hours, 2)
+        rows.append([name, value])
+    return rows
+
+
+def write_borrows_workbook(borrows, summary=SUMMARY_VALUES):
+    """
+    Build a write-only workbook listing the given borrows.
+
+    The borrows are read in a single pass, so the memory used does not depend on the number of rows:
+    openpyxl flushes the rows of a write-only sheet to a temporary file as they are appended.
+    The summary of hours per person is written next to the first rows of the list, either as values
+    computed by the database or, with `summary=SUMMARY_FORMULAS`, as formulas bounded to the written rows.
+    """
+    totals = member_totals(borrows)
+    last_row = sum(total["count"] for total in totals.values()) + 1
+    summary_rows = member_summary_rows(
+        [(total["name"], total["hours"]) for total in totals.values()], last_row, summary
+    )
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(BORROW_HEADERS)
+
+    rows = borrows.values_list("user_id", "date_borrow", "start_time_borrow", "end_time_borrow")
+    for index, (user_id, date_borrow, start_time, end_time) in enumerate(rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE)):
+        row = [
+            totals[user_id]["name"],
+            date_borrow.strftime("%d/%m/%Y"),
+            start_time,
+            end_time,
+            end_time - start_time,
+        ]
+        # Each member appears at least once in the list, so the summary always fits next to it
+        if index < len(summary_rows):
+            row += summary_rows[index]
+        worksheet.append(row)
+
+    return workbook
+
+
+# Characters not allowed in the title of a sheet, and maximal length of the title
+SHEET_TITLE_RE = re.compile(r"[\\/*?:\[\]]")
+SHEET_TITLE_LENGTH = 31
+
+TOOLS_SUMMARY_HEADERS = ["Outil", "Nom Prénom", "Nombre d'emprunts", "Total heures"]
+
+
+def tools_export_filename(extension=FORMAT_XLSX):
+    """Return the name of the file exporting the borrows of several tools"""
+    today = datetime.date.today().strftime("%d_%m_%Y")
+    return f"export_outils_{today}.{extension}"
+
+
+def period_borrows(start_date, end_date, tools=None):
+    """Return the borrows of the given tools, by default all of them, between two dates"""
+    borrows = BorrowTool.objects.filter(date_borrow__gte=start_date, date_borrow__lte=end_date)
+    if tools:
+        borrows = borrows.filter(tool__in=tools)
+    return borrows
+
+
+def record_export(borrows, user, start_date, end_date, pending_only=False):
+    """
+    Record an export batch of the given borrows, and return the batch with the borrows to export, in the order
+    of the given borrows.
+
+    Only the borrows never exported are marked with the batch, so a borrow keeps the batch it was first exported
+    with, and a later or concurrent export never takes rows away from a batch. When `pending_only` is set, the
+    export is limited to the borrows marked by this batch, read back from it: the exported rows are exactly the
+    marked ones, even when borrows are saved while the export is being written.
+    """
+    with transaction.atomic():
+        batch = ExportBatch.objects.create(
+            user=user, start_date=start_date, end_date=end_date, pending_only=pending_only
+        )
+        borrows.filter(export_batch__isnull=True).update(export_batch=batch)
+    if pending_only:
+        return batch, BorrowTool.objects.filter(export_batch=batch).order_by(*borrows.query.order_by)
+    return batch, borrows
+
+
+def cancel_export(batch):
+    """Delete a batch whose export was not delivered, its borrows being again never exported"""
+    batch.delete()
+
+
+def delivered(chunks, batch):
+    """
+    Yield the chunks of a streamed export, and cancel its batch when they are not all sent, because the export
+    failed or the client closed the connection before its end.
+    """
+    sent = False
+    try:
+        yield from chunks
+        sent = True
+    finally:
+        # Close the file or generator of the chunks, as the response would have done
+        if hasattr(chunks, "close"):
+            chunks.close()
+        if not sent:
+            cancel_export(batch)
+
+
+def sheet_title(name, used_titles):
+    """Return a title of sheet valid for Excel and not used yet, built from the given name"""
+    base = SHEET_TITLE_RE.sub("_", name).strip("'") or "Outil"
+    title = base[:SHEET_TITLE_LENGTH]
+    number = 1
+    while title.lower() in used_titles:
+        number += 1
+        suffix = f" ({number})"
+        title = base[: SHEET_TITLE_LENGTH - len(suffix)] + suffix
+    used_titles.add(title.lower())
+    return title
+
+
+def write_tools_workbook(borrows, summary=SUMMARY_VALUES):
+    """
+    Build a write-only workbook listing the given borrows of several tools, with one sheet per tool and
+    a first sheet summarizing the hours of each member on each tool.
+
+    The borrows are read in a single query ordered by tool, with their tool, and each sheet is closed as soon
+    as the borrows of its tool are written, so that the memory used depends neither on the number of borrows
+    nor on the number of tools. The totals are computed beforehand by two grouped queries.
+    """
+    names = {user_id: total["name"] for user_id, total in member_totals(borrows).items()}
+    tool_totals = {}
+    rows = (
+        borrows.order_by()
+        .values("tool_id", "user_id")
+        .annotate(hours=Sum(F("end_time_borrow") - F("start_time_borrow")), count=Count("id"))
+    )
+    for row in rows:
+        tool_totals.setdefault(row["tool_id"], []).append(row)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    used_titles = set()
+    summary_sheet = workbook.create_sheet(sheet_title("Synthèse", used_titles))
+    summary_sheet.append(TOOLS_SUMMARY_HEADERS)
+
+    worksheet = tool = None
+    borrows = borrows.select_related("tool").order_by("tool__name", "tool_id", "-date_borrow", "-start_time_borrow")
+    for borrow in borrows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        if tool is None or borrow.tool_id != tool.id:
+            if worksheet is not None:
+                worksheet.close()
+            tool = borrow.tool
+            totals = sorted(tool_totals[tool.id], key=lambda total: names[total["user_id"]])
+            last_row = sum(total["count"] for total in totals) + 1
+            for total in totals:
+                summary_sheet.append([tool.name, names[total["user_id"]], total["count"], round(total["hours"], 2)])
+            summary_rows = member_summary_rows(
+                [(names[total["user_id"]], total["hours"]) for total in totals], last_row, summary
+            )
+            worksheet = workbook.create_sheet(sheet_title(tool.name, used_titles))
+            worksheet.append(BORROW_HEADERS)
+            index = 0
+
+        row = [
+            names[borrow.user_id],
+            borrow.date_borrow.strftime("%d/%m/%Y"),
+            borrow.start_time_borrow,
+            borrow.end_time_borrow,
+            borrow.end_time_borrow - borrow.start_time_borrow,
+        ]
+        # Each member appears at least once in the list of the tool, so the summary always fits next to it
+        if index < len(summary_rows):
+            row += summary_rows[index]
+        worksheet.append(row)
+        index += 1
+
+    total_count = sum(total["count"] for totals in tool_totals.values() for total in totals)
+    total_hours = sum(total["hours"] for totals in tool_totals.values() for total in totals)
+    summary_sheet.append(["Total", "", total_count, round(total_hours, 2)])
+    return workbook
+
+
+# Columns of the exports streamed as text, read without building the borrows
+TEXT_EXPORT_FIELDS = (
+    "date_borrow",
+    "user__username",
+    "user__first_name",
+    "user__last_name",
+    "start_time_borrow",
+    "end_time_borrow",
+    "comment",
+)
+CSV_HEADERS = ["Date", "Nom Prénom", "Identifiant", "Heure début", "Heure fin", "Durée (heures)", "Commentaire"]
+
+
+def borrow_records(borrows, with_tool=False):
+    """
+    Yield a dict describing each of the given borrows, read by chunks from a single query on the values
+    of the borrows, with the name of their tool when `with_tool` is set.
+    """
+    fields = (("tool__name",) if with_tool else ()) + TEXT_EXPORT_FIELDS
+    for row in borrows.values_list(*fields).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        values = dict(zip(fields, row))
+        start_time, end_time = values["start_time_borrow"], values["end_time_borrow"]
+        record = {"tool": values["tool__name"]} if with_tool else {}
+        record.update({
+            "date": values["date_borrow"].isoformat(),
+            # same name as displayed by the other exports, without building the user
+            "name": f"{values['user__first_name']} {values['user__last_name']}".strip() or values["user__username"],
+            "username": values["user__username"],
+            "start_time": start_time,
+            "end_time": end_time,
+            "hours": round(end_time - start_time, 2),
+            "comment": values["comment"] or "",
+        })
+        yield record
+
+
+def buffered(lines):
+    """
+    Yield the given lines grouped in chunks of about STREAM_CHUNK_SIZE characters. The first line is yielded
+    alone, so that the response starts as soon as it is written: before the query on the borrows is run for the
+    header of a CSV export, with the first chunk of rows fetched for a JSON Lines export.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is not None:
+        yield first
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def csv_lines(records, with_tool=False):
+    """Yield the header then the line of each record of a CSV export, separated by semicolons as read by Excel"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    # The byte order mark lets Excel detect the encoding of the file
+    yield "\ufeff" + line((["Outil"] if with_tool else []) + CSV_HEADERS)
+    for record in records:
+        yield line(
+            ([record["tool"]] if with_tool else [])
+            + [
+                datetime.date.fromisoformat(record["date"]).strftime("%d/%m/%Y"),
+                record["name"],
+                record["username"],
+                record["start_time"],
+                record["end_time"],
+                record["hours"],
+                record["comment"],
+            ]
+        )
+
+
+def jsonl_lines(records):
+    """Yield the JSON object of each record of a JSON Lines export"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def text_export_lines(borrows, export_format, with_tool=False):
+    """Return the generator of the lines exporting the given borrows as CSV or JSON Lines"""
+    records = borrow_records(borrows, with_tool=with_tool)
+    return csv_lines(records, with_tool=with_tool) if export_format == FORMAT_CSV else jsonl_lines(records)
+
+
+def text_export_response(borrows, export_format, filename, with_tool=False, batch=None):
+    """
+    Return a streaming HTTP response exporting the given borrows as CSV or JSON Lines.
+
+    The borrows are read by chunks while the response is sent, so the memory used does not depend
+    on the number of borrows, and the first bytes are sent before the whole result of the query is read.
+    The `batch` of the export, if given, is cancelled when the response is not sent to its end.
+    """
+    chunks = buffered(text_export_lines(borrows, export_format, with_tool=with_tool))
+    if batch is not None:
+        chunks = delivered(chunks, batch)
+    response = StreamingHttpResponse(chunks, content_type=TEXT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def workbook_response(workbook, filename, stream=False, batch=None):
+    """
+    Return an HTTP response sending the given workbook as an attachment.
+
+    When `stream` is set, the workbook is saved to a temporary file which is sent by chunks,
+    instead of building the whole file in the memory of the response. The `batch` of the export, if given,
+    is cancelled when the streamed file is not sent to its end.
+    """
+    if stream:
+        export_file = tempfile.TemporaryFile()
+        workbook.save(export_file)
+        export_file.seek(0)
+        chunks = FileWrapper(export_file, STREAM_CHUNK_SIZE)
+        if batch is not None:
+            chunks = delivered(chunks, batch)
+        response = StreamingHttpResponse(chunks, content_type=EXCEL_CONTENT_TYPE)
+    else:
+        response = HttpResponse(content_type=EXCEL_CONTENT_TYPE)
+        workbook.save(response)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -3,13 +3,26 @@
 import datetime
 
 from django import forms
+from django.db.models import Exists, OuterRef
 from django.forms import ModelForm
-from django.db.models import Max
 
-from .models import BorrowTool, AgriculturalTool, ToolAccess
+from .exports import FORMAT_CSV, FORMAT_JSONL, FORMAT_XLSX, SUMMARY_FORMULAS, SUMMARY_VALUES
+from .models import BorrowTool, AgriculturalTool, MonthlyUsage, ToolAccess
 from django.contrib.auth.models import User
 
 
+def validate_date_borrow(date_borrow):
+    """Check the date of a borrow is not in the future"""
+    if date_borrow > datetime.date.today():
+        raise forms.ValidationError("La date ne peut pas être dans le futur")
+
+
+def validate_borrow_times(start_time_borrow, end_time_borrow):
+    """Check the end time of a borrow is after its start time"""
+    if end_time_borrow <= start_time_borrow:
+        raise forms.ValidationError("L'heure de fin doit être supérieure à l'heure de début")
+
+
 class BorrowToolForm(ModelForm):
     """Form used to create a new borrow entry"""
 
@@ -41,11 +54,8 @@ class BorrowToolForm(ModelForm):
                 # Si l'utilisateur est responsable, il peut voir tous les utilisateurs
                 self.fields['user'].queryset = User.objects.all()
         if self.initial.get("tool"):
-            tool_id = self.initial.get("tool").id
-
-            latest_return = BorrowTool.objects.filter(tool_id=tool_id).aggregate(Max("end_time_borrow"))[
-                "end_time_borrow__max"
-            ]
+            # Reading of the hour-meter stored on the tool at the end of its latest borrow
+            latest_return = self.initial.get("tool").meter_reading
 
             if latest_return:
                 self.fields["start_time_borrow"].widget = forms.NumberInput(
@@ -55,16 +65,14 @@ class BorrowToolForm(ModelForm):
     def clean_date_borrow(self):
         """Validation function for date of borrow"""
         date_borrow = self.cleaned_data["date_borrow"]
-        if date_borrow > datetime.date.today():
-            raise forms.ValidationError("La date ne peut pas être dans le futur")
+        validate_date_borrow(date_borrow)
         return date_borrow
 
     def clean_end_time_borrow(self):
         """Validation function for end time of borrow"""
         start_time_borrow = self.cleaned_data["start_time_borrow"]
         end_time_borrow = self.cleaned_data["end_time_borrow"]
-        if end_time_borrow <= start_time_borrow:
-            raise forms.ValidationError("L'heure de fin doit être supérieure à l'heure de début")
+        validate_borrow_times(start_time_borrow, end_time_borrow)
         return end_time_borrow
 
 
@@ -126,6 +134,36 @@ class DateRangeForm(forms.Form):
         widget=forms.DateInput(attrs={"type": "date"}),
         initial=datetime.date.today()
     )
+    stream = forms.BooleanField(
+        label="Export en flux",
+        required=False,
+        widget=forms.HiddenInput(),
+        help_text="Envoie le fichier par morceaux plutôt que de le construire en mémoire",
+    )
+    format = forms.ChoiceField(
+        label="Format",
+        required=False,
+        choices=[
+            (FORMAT_XLSX, "Excel (.xlsx)"),
+            (FORMAT_CSV, "CSV (.csv)"),
+            (FORMAT_JSONL, "JSON Lines (.jsonl)"),
+        ],
+        initial=FORMAT_XLSX,
+    )
+    pending_only = forms.BooleanField(
+        label="Uniquement les emprunts non exportés",
+        required=False,
+        help_text="Exclut les emprunts déjà inclus dans un export précédent",
+    )
+    summary = forms.ChoiceField(
+        label="Total par personne",
+        required=False,
+        choices=[
+            (SUMMARY_VALUES, "Valeurs calculées"),
+            (SUMMARY_FORMULAS, "Formules Excel"),
+        ],
+        initial=SUMMARY_VALUES,
+    )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -134,5 +172,62 @@ class DateRangeForm(forms.Form):
         
         if start_date and end_date and start_date > end_date:
             raise forms.ValidationError("La date de début ne peut pas être postérieure à la date de fin")
+
+        if not cleaned_data.get("summary"):
+            cleaned_data["summary"] = SUMMARY_VALUES
+        if not cleaned_data.get("format"):
+            cleaned_data["format"] = FORMAT_XLSX
         
         return cleaned_data
+
+
+class ToolsExportForm(DateRangeForm):
+    """Form used to get the tools, start and end date for an export of several tools"""
+    tools = forms.ModelMultipleChoiceField(
+        label="Outils",
+        queryset=AgriculturalTool.objects.order_by("name"),
+        required=False,
+        widget=forms.CheckboxSelectMultiple(),
+        help_text="Tous les outils si aucun n'est coché",
+    )
+
+
+class BorrowImportForm(forms.Form):
+    """Form used to upload a file of borrows to import"""
+    file = forms.FileField(
+        label="Fichier",
+        widget=forms.FileInput(attrs={"accept": ".xlsx, .csv"}),
+        help_text="Fichier Excel (.xlsx) ou CSV avec les colonnes Membre, Date, Heure début, Heure fin et Commentaire",
+    )
+
+    def clean_file(self):
+        """Validation function for the format of the file"""
+        file = self.cleaned_data["file"]
+        if not file.name.lower().endswith((".xlsx", ".csv")):
+            raise forms.ValidationError("Le fichier doit être au format Excel (.xlsx) ou CSV")
+        return file
+
+
+class BorrowHistoryForm(forms.Form):
+    """Form used to filter the history of the borrows of a user by dates and tool"""
+    start_date = forms.DateField(label="Du", required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    end_date = forms.DateField(label="Au", required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    tool = forms.ModelChoiceField(
+        label="Outil", queryset=AgriculturalTool.objects.none(), required=False, empty_label="Tous les outils"
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop("user")
+        super().__init__(*args, **kwargs)
+        # Only the tools borrowed by the user can be chosen, read from the monthly rollups of the user with an
+        # EXISTS subquery rather than a join on the borrows to deduplicate
+        borrowed = Exists(MonthlyUsage.objects.filter(tool=OuterRef("pk"), user=user))
+        self.fields["tool"].queryset = AgriculturalTool.objects.filter(borrowed).order_by("name")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get("start_date")
+        end_date = cleaned_data.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError("La date de début ne peut pas être postérieure à la date de fin")
+        return cleaned_data
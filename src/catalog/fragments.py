@@ -0,0 +1,102 @@
+"""Versions of the fragments of the pages of catalog application kept in cache"""
+
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+
+
+def tool_version_key(tool_id):
+    """Return the cache key of the version of the fragments displaying a tool"""
+    return f"catalog:version:tool:{tool_id}"
+
+
+def access_version_key(user_id):
+    """Return the cache key of the version of the set of tools accessible by a user"""
+    return f"catalog:version:access:{user_id}"
+
+
+def new_version():
+    """
+    Return a version never used before, so that a fragment cached under an evicted version is never read again.
+
+    The version starts with the time it was made at, which is the time the data it versions last changed.
+    """
+    return f"{int(time.time())}-{uuid.uuid4().hex}"
+
+
+def version_time(version):
+    """Return the timestamp a version was made at, or None for a version made without it"""
+    timestamp, separator, _ = version.partition("-")
+    return int(timestamp) if separator and timestamp.isdigit() else None
+
+
+def read_versions(keys):
+    """Return the version stored under each of the given keys, storing a new version for the missing ones"""
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+    return {**versions, **missing}
+
+
+async def aread_versions(keys):
+    """Async version of read_versions"""
+    versions = await cache.aget_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, None)
+    return {**versions, **missing}
+
+
+def versions_by_tool(versions, tool_ids):
+    """Return the version of each of the given tools among the versions read from the cache"""
+    return {tool_id: versions[tool_version_key(tool_id)] for tool_id in tool_ids}
+
+
+def tool_versions(tool_ids):
+    """Return the version of the fragments of each of the given tools, read in a single call to the cache"""
+    return versions_by_tool(read_versions([tool_version_key(tool_id) for tool_id in tool_ids]), tool_ids)
+
+
+async def atool_versions(tool_ids):
+    """Async version of tool_versions"""
+    return versions_by_tool(await aread_versions([tool_version_key(tool_id) for tool_id in tool_ids]), tool_ids)
+
+
+def catalog_version_keys(user_id, tool_ids):
+    """Return the cache keys of the versions of the list of tools accessible by a user"""
+    return [access_version_key(user_id)] + [tool_version_key(tool_id) for tool_id in tool_ids]
+
+
+def list_version(keys, versions):
+    """Return the version of a list of tools, which changes with any of the versions of the given keys"""
+    return hashlib.md5(" ".join(versions[key] for key in keys).encode(), usedforsecurity=False).hexdigest()
+
+
+def catalog_versions(user_id, tool_ids):
+    """
+    Return the version of the fragments of each of the given tools accessible by a user, and the version of the
+    list of these tools, which changes with the access set of the user and with any of the tools.
+    """
+    keys = catalog_version_keys(user_id, tool_ids)
+    versions = read_versions(keys)
+    return versions_by_tool(versions, tool_ids), list_version(keys, versions)
+
+
+async def acatalog_versions(user_id, tool_ids):
+    """Async version of catalog_versions"""
+    keys = catalog_version_keys(user_id, tool_ids)
+    versions = await aread_versions(keys)
+    return versions_by_tool(versions, tool_ids), list_version(keys, versions)
+
+
+def bump_tool_versions(*tool_ids):
+    """Change the version of the fragments of the given tools, so that they are rendered again"""
+    cache.set_many({tool_version_key(tool_id): new_version() for tool_id in tool_ids if tool_id is not None}, None)
+
+
+def bump_access_versions(*user_ids):
+    """Change the version of the access sets of the given users, so that their list of tools is rendered again"""
+    cache.set_many({access_version_key(user_id): new_version() for user_id in user_ids if user_id is not None}, None)
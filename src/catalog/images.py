@@ -0,0 +1,87 @@
+"""Resized variants of the images of the tools, used to serve light images to mobile connections"""
+
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+# Maximum width and height in pixels of each variant of an image
+IMAGE_VARIANTS = {
+    "icon": 160,
+    "card": 640,
+    "full": 1600,
+}
+
+# WebP is much lighter than JPEG for photos, but depends on the libraries Pillow was built with
+if features.check("webp"):
+    VARIANT_FORMAT, VARIANT_EXTENSION = "WEBP", "webp"
+else:
+    VARIANT_FORMAT, VARIANT_EXTENSION = "JPEG", "jpg"
+
+VARIANT_QUALITY = 80
+
+
+def variant_name(image, variant):
+    """Return the storage name of a variant of an image, stored in a `variants` folder next to it"""
+    directory, filename = posixpath.split(image.name)
+    return posixpath.join(directory, "variants", f"{filename}.{variant}.{VARIANT_EXTENSION}")
+
+
+def generate_variants(image, force=False):
+    """
+    Create the missing variants of an image, or all of them with `force`.
+
+    The image is read once and reduced from the largest variant to the smallest one.
+    Return the number of variants created.
+    """
+    storage = image.storage
+    variants = [
+        (variant, size)
+        for variant, size in sorted(IMAGE_VARIANTS.items(), key=lambda item: item[1], reverse=True)
+        if force or not storage.exists(variant_name(image, variant))
+    ]
+    if not variants:
+        return 0
+
+    with image.open("rb") as source, Image.open(source) as original:
+        # Photos taken with phones are often rotated with an EXIF tag rather than in their pixels
+        picture = ImageOps.exif_transpose(original).convert("RGB")
+
+    for variant, size in variants:
+        picture.thumbnail((size, size), Image.Resampling.LANCZOS)
+        content = io.BytesIO()
+        picture.save(content, VARIANT_FORMAT, quality=VARIANT_QUALITY, optimize=True)
+        name = variant_name(image, variant)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content.getvalue()))
+    return len(variants)
+
+
+def variant_url(image, variant):
+    """
+    Return the url of a variant of an image, creating the variants on first use.
+
+    The url of the original image is returned if the variants cannot be created.
+    """
+    if not image:
+        return ""
+    name = variant_name(image, variant)
+    if not image.storage.exists(name) and not create_variants(image):
+        return image.url
+    return image.storage.url(name)
+
+
+def create_variants(image):
+    """Create the missing variants of an image, and return False if the image cannot be read"""
+    try:
+        generate_variants(image)
+    except (OSError, ValueError):
+        logger.warning("Impossible de créer les variantes de l'image %s", image.name, exc_info=True)
+        return False
+    return True
@@ -0,0 +1,272 @@
+"""Import of the borrows of a tool from the files of the paper logbooks"""
+
+import bisect
+import csv
+import datetime
+import io
+import re
+import unicodedata
+import zipfile
+
+import openpyxl
+from django import forms
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .exports import display_name
+from .forms import validate_borrow_times, validate_date_borrow
+from .fragments import bump_tool_versions
+from .models import BorrowTool
+from .rollups import rebuild_rollups
+
+
+# Number of borrows inserted per query
+IMPORT_BATCH_SIZE = 500
+
+# Names accepted for each column, compared without case nor accents
+IMPORT_COLUMNS = {
+    "user": ("membre", "utilisateur", "identifiant", "nom prenom"),
+    "date_borrow": ("date", "date d'emprunt"),
+    "start_time_borrow": ("heure debut", "debut", "compteur debut"),
+    "end_time_borrow": ("heure fin", "fin", "compteur fin"),
+    "comment": ("commentaire",),
+}
+REQUIRED_COLUMNS = ("user", "date_borrow", "start_time_borrow", "end_time_borrow")
+
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%Y")
+
+
+def normalize(value):
+    """Return a text in lower case and without accents, to compare the names written by hand"""
+    text = unicodedata.normalize("NFKD", str(value).strip().lower())
+    return " ".join("".join(char for char in text if not unicodedata.combining(char)).split())
+
+
+def read_rows(file):
+    """
+    Yield the line number and the cells of each row of an uploaded XLSX or CSV file.
+
+    The XLSX files are read with the read-only mode of openpyxl, which streams the rows of the sheet
+    instead of loading the whole workbook.
+    """
+    if file.name.lower().endswith(".xlsx"):
+        try:
+            workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, KeyError, OSError) as error:
+            raise forms.ValidationError("Le fichier Excel ne peut pas être lu") from error
+        try:
+            yield from enumerate(workbook.active.iter_rows(values_only=True), start=1)
+        finally:
+            workbook.close()
+    else:
+        try:
+            text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+            sample = text.read(4096)
+            text.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except UnicodeDecodeError as error:
+            raise forms.ValidationError("Le fichier CSV doit être encodé en UTF-8") from error
+        except csv.Error:
+            dialect = csv.excel
+        try:
+            yield from enumerate(csv.reader(text, dialect), start=1)
+        except UnicodeDecodeError as error:
+            raise forms.ValidationError("Le fichier CSV doit être encodé en UTF-8") from error
+
+
+def header_columns(header):
+    """Return the index of each known column of the header row, checking the required ones are present"""
+    names = {name: field for field, aliases in IMPORT_COLUMNS.items() for name in aliases}
+    columns = {}
+    for index, cell in enumerate(header):
+        field = names.get(normalize(cell)) if cell is not None else None
+        if field and field not in columns:
+            columns[field] = index
+    missing = [IMPORT_COLUMNS[field][0] for field in REQUIRED_COLUMNS if field not in columns]
+    if missing:
+        raise forms.ValidationError(f"Colonnes manquantes dans la première ligne: {', '.join(missing)}")
+    return columns
+
+
+def parse_date(value):
+    """Return the date of a cell, written as a date by Excel or as text"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            continue
+    raise forms.ValidationError(f"Date non valide: {value}")
+
+
+def parse_hours(value):
+    """Return the hour-meter reading of a cell, written as a number by Excel or as text with a comma"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().replace(",", "."))
+    except ValueError:
+        raise forms.ValidationError(f"Compteur non valide: {value}") from None
+
+
+class MemberFinder:
+    """Find the members named in an import, by username or by the full name written in the exports"""
+
+    def __init__(self):
+        self.by_username = {}
+        self.by_name = {}
+        for user in User.objects.only("id", "username", "first_name", "last_name"):
+            self.by_username[normalize(user.username)] = user.id
+            name = normalize(display_name(user))
+            # A name shared by several members cannot be used
+            self.by_name[name] = None if name in self.by_name else user.id
+
+    def find(self, value):
+        """Return the id of the member named by a cell"""
+        text = normalize(value)
+        # The exports append the username to the names shared by several members
+        shared = re.fullmatch(r".*\((.+)\)", text)
+        if shared and shared.group(1) in self.by_username:
+            return self.by_username[shared.group(1)]
+        if text in self.by_username:
+            return self.by_username[text]
+        if self.by_name.get(text):
+            return self.by_name[text]
+        if text in self.by_name:
+            raise forms.ValidationError(f"Plusieurs membres s'appellent {value}, utilisez l'identifiant")
+        raise forms.ValidationError(f"Membre inconnu: {value}")
+
+
+def parse_row(cells, columns, members):
+    """Return the borrow described by the cells of a row, or raise the errors found in the row"""
+    def cell(field):
+        index = columns.get(field)
+        value = cells[index] if index is not None and index < len(cells) else None
+        return None if value is None or str(value).strip() == "" else value
+
+    errors = []
+    values = {}
+    for field, parse in [
+        ("user", members.find),
+        ("date_borrow", parse_date),
+        ("start_time_borrow", parse_hours),
+        ("end_time_borrow", parse_hours),
+    ]:
+        value = cell(field)
+        if value is None:
+            errors.append(f"Colonne {IMPORT_COLUMNS[field][0]} vide")
+            continue
+        try:
+            values[field] = parse(value)
+        except forms.ValidationError as error:
+            errors.extend(error.messages)
+
+    # Same rules as the form of a borrow
+    for validate, fields in [
+        (validate_date_borrow, ["date_borrow"]),
+        (validate_borrow_times, ["start_time_borrow", "end_time_borrow"]),
+    ]:
+        if all(field in values for field in fields):
+            try:
+                validate(*(values[field] for field in fields))
+            except forms.ValidationError as error:
+                errors.extend(error.messages)
+    if errors:
+        raise forms.ValidationError(errors)
+
+    comment = cell("comment")
+    return BorrowTool(
+        user_id=values["user"],
+        date_borrow=values["date_borrow"],
+        start_time_borrow=values["start_time_borrow"],
+        end_time_borrow=values["end_time_borrow"],
+        comment=str(comment) if comment is not None else None,
+    )
+
+
+def check_meter_continuity(tool, borrows):
+    """
+    Return the errors of the borrows, given by line number, whose hour-meter readings overlap an existing borrow
+    of the tool or another borrow of the import.
+
+    The existing borrows are read in one query limited to the readings of the import, and each reading is
+    checked with a binary search on the existing borrows sorted by start time.
+    """
+    if not borrows:
+        return {}
+    lowest = min(borrow.start_time_borrow for borrow in borrows.values())
+    highest = max(borrow.end_time_borrow for borrow in borrows.values())
+    existing = list(
+        BorrowTool.objects.filter(tool=tool, end_time_borrow__gt=lowest, start_time_borrow__lt=highest)
+        .order_by("start_time_borrow")
+        .values_list("start_time_borrow", "end_time_borrow", "date_borrow")
+    )
+    starts = [start for start, _, _ in existing]
+    # Existing borrow reaching the highest reading among the ones starting before each position
+    reaching = []
+    for borrow in existing:
+        reaching.append(borrow if not reaching or borrow[1] > reaching[-1][1] else reaching[-1])
+
+    errors = {}
+    previous_line, previous = None, None
+    for line, borrow in sorted(borrows.items(), key=lambda item: (item[1].start_time_borrow, item[0])):
+        position = bisect.bisect_left(starts, borrow.end_time_borrow)
+        if position and reaching[position - 1][1] > borrow.start_time_borrow:
+            start, end, date_borrow = reaching[position - 1]
+            errors[line] = (
+                f"Le compteur ({borrow.start_time_borrow} - {borrow.end_time_borrow}) chevauche l'emprunt "
+                f"existant du {date_borrow:%d/%m/%Y} ({start} - {end})"
+            )
+        elif previous is not None and previous.end_time_borrow > borrow.start_time_borrow:
+            errors[line] = (
+                f"Le compteur ({borrow.start_time_borrow} - {borrow.end_time_borrow}) chevauche la ligne "
+                f"{previous_line} ({previous.start_time_borrow} - {previous.end_time_borrow})"
+            )
+        elif previous is None or borrow.end_time_borrow > previous.end_time_borrow:
+            # Only the rows which are imported are compared to the next ones
+            previous_line, previous = line, borrow
+    return errors
+
+
+def import_borrows(tool, file, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import the borrows of a tool from an uploaded XLSX or CSV file, and return the number of borrows created
+    and the errors of each invalid row, as a dict mapping the line number to its messages.
+
+    All the rows are validated before the valid ones are inserted in batches, in a single transaction
+    also updating the meter reading and the monthly rollups of the tool.
+    """
+    rows = read_rows(file)
+    header = next((cells for _, cells in rows if any(cell not in (None, "") for cell in cells)), None)
+    if header is None:
+        raise forms.ValidationError("Le fichier est vide")
+    columns = header_columns(header)
+
+    members = MemberFinder()
+    borrows = {}
+    errors = {}
+    for line, cells in rows:
+        if all(cell is None or str(cell).strip() == "" for cell in cells):
+            continue
+        try:
+            borrows[line] = parse_row(cells, columns, members)
+        except forms.ValidationError as error:
+            errors[line] = error.messages
+
+    for line, message in check_meter_continuity(tool, borrows).items():
+        errors[line] = [message]
+        del borrows[line]
+
+    if borrows:
+        with transaction.atomic():
+            for borrow in borrows.values():
+                borrow.tool = tool
+            BorrowTool.objects.bulk_create(borrows.values(), batch_size=batch_size)
+            # The signals are not sent by the inserts in bulk
+            tool.update_meter_reading()
+            rebuild_rollups([tool.id])
+        bump_tool_versions(tool.id)
+    return len(borrows), dict(sorted(errors.items()))
@@ -0,0 +1,104 @@
+"""Background processing of the export jobs of catalog application"""
+
+import datetime
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .exports import (
+    FORMAT_XLSX,
+    cancel_export,
+    export_filename,
+    record_export,
+    text_export_lines,
+    tool_borrows,
+    write_borrows_workbook,
+)
+from .models import ExportJob
+
+
+def active_jobs_count(user):
+    """Return the number of export jobs of a user waiting for or being processed by the worker"""
+    return ExportJob.objects.filter(user=user, status__in=[ExportJob.Status.PENDING, ExportJob.Status.RUNNING]).count()
+
+
+def can_create_job(user):
+    """Tell if a user can ask for a new export job without exceeding the limit of active jobs"""
+    return active_jobs_count(user) < settings.EXPORT_JOBS_MAX_ACTIVE_PER_USER
+
+
+def claim_next_job():
+    """
+    Mark the oldest pending job as running and return it, or None if there is no pending job.
+
+    The job is claimed with a conditional update, so that two workers never process the same job.
+    """
+    while True:
+        job = ExportJob.objects.filter(status=ExportJob.Status.PENDING).order_by("created_at", "id").first()
+        if job is None:
+            return None
+        claimed = ExportJob.objects.filter(pk=job.pk, status=ExportJob.Status.PENDING).update(
+            status=ExportJob.Status.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Build the workbook of a running job and store it, or store the error that prevented it"""
+    batch = None
+    try:
+        batch, borrows = record_export(
+            tool_borrows(job.tool_id, job.start_date, job.end_date),
+            job.user,
+            job.start_date,
+            job.end_date,
+            pending_only=job.pending_only,
+        )
+        job.filename = export_filename(job.tool, job.format)
+        with tempfile.TemporaryFile() as export_file:
+            if job.format == FORMAT_XLSX:
+                write_borrows_workbook(borrows, summary=job.summary).save(export_file)
+            else:
+                for line in text_export_lines(borrows, job.format):
+                    export_file.write(line.encode())
+            export_file.seek(0)
+            job.file.save(f"{job.pk}_{job.filename}", File(export_file), save=False)
+        job.status = ExportJob.Status.DONE
+    except Exception as error:  # the error is reported to the user instead of stopping the worker
+        if batch is not None:
+            # Nothing was delivered, so the borrows are not marked as exported
+            cancel_export(batch)
+        job.status = ExportJob.Status.FAILED
+        job.error = str(error) or error.__class__.__name__
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "filename", "status", "error", "finished_at"])
+    return job
+
+
+def cleanup_jobs(now=None):
+    """
+    Delete the finished jobs older than the retention period with their file, and mark as failed
+    the jobs running for longer than the timeout, left by a stopped worker.
+
+    Return the number of deleted jobs.
+    """
+    now = now or timezone.now()
+    ExportJob.objects.filter(
+        status=ExportJob.Status.RUNNING,
+        started_at__lt=now - datetime.timedelta(seconds=settings.EXPORT_JOBS_TIMEOUT),
+    ).update(status=ExportJob.Status.FAILED, error="Export interrompu", finished_at=now)
+
+    expired = ExportJob.objects.filter(
+        status__in=[ExportJob.Status.DONE, ExportJob.Status.FAILED],
+        created_at__lt=now - datetime.timedelta(days=settings.EXPORT_JOBS_RETENTION_DAYS),
+    )
+    count = 0
+    for job in expired.iterator():
+        # the file is removed by the post_delete signal
+        job.delete()
+        count += 1
+    return count
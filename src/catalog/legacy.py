@@ -0,0 +1,89 @@
+"""Reading of the MariaDB dump of the PHP version of the application"""
+
+import re
+
+
+# Start of an INSERT statement, with the table, its columns and the beginning of its values
+INSERT_RE = re.compile(r"INSERT INTO `(?P<table>\w+)` \((?P<columns>[^)]*)\) VALUES(?P<values>.*)$", re.DOTALL)
+
+# Tokens of the values of an INSERT statement: quoted string, NULL, number, or punctuation
+TOKEN_RE = re.compile(
+    r"\s*(?:'(?P<string>(?:[^'\\]|\\.|'')*)'"
+    r"|(?P<null>NULL)"
+    r"|(?P<number>[-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"
+    r"|(?P<punctuation>[(),;]))"
+)
+
+# End of a line without any other value
+BLANK_RE = re.compile(r"\s*$")
+
+# Escape sequences of the MySQL strings
+ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+ESCAPE_RE = re.compile(r"\\(.)|''", re.DOTALL)
+
+
+class DumpError(ValueError):
+    """Error raised when the dump cannot be parsed"""
+
+
+def unescape(value):
+    """Return the text of a quoted MySQL string"""
+    return ESCAPE_RE.sub(lambda match: ESCAPES.get(match.group(1), match.group(1)) if match.group(1) else "'", value)
+
+
+def parse_number(value):
+    """Return the int or float written in the dump"""
+    return float(value) if any(char in value for char in ".eE") else int(value)
+
+
+def iter_rows(lines, tables=None):
+    """
+    Yield the table and the row, as a dict keyed by column, of each tuple inserted by the given lines of a dump.
+
+    The lines are read one at a time, so the whole dump is never loaded: the rows of an INSERT statement
+    are parsed as they come, whether the statement is written on one line or on one line per row.
+    Only the rows of the given tables are yielded, by default the rows of all the tables.
+    """
+    table = columns = None
+    row = None
+    for number, line in enumerate(lines, start=1):
+        if table is None:
+            match = INSERT_RE.match(line)
+            if match is None:
+                continue
+            table = match.group("table")
+            columns = [column.strip().strip("`") for column in match.group("columns").split(",")]
+            text = match.group("values")
+        else:
+            text = line
+
+        position = 0
+        text = text.rstrip("\r\n")
+        while position < len(text) and table is not None:
+            token = TOKEN_RE.match(text, position)
+            if token is None:
+                if BLANK_RE.match(text, position):
+                    break
+                raise DumpError(f"Ligne {number}: valeur non reconnue dans la table {table}")
+            position = token.end()
+            punctuation = token.group("punctuation")
+            if punctuation == "(":
+                row = []
+            elif punctuation == ")":
+                if row is None or len(row) != len(columns):
+                    raise DumpError(f"Ligne {number}: la ligne ne compte pas {len(columns)} valeurs")
+                if tables is None or table in tables:
+                    yield table, dict(zip(columns, row))
+                row = None
+            elif punctuation == ";":
+                table = None
+            elif punctuation == ",":
+                continue
+            elif row is None:
+                raise DumpError(f"Ligne {number}: valeur en dehors d'une ligne de la table {table}")
+            elif token.group("string") is not None:
+                row.append(unescape(token.group("string")))
+            elif token.group("null"):
+                row.append(None)
+            else:
+                row.append(parse_number(token.group("number")))
@@ -0,0 +1,203 @@
+"""Command measuring the time, queries and memory of the main pages on the current database"""
+
+import contextlib
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from catalog.models import AgriculturalTool, BorrowTool
+
+
+def consume(response):
+    """Read the whole content of a response, streamed or not, and return its size in bytes"""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+@contextlib.contextmanager
+def rolled_back():
+    """
+    Run a block in a transaction rolled back at its end, so that the scenarios writing data, such as the export
+    marking the exported borrows, leave the database unchanged and do the same work at each run.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries, unaffected by the reset of the queries at each request"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def current_commit():
+    """Return the git commit of the working directory, or None outside of a repository"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le temps, le nombre de requêtes SQL et la mémoire des pages principales sur la base actuelle, "
+        "par exemple remplie avec seed_benchmark_data, et enregistre les résultats en JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", default="bench_manager", help="Membre connecté pendant les mesures")
+        parser.add_argument("--tool", type=int, help="Outil mesuré (par défaut le premier outil du membre)")
+        parser.add_argument("--repeat", type=int, default=5, help="Nombre de mesures du temps de chaque scénario")
+        parser.add_argument("--export-days", type=int, default=3650, help="Nombre de jours exportés")
+        parser.add_argument("--scenario", action="append", help="Scénario à mesurer (par défaut tous)")
+        parser.add_argument("--output", help="Fichier JSON des résultats (par défaut benchmark-<commit>.json)")
+        parser.add_argument("--compare", help="Fichier JSON de résultats précédents à comparer")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Le membre '{options['username']}' n'existe pas, lancez d'abord seed_benchmark_data")
+        tool = AgriculturalTool.objects.filter(user=user).order_by("id").first()
+        if options["tool"]:
+            tool = AgriculturalTool.objects.get(pk=options["tool"])
+        if tool is None:
+            raise CommandError("Aucun outil à mesurer, précisez --tool")
+
+        scenarios = self.scenarios(tool, options["export_days"])
+        if options["scenario"]:
+            unknown = set(options["scenario"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Scénarios inconnus: {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options["scenario"]}
+
+        client = Client()
+        client.force_login(user)
+
+        results = {
+            "commit": current_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": {
+                "vendor": connection.vendor,
+                "users": User.objects.count(),
+                "tools": AgriculturalTool.objects.count(),
+                "borrows": BorrowTool.objects.count(),
+                "tool_borrows": BorrowTool.objects.filter(tool=tool).count(),
+            },
+            "scenarios": {},
+        }
+        # The host of the test client is only allowed by the settings of the test runner
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name, request in scenarios.items():
+                results["scenarios"][name] = self.measure(client, request, options["repeat"])
+                self.report(name, results["scenarios"][name])
+
+        output = options["output"] or f"benchmark-{results['commit'] or 'local'}.json"
+        with open(output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Résultats enregistrés dans {output}"))
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as previous_file:
+                self.compare(json.load(previous_file), results)
+
+    def scenarios(self, tool, export_days):
+        """Return the function requesting each measured page with the client"""
+        today = datetime.date.today()
+        export_data = {
+            "start_date": (today - datetime.timedelta(days=export_days)).strftime("%Y-%m-%d"),
+            "end_date": today.strftime("%Y-%m-%d"),
+            "stream": "1",
+        }
+        return {
+            "tool_list": lambda client: client.get(reverse("catalog:index")),
+            "tool_detail": lambda client: client.get(reverse("catalog:tool_detail", kwargs={"pk": tool.id})),
+            "borrow_form": lambda client: client.get(reverse("catalog:borrow_tool", kwargs={"tool_id": tool.id})),
+            "export": lambda client: client.post(
+                reverse("catalog:export_tool", kwargs={"tool_id": tool.id}), export_data
+            ),
+            "tool_usage": lambda client: client.get(reverse("catalog:tool_usage", kwargs={"tool_id": tool.id})),
+            "user_list": lambda client: client.get(reverse("users:listUser")),
+        }
+
+    def measure(self, client, request, repeat):
+        """
+        Run a scenario `repeat` times to measure its time and queries, then once more to measure its peak of
+        memory: tracing the allocations slows the code down too much to be done while timing it.
+        """
+        durations = []
+        for _ in range(repeat):
+            queries = QueryCounter()
+            with rolled_back(), connection.execute_wrapper(queries):
+                start = time.perf_counter()
+                response = request(client)
+                size = consume(response)
+                durations.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise CommandError(f"Réponse {response.status_code} pendant les mesures")
+
+        tracemalloc.start()
+        with rolled_back():
+            consume(request(client))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            "status": response.status_code,
+            "size_bytes": size,
+            "queries": queries.count,
+            "wall_time_ms": {
+                "min": round(min(durations) * 1000, 2),
+                "median": round(statistics.median(durations) * 1000, 2),
+                "max": round(max(durations) * 1000, 2),
+            },
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+    def report(self, name, result):
+        """Write the measures of a scenario"""
+        self.stdout.write(
+            f"{name:<12} {result['wall_time_ms']['median']:>10.1f} ms  {result['queries']:>4} requêtes  "
+            f"{result['peak_memory_kb']:>10.1f} Ko"
+        )
+
+    def compare(self, previous, current):
+        """Write the relative change of each measure from previous results"""
+        self.stdout.write(f"Comparaison avec {previous.get('commit')} ({previous.get('date')})")
+        for name, result in current["scenarios"].items():
+            before = previous.get("scenarios", {}).get(name)
+            if before is None:
+                continue
+            changes = []
+            for label, old, new in [
+                ("temps", before["wall_time_ms"]["median"], result["wall_time_ms"]["median"]),
+                ("requêtes", before["queries"], result["queries"]),
+                ("mémoire", before["peak_memory_kb"], result["peak_memory_kb"]),
+            ]:
+                change = (new - old) / old * 100 if old else 0
+                changes.append(f"{label} {change:+.0f}%")
+            self.stdout.write(f"{name:<12} {', '.join(changes)}")
@@ -0,0 +1,164 @@
+"""Command comparing the latency of the read-heavy pages requested at the same time, served by WSGI and by ASGI"""
+
+import importlib.util
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.test import Client
+from django.urls import reverse
+
+from catalog.models import AgriculturalTool
+
+
+# Command starting each server on a local port, from the directory of manage.py. The WSGI server is the threaded
+# server of runserver, the ASGI server is uvicorn, installed apart as the application does not need it.
+SERVERS = {
+    "wsgi": [sys.executable, "manage.py", "runserver", "--noreload", "--skip-checks", "127.0.0.1:{port}"],
+    "asgi": [
+        sys.executable, "-m", "uvicorn", "cumaweb.asgi:application", "--port", "{port}", "--log-level", "warning",
+        "--no-access-log",
+    ],
+}
+
+# Pages requested, served by the async views
+ROUTES = {
+    "index": lambda tool: reverse("catalog:index"),
+    "tool_detail": lambda tool: reverse("catalog:tool_detail", kwargs={"pk": tool.id}),
+    "tool_access_list": lambda tool: reverse("catalog:tool_access_list", kwargs={"tool_id": tool.id}),
+    "user_list": lambda tool: reverse("users:listUser"),
+}
+
+# Time in seconds given to a server to start listening
+STARTUP_TIMEOUT = 30
+
+
+def wait_for_port(port, process, timeout=STARTUP_TIMEOUT):
+    """Wait until a server listens on a local port, and return False if it stopped or did not start in time"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def fetch(url, cookie):
+    """Request a page with the session cookie, and return its status code and the time it took"""
+    request = urllib.request.Request(url, headers={"Cookie": cookie})
+    begin = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - begin
+
+
+class Command(BaseCommand):
+    help = (
+        "Démarre l'application sur un port local derrière un serveur WSGI (runserver) puis derrière un serveur ASGI "
+        "(uvicorn, à installer à part), envoie en parallèle des requêtes aux pages du catalogue et de la liste des "
+        "utilisateurs, et affiche la latence médiane et p95 de chaque page pour chaque serveur."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=20, help="Nombre de requêtes envoyées en même temps")
+        parser.add_argument("--requests", type=int, default=200, help="Nombre de requêtes envoyées à chaque page")
+        parser.add_argument("--port", type=int, default=8765, help="Port local des serveurs")
+        parser.add_argument(
+            "--server", choices=sorted(SERVERS), action="append", help="Serveur mesuré (par défaut les deux)"
+        )
+        parser.add_argument(
+            "--route", choices=sorted(ROUTES), action="append", help="Page mesurée (par défaut toutes)"
+        )
+        parser.add_argument("--username", help="Utilisateur connecté, administrateur (par défaut le premier)")
+
+    def handle(self, *args, **options):
+        servers = options["server"] or list(SERVERS)
+        if "asgi" in servers and importlib.util.find_spec("uvicorn") is None:
+            raise CommandError("Le serveur ASGI demande uvicorn: pip install uvicorn")
+
+        users = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True)).order_by("id")
+        if options["username"]:
+            users = User.objects.filter(username=options["username"])
+        user = users.first()
+        if user is None:
+            raise CommandError("Aucun utilisateur administrateur pour se connecter")
+        tool = AgriculturalTool.objects.filter(user=user).order_by("id").first() or AgriculturalTool.objects.first()
+        if tool is None:
+            raise CommandError("Aucun outil dans la base")
+
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        paths = {name: ROUTES[name](tool) for name in options["route"] or list(ROUTES)}
+
+        for server in servers:
+            for name, outcome in self.run_server(server, options["port"], paths, cookie, options).items():
+                self.report(server, name, outcome)
+
+    def run_server(self, server, port, paths, cookie, options):
+        """Start a server, request each page under load, stop the server and return the outcome of each page"""
+        command = [part.format(port=port) for part in SERVERS[server]]
+        # The log of the server goes to a file rather than a pipe, which would block the server once full
+        log = tempfile.TemporaryFile(mode="w+")
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            if not wait_for_port(port, process):
+                process.kill()
+                process.wait()
+                log.seek(0)
+                raise CommandError(f"Le serveur {server} n'a pas démarré: {log.read().strip()}")
+            outcomes = {}
+            for name, path in paths.items():
+                url = f"http://127.0.0.1:{port}{path}"
+                # The first requests fill the caches of the server, and are not measured
+                fetch(url, cookie)
+                outcomes[name] = self.load(url, cookie, options["concurrency"], options["requests"])
+            return outcomes
+        finally:
+            process.terminate()
+            process.wait()
+            log.close()
+
+    def load(self, url, cookie, concurrency, requests):
+        """Request a page `requests` times, `concurrency` at the same time, and return the latencies and errors"""
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: fetch(url, cookie), range(requests)))
+        elapsed = time.perf_counter() - begin
+        durations = sorted(duration for status, duration in results)
+        return {
+            "requests": len(results),
+            "errors": sum(status != 200 for status, _ in results),
+            "elapsed": elapsed,
+            "median_ms": statistics.median(durations) * 1000,
+            "p95_ms": durations[int(len(durations) * 0.95) - 1] * 1000,
+        }
+
+    def report(self, server, name, outcome):
+        """Write the throughput, latencies and errors of a page served by a server"""
+        throughput = outcome["requests"] / outcome["elapsed"] if outcome["elapsed"] else 0
+        self.stdout.write(
+            f"{server.upper():<5} {name:<17} {outcome['requests']:>5} requêtes en {outcome['elapsed']:.1f} s "
+            f"({throughput:.1f}/s): {outcome['median_ms']:.0f} ms médian, {outcome['p95_ms']:.0f} ms p95, "
+            f"{outcome['errors']} erreurs"
+        )
@@ -0,0 +1,59 @@
+"""Command listing the overlaps and gaps of the hour-meter readings of the borrows"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.anomalies import GAP, GAP_TOLERANCE, OVERLAP, scan_anomalies
+from catalog.models import BorrowTool
+
+
+class Command(BaseCommand):
+    help = "Liste les emprunts dont les heures du compteur se chevauchent ou laissent un trou, outil par outil"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tool_ids", nargs="*", type=int, help="Identifiants des outils (par défaut tous)")
+        parser.add_argument(
+            "--min-gap",
+            type=float,
+            default=GAP_TOLERANCE,
+            help="Nombre d'heures au-delà duquel un écart entre deux emprunts est un trou",
+        )
+        parser.add_argument("--no-gaps", action="store_true", help="Ne liste que les chevauchements")
+        parser.add_argument("--summary", action="store_true", help="N'affiche que le nombre d'anomalies par outil")
+
+    def handle(self, *args, **options):
+        borrows = BorrowTool.objects.all()
+        if options["tool_ids"]:
+            borrows = borrows.filter(tool_id__in=options["tool_ids"])
+
+        start = time.monotonic()
+        counts = {}
+        for anomaly in scan_anomalies(borrows, min_gap=options["min_gap"]):
+            if options["no_gaps"] and anomaly.kind == GAP:
+                continue
+            tool_counts = counts.setdefault(anomaly.tool_id, {OVERLAP: 0, GAP: 0})
+            tool_counts[anomaly.kind] += 1
+            if not options["summary"]:
+                self.stdout.write(self.format_anomaly(anomaly))
+        duration = time.monotonic() - start
+
+        for tool_id, tool_counts in sorted(counts.items()):
+            self.stdout.write(
+                f"Outil {tool_id}: {tool_counts[OVERLAP]} chevauchement(s), {tool_counts[GAP]} trou(s)"
+            )
+        total = sum(sum(tool_counts.values()) for tool_counts in counts.values())
+        message = f"{total} anomalie(s) sur {len(counts)} outil(s), trouvée(s) en {duration:.1f} s"
+        self.stdout.write(self.style.WARNING(message) if total else self.style.SUCCESS(message))
+
+    @staticmethod
+    def format_anomaly(anomaly):
+        """Return a line describing an anomaly"""
+        previous, borrow = anomaly.previous, anomaly.borrow
+        kind = "chevauchement" if anomaly.kind == OVERLAP else "trou"
+        return (
+            f"Outil {anomaly.tool_id}: {kind} de {anomaly.hours:.2f} h entre l'emprunt {previous.id} "
+            f"du {previous.date_borrow:%d/%m/%Y} ({previous.start_time_borrow} - {previous.end_time_borrow}) "
+            f"et l'emprunt {borrow.id} du {borrow.date_borrow:%d/%m/%Y} "
+            f"({borrow.start_time_borrow} - {borrow.end_time_borrow})"
+        )
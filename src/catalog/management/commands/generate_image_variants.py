@@ -0,0 +1,24 @@
+"""Command creating the resized variants of the images of the tools"""
+
+from django.core.management.base import BaseCommand
+
+from catalog.images import generate_variants
+from catalog.models import AgriculturalTool
+
+
+class Command(BaseCommand):
+    help = "Crée les variantes redimensionnées des images des outils"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Recrée aussi les variantes existantes")
+
+    def handle(self, *args, **options):
+        tools = AgriculturalTool.objects.exclude(image="").exclude(image__isnull=True).order_by("id")
+
+        created = 0
+        for tool in tools.iterator():
+            try:
+                created += generate_variants(tool.image, force=options["force"])
+            except (OSError, ValueError) as error:
+                self.stderr.write(f"Image de l'outil {tool.id} ({tool.image.name}) illisible: {error}")
+        self.stdout.write(self.style.SUCCESS(f"{created} variante(s) créée(s)"))
@@ -0,0 +1,197 @@
+"""Command importing the members, tools and borrows of the PHP version from its MariaDB dump"""
+
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.access import invalidate_accessible_tools
+from catalog.fragments import bump_tool_versions
+from catalog.legacy import DumpError, iter_rows
+from catalog.models import AgriculturalTool, BorrowTool
+from catalog.rollups import rebuild_rollups
+
+
+DEFAULT_DUMP = settings.BASE_DIR.parent / "old_v1" / "cuma_de_la_plaine.sql"
+
+
+def parse_mapping(values, cast):
+    """Return the dict of the `old=new` mappings given on the command line"""
+    mapping = {}
+    for value in values or []:
+        old, separator, new = value.partition("=")
+        if not separator:
+            raise CommandError(f"Correspondance non valide, attendu ancien=nouveau: {value}")
+        try:
+            mapping[cast(old)] = cast(new)
+        except ValueError:
+            raise CommandError(f"Correspondance non valide: {value}") from None
+    return mapping
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe les membres, outils et heures d'utilisation de la version PHP depuis son export MariaDB. "
+        "Les lignes déjà importées sont ignorées, la commande peut donc être relancée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "dump", nargs="?", default=str(DEFAULT_DUMP), help="Fichier SQL exporté de la version PHP"
+        )
+        parser.add_argument(
+            "--borrow-date",
+            type=datetime.date.fromisoformat,
+            default=datetime.date.today(),
+            help="Date des emprunts, absente de la version PHP (AAAA-MM-JJ, par défaut aujourd'hui)",
+        )
+        parser.add_argument(
+            "--user-map",
+            action="append",
+            help="Identifiant d'un membre de la version PHP et identifiant du membre existant correspondant "
+            "(ancien=nouveau), à répéter",
+        )
+        parser.add_argument(
+            "--tool-map",
+            action="append",
+            help="Id d'un matériel de la version PHP et id de l'outil existant correspondant "
+            "(ancien=nouveau), à répéter",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Nombre d'emprunts insérés par requête")
+
+    def handle(self, *args, **options):
+        self.dump = options["dump"]
+        self.batch_size = options["batch_size"]
+        user_map = parse_mapping(options["user_map"], str)
+        tool_map = parse_mapping(options["tool_map"], int)
+        existing = set(AgriculturalTool.objects.filter(id__in=tool_map.values()).values_list("id", flat=True))
+        missing = [str(tool_id) for tool_id in tool_map.values() if tool_id not in existing]
+        if missing:
+            raise CommandError(f"Outils inconnus dans --tool-map: {', '.join(missing)}")
+
+        try:
+            # The borrows come first in the dump, so the members and tools are read in a first pass
+            users = self.import_users(user_map)
+            tools = self.import_tools(tool_map, users)
+            tool_ids = self.import_borrows(users, tools, options["borrow_date"])
+        except OSError as error:
+            raise CommandError(f"Le fichier {self.dump} ne peut pas être lu: {error}") from error
+        except DumpError as error:
+            raise CommandError(f"Le fichier {self.dump} n'est pas valide: {error}") from error
+
+        # The signals are not sent by the inserts in bulk
+        for tool in AgriculturalTool.objects.filter(id__in=tool_ids):
+            tool.update_meter_reading()
+        if tool_ids:
+            rebuild_rollups(tool_ids)
+            bump_tool_versions(*tool_ids)
+
+    def rows(self, table):
+        """Yield the rows of a table of the dump, read line by line"""
+        with open(self.dump, encoding="utf-8") as dump:
+            yield from (row for _, row in iter_rows(dump, tables={table}))
+
+    def import_users(self, user_map):
+        """Create the members missing from the database, and return the user id of each legacy username"""
+        users = dict(User.objects.values_list("username", "id"))
+        missing = [new for new in user_map.values() if new not in users]
+        if missing:
+            raise CommandError(f"Membres inconnus dans --user-map: {', '.join(missing)}")
+
+        password = make_password(None)
+        new_users = {}
+        for row in self.rows("utilisateurs"):
+            username = row["nom_utilisateur"]
+            if username not in user_map and username not in users and username not in new_users:
+                # The passwords of the PHP version cannot be checked, the members have to reset them
+                new_users[username] = User(
+                    username=username,
+                    first_name=row["prenom"] or "",
+                    last_name=row["nom"] or "",
+                    email=row["email"] or "",
+                    password=password,
+                )
+        User.objects.bulk_create(new_users.values(), batch_size=self.batch_size)
+        self.stdout.write(f"Membres: {len(new_users)} créé(s)")
+
+        users = dict(User.objects.values_list("username", "id"))
+        # The legacy usernames which are not mapped are kept
+        users.update({legacy: users[new] for legacy, new in user_map.items()})
+        return users
+
+    def import_tools(self, tool_map, users):
+        """Create the tools missing from the database, and return the tool id of each legacy tool id"""
+        tools = dict(AgriculturalTool.objects.filter(legacy_id__isnull=False).values_list("legacy_id", "id"))
+        # The mapped tools remember their legacy id, so that the mapping is not needed again
+        for legacy_id, tool_id in tool_map.items():
+            AgriculturalTool.objects.filter(id=tool_id).update(legacy_id=legacy_id)
+        tools.update(tool_map)
+
+        new_tools = [
+            AgriculturalTool(
+                legacy_id=row["id"],
+                name=row["nom_materiel"] or f"Matériel {row['id']}",
+                description="Importé de la version PHP",
+                user_id=users.get(row["responsable"]),
+            )
+            for row in self.rows("materiels")
+            if row["id"] not in tools
+        ]
+        AgriculturalTool.objects.bulk_create(new_tools, batch_size=self.batch_size)
+        # The signals are not sent by the inserts in bulk
+        invalidate_accessible_tools(*{tool.user_id for tool in new_tools})
+        self.stdout.write(f"Outils: {len(new_tools)} créé(s)")
+        tools.update(AgriculturalTool.objects.filter(legacy_id__isnull=False).values_list("legacy_id", "id"))
+        return tools
+
+    def import_borrows(self, users, tools, borrow_date):
+        """Insert the borrows not imported yet by batches, and return the ids of the tools with new borrows"""
+        imported = set(BorrowTool.objects.filter(legacy_id__isnull=False).values_list("legacy_id", flat=True))
+        tool_ids = set()
+        created = skipped = 0
+        start = time.monotonic()
+        batch = []
+
+        def insert():
+            with transaction.atomic():
+                BorrowTool.objects.bulk_create(batch)
+            rate = created / max(time.monotonic() - start, 1e-6)
+            self.stdout.write(f"Emprunts: {created} créé(s) ({rate:.0f} lignes/s)")
+            batch.clear()
+
+        for row in self.rows("heures_utilisation"):
+            if row["ID"] in imported:
+                continue
+            tool_id, user_id = tools.get(row["id_materiel"]), users.get(row["utilisateur"])
+            if tool_id is None or user_id is None:
+                skipped += 1
+                continue
+            batch.append(
+                BorrowTool(
+                    legacy_id=row["ID"],
+                    tool_id=tool_id,
+                    user_id=user_id,
+                    date_borrow=borrow_date,
+                    start_time_borrow=row["heure_debut"],
+                    end_time_borrow=row["heure_fin"],
+                    comment=row["commentaires"] or None,
+                )
+            )
+            tool_ids.add(tool_id)
+            created += 1
+            if len(batch) >= self.batch_size:
+                insert()
+        if batch:
+            insert()
+
+        duration = time.monotonic() - start
+        rate = created / max(duration, 1e-6)
+        self.stdout.write(f"Emprunts: {created} créé(s) en {duration:.1f} s ({rate:.0f} lignes/s)")
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"{skipped} emprunt(s) ignoré(s): matériel ou membre inconnu"))
+        self.stdout.write(self.style.SUCCESS("Import terminé"))
+        return tool_ids
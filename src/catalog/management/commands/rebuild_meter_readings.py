@@ -0,0 +1,27 @@
+"""Command rebuilding the meter reading stored on each AgriculturalTool"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.fragments import bump_tool_versions
+from catalog.models import AgriculturalTool
+
+
+class Command(BaseCommand):
+    help = "Recalcule le compteur horaire, la date et l'utilisateur du dernier emprunt de chaque outil"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tool_ids", nargs="*", type=int, help="Identifiants des outils (par défaut tous)")
+
+    def handle(self, *args, **options):
+        tools = AgriculturalTool.objects.order_by("id")
+        if options["tool_ids"]:
+            tools = tools.filter(id__in=options["tool_ids"])
+
+        count = 0
+        for tool in tools.iterator():
+            with transaction.atomic():
+                tool.update_meter_reading()
+            bump_tool_versions(tool.id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} outil(s) mis à jour"))
@@ -0,0 +1,42 @@
+"""Command rebuilding the MonthlyUsage rollups from the borrows, or checking their drift"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.rollups import find_drift, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcule les heures et le nombre d'emprunts par outil, membre et mois, ou vérifie leur écart avec les emprunts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tool_ids", nargs="*", type=int, help="Identifiants des outils (par défaut tous)")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Affiche les écarts sans rien modifier, et échoue s'il y en a",
+        )
+
+    def handle(self, *args, **options):
+        tool_ids = options["tool_ids"] or None
+        if options["check"]:
+            drift = find_drift(tool_ids)
+            for (tool_id, user_id, month), stored, expected in drift:
+                self.stdout.write(
+                    f"Outil {tool_id}, membre {user_id}, {month:%m/%Y}: "
+                    f"enregistré {self.format_rollup(stored)}, attendu {self.format_rollup(expected)}"
+                )
+            if drift:
+                raise CommandError(f"{len(drift)} écart(s) trouvé(s), relancez la commande sans --check")
+            self.stdout.write(self.style.SUCCESS("Aucun écart"))
+            return
+
+        count = rebuild_rollups(tool_ids)
+        self.stdout.write(self.style.SUCCESS(f"{count} ligne(s) recalculée(s)"))
+
+    @staticmethod
+    def format_rollup(rollup):
+        """Return the hours and number of borrows of a rollup, or a dash if it is missing"""
+        if rollup is None:
+            return "-"
+        hours, count = rollup
+        return f"{hours:.2f} h / {count} emprunt(s)"
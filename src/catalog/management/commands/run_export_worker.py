@@ -0,0 +1,40 @@
+"""Command processing the export jobs in the background"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.jobs import claim_next_job, cleanup_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Construit les exports demandés en arrière-plan et supprime les exports expirés"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="S'arrête dès qu'il n'y a plus d'export en attente"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=2, help="Secondes d'attente quand aucun export n'est en attente"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = cleanup_jobs()
+            if deleted:
+                self.stdout.write(f"{deleted} export(s) expiré(s) supprimé(s)")
+
+            job = claim_next_job()
+            if job is not None:
+                start = time.monotonic()
+                run_job(job)
+                duration = time.monotonic() - start
+                if job.status == job.Status.DONE:
+                    self.stdout.write(self.style.SUCCESS(f"Export {job.pk} terminé en {duration:.1f} s"))
+                else:
+                    self.stderr.write(f"Export {job.pk} en échec: {job.error}")
+                continue
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,151 @@
+"""Command filling the database with synthetic members, tools and borrows to measure performances"""
+
+import datetime
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.models import AgriculturalTool, BorrowTool, ToolAccess
+from catalog.rollups import rebuild_rollups
+
+
+FIRST_NAMES = ["Jean", "Marie", "Pierre", "Anne", "Louis", "Claire", "Paul", "Julie", "Michel", "Sophie"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau"]
+TOOL_NAMES = ["Tracteur", "Semoir", "Herse", "Charrue", "Faucheuse", "Andaineur", "Presse", "Epandeur", "Broyeur"]
+
+
+def batched(iterable, size):
+    """Yield lists of at most `size` items of the iterable"""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit la base avec des membres, outils, accès et emprunts fictifs pour mesurer les performances. "
+        "À utiliser sur une copie de la base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=300, help="Nombre de membres")
+        parser.add_argument("--tools", type=int, default=200, help="Nombre d'outils")
+        parser.add_argument("--borrows", type=int, default=1_000_000, help="Nombre total d'emprunts")
+        parser.add_argument(
+            "--access-density", type=float, default=0.2, help="Part des outils auxquels chaque membre a accès"
+        )
+        parser.add_argument("--years", type=int, default=10, help="Nombre d'années d'historique")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Nombre de lignes insérées par requête")
+        parser.add_argument("--prefix", default="bench", help="Préfixe des noms des membres et des outils créés")
+        parser.add_argument("--seed", type=int, default=0, help="Graine du générateur aléatoire")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Des membres préfixés par '{prefix}_' existent déjà, choisissez un autre --prefix")
+
+        start = time.monotonic()
+        manager = User.objects.create_user(username=f"{prefix}_manager", password=prefix, is_staff=True)
+        members = [manager] + self.create_members(prefix, options["members"])
+        tools = self.create_tools(prefix, options["tools"], members)
+        self.create_accesses(members, tools, options["access_density"])
+        self.create_borrows(tools, members, options["borrows"], options["years"])
+
+        self.stdout.write("Mise à jour des compteurs des outils")
+        for tool in tools:
+            tool.update_meter_reading()
+        # The borrows inserted in bulk are not counted in the monthly rollups by the signals
+        self.stdout.write("Calcul des heures par outil, membre et mois")
+        rebuild_rollups()
+        # The accessible tools of the members were cached before the accesses were created in bulk
+        cache.clear()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Données créées en {time.monotonic() - start:.1f} s. "
+                f"Connexion avec '{manager.username}' / '{prefix}' (responsable du premier outil)"
+            )
+        )
+
+    def insert(self, model, objects, total):
+        """Insert the objects in batches, each in its own transaction, and report the progress"""
+        start = time.monotonic()
+        inserted = 0
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            inserted += len(batch)
+            rate = inserted / max(time.monotonic() - start, 1e-6)
+            self.stdout.write(f"\r{model.__name__}: {inserted}/{total} ({rate:.0f} lignes/s)", ending="")
+        self.stdout.write("")
+
+    def create_members(self, prefix, count):
+        """Create the members, without usable password"""
+        password = make_password(None)
+        members = (
+            User(
+                username=f"{prefix}_{index:06d}",
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                password=password,
+            )
+            for index in range(count)
+        )
+        self.insert(User, members, count)
+        return list(User.objects.filter(username__startswith=f"{prefix}_").exclude(username=f"{prefix}_manager"))
+
+    def create_tools(self, prefix, count, members):
+        """Create the tools, the first one managed by the manager used to log in"""
+        tools = (
+            AgriculturalTool(
+                name=f"[{prefix}] {self.random.choice(TOOL_NAMES)} {index}",
+                description="Outil créé pour les mesures de performance",
+                user=members[0] if index == 0 else self.random.choice(members),
+            )
+            for index in range(count)
+        )
+        self.insert(AgriculturalTool, tools, count)
+        return list(AgriculturalTool.objects.filter(name__startswith=f"[{prefix}] ").order_by("id"))
+
+    def create_accesses(self, members, tools, density):
+        """Give each member access to a random part of the tools, the manager to all of them"""
+        per_member = min(len(tools), round(len(tools) * density))
+        accesses = itertools.chain(
+            (ToolAccess(user=members[0], tool=tool) for tool in tools),
+            (
+                ToolAccess(user=member, tool=tool)
+                for member in members[1:]
+                for tool in self.random.sample(tools, per_member)
+            ),
+        )
+        self.insert(ToolAccess, accesses, len(tools) + per_member * (len(members) - 1))
+
+    def create_borrows(self, tools, members, count, years):
+        """Create the borrows of each tool, continuing its hour-meter from one borrow to the next"""
+        first_day = datetime.date.today() - datetime.timedelta(days=365 * years)
+        days = (datetime.date.today() - first_day).days
+
+        def borrows():
+            for index, tool in enumerate(tools):
+                tool_count = count // len(tools) + (1 if index < count % len(tools) else 0)
+                meter = 0.0
+                for rank in range(tool_count):
+                    duration = round(self.random.uniform(0.5, 8), 1)
+                    yield BorrowTool(
+                        tool=tool,
+                        user=self.random.choice(members),
+                        date_borrow=first_day + datetime.timedelta(days=rank * days // max(tool_count, 1)),
+                        start_time_borrow=round(meter, 1),
+                        end_time_borrow=round(meter + duration, 1),
+                    )
+                    meter += duration
+
+        self.insert(BorrowTool, borrows(), count)
@@ -0,0 +1,146 @@
+"""Command measuring the borrows written at the same time by several processes, with and without the SQLite tuning"""
+
+import datetime
+import multiprocessing
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from catalog.models import AgriculturalTool
+
+
+# Configuration of the connections before the tuning: rollback journal, which stays set in the database file
+# until changed, deferred transactions and the other pragmas left to the defaults of SQLite
+BASELINE_PRAGMAS = {"journal_mode": "DELETE"}
+BASELINE_TRANSACTION_MODE = "DEFERRED"
+
+PHASES = {
+    "baseline": "Sans réglage",
+    "tuned": "Avec réglage",
+}
+
+
+def phase_configuration(phase):
+    """Return the pragmas and transaction mode of the SQLite connections during a phase"""
+    if phase == "baseline":
+        return BASELINE_PRAGMAS, BASELINE_TRANSACTION_MODE
+    return settings.SQLITE_PRAGMAS, settings.SQLITE_TRANSACTION_MODE
+
+
+def configure_phase(phase):
+    """Make the next connections of the process use the configuration of a phase"""
+    pragmas, transaction_mode = phase_configuration(phase)
+    connections.close_all()
+    return override_settings(SQLITE_PRAGMAS=pragmas, SQLITE_TRANSACTION_MODE=transaction_mode)
+
+
+def post_borrows(phase, index, tool_id, user_id, requests, start, results):
+    """Post `requests` borrows of a tool from a worker process, and put the outcome of each one in the results"""
+    with configure_phase(phase), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        client = Client(raise_request_exception=True)
+        client.force_login(User.objects.get(pk=user_id))
+        url = reverse("catalog:borrow_tool", kwargs={"tool_id": tool_id})
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        outcome = {"succeeded": 0, "locked": 0, "failed": 0, "durations": []}
+        start.wait()
+        for number in range(requests):
+            reading = index * requests + number
+            data = {
+                "tool": tool_id,
+                "user": user_id,
+                "date_borrow": today,
+                "start_time_borrow": reading,
+                "end_time_borrow": reading + 0.5,
+                "comment": f"stress {phase} {index}",
+            }
+            begin = time.perf_counter()
+            try:
+                response = client.post(url, data)
+            except OperationalError as error:
+                outcome["locked" if "locked" in str(error) else "failed"] += 1
+            else:
+                outcome["succeeded" if response.status_code == 302 else "failed"] += 1
+            outcome["durations"].append(time.perf_counter() - begin)
+        connections.close_all()
+    results.put(outcome)
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie en parallèle depuis plusieurs processus des emprunts au formulaire d'emprunt, sans puis avec le "
+        "réglage des connexions SQLite, et affiche le débit et le nombre d'erreurs 'database is locked'. "
+        "À utiliser sur une copie de la base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8, help="Nombre de processus envoyant des emprunts")
+        parser.add_argument("--requests", type=int, default=50, help="Nombre d'emprunts envoyés par chaque processus")
+        parser.add_argument(
+            "--phase", choices=sorted(PHASES), action="append", help="Configuration mesurée (par défaut les deux)"
+        )
+        parser.add_argument("--keep", action="store_true", help="Garder l'outil et les emprunts créés")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("Le test de charge demande une base SQLite enregistrée dans un fichier")
+
+        user, _ = User.objects.get_or_create(username="stress_member", defaults={"first_name": "Test de charge"})
+        tool = AgriculturalTool.objects.create(name="Test de charge", description="Test de charge", user=user)
+        try:
+            for phase in options["phase"] or list(PHASES):
+                outcome = self.run_phase(phase, tool, user, options["processes"], options["requests"])
+                self.report(PHASES[phase], outcome)
+        finally:
+            connections.close_all()
+            if not options["keep"]:
+                tool.delete()
+
+    def run_phase(self, phase, tool, user, processes, requests):
+        """Run the worker processes with the configuration of a phase, and return their merged outcome"""
+        # The journal mode is changed while no other connection is open, then the workers are forked
+        with configure_phase(phase):
+            connection.ensure_connection()
+            connections.close_all()
+
+        context = multiprocessing.get_context("fork")
+        start = context.Event()
+        results = context.Queue()
+        workers = [
+            context.Process(target=post_borrows, args=(phase, index, tool.id, user.id, requests, start, results))
+            for index in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        # Let the workers log in before they all post at the same time
+        time.sleep(1)
+        begin = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - begin
+        for worker in workers:
+            worker.join()
+
+        durations = sorted(duration for outcome in outcomes for duration in outcome["durations"])
+        merged = {key: sum(outcome[key] for outcome in outcomes) for key in ("succeeded", "locked", "failed")}
+        merged.update(
+            requests=len(durations),
+            elapsed=elapsed,
+            median_ms=statistics.median(durations) * 1000 if durations else 0,
+            p95_ms=durations[int(len(durations) * 0.95) - 1] * 1000 if durations else 0,
+        )
+        return merged
+
+    def report(self, label, outcome):
+        """Write the throughput, errors and latencies of a phase"""
+        throughput = outcome["succeeded"] / outcome["elapsed"] if outcome["elapsed"] else 0
+        self.stdout.write(
+            f"{label:<13} {outcome['requests']:>5} emprunts en {outcome['elapsed']:.1f} s: "
+            f"{outcome['succeeded']} enregistrés ({throughput:.1f}/s), {outcome['locked']} 'database is locked', "
+            f"{outcome['failed']} autres erreurs, {outcome['median_ms']:.0f} ms médian, {outcome['p95_ms']:.0f} ms p95"
+        )
@@ -0,0 +1,32 @@
+"""Command warming up the templates, URLs and heavy modules, and reporting the time taken by each step"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cumaweb.warmup import warmup
+
+
+STEP_LABELS = {
+    "templates": "Templates compilés",
+    "urls": "URLs résolues",
+    "modules": "Modules importés",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile les templates, résout les URLs nommées et importe openpyxl et Pillow, comme au démarrage du "
+        "serveur, et affiche la durée de chaque étape. À lancer après un déploiement pour vérifier les templates."
+    )
+
+    def handle(self, *args, **options):
+        total = 0
+        errors = []
+        for step in warmup():
+            total += step.seconds
+            self.stdout.write(f"{STEP_LABELS.get(step.name, step.name)}: {step.count} en {step.seconds * 1000:.0f} ms")
+            errors.extend(f"{step.name}: {error}" for error in step.errors)
+        for error in errors:
+            self.stderr.write(self.style.ERROR(error))
+        if errors:
+            raise CommandError(f"{len(errors)} erreur(s) pendant le préchauffage")
+        self.stdout.write(self.style.SUCCESS(f"Préchauffage terminé en {total * 1000:.0f} ms"))
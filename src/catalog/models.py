@@ -1,5 +1,5 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
 
 
 class AgriculturalTool(models.Model):
@@ -17,6 +17,33 @@ class AgriculturalTool(models.Model):
     image = models.ImageField(upload_to="images/", default=None, blank=True, null=True)
     # when the user is delete, it is set to null
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="manager_tool")
+    # latest borrow of the tool, kept up to date when its borrows are saved or deleted
+    meter_reading = models.FloatField(
+        null=True, blank=True, editable=False, help_text="Heures du matériel à la fin du dernier emprunt"
+    )
+    last_borrow_date = models.DateField(null=True, blank=True, editable=False)
+    last_borrow_user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="+"
+    )
+    # id of the tool in the PHP version, set when it is imported from its dump
+    legacy_id = models.PositiveIntegerField(null=True, blank=True, unique=True, editable=False)
+
+    def update_meter_reading(self):
+        """
+        Store the hour-meter reading, date and user of the latest borrow of the tool.
+
+        The latest borrow is the one with the highest end time, read from the index on tool and end time.
+        """
+        latest = self.borrowtool_set.order_by("-end_time_borrow", "-id").first()
+        self.meter_reading = latest.end_time_borrow if latest else None
+        self.last_borrow_date = latest.date_borrow if latest else None
+        self.last_borrow_user_id = latest.user_id if latest else None
+        # Only these fields are written, to keep the changes made meanwhile on the other ones
+        AgriculturalTool.objects.filter(pk=self.pk).update(
+            meter_reading=self.meter_reading,
+            last_borrow_date=self.last_borrow_date,
+            last_borrow_user_id=self.last_borrow_user_id,
+        )
 
 
 class BorrowTool(models.Model):
@@ -35,6 +62,64 @@ class BorrowTool(models.Model):
     start_time_borrow = models.FloatField(help_text="Heures du matériel au début de l'emprunt")
     end_time_borrow = models.FloatField(help_text="Heures du matériel à la fin de l'emprunt")
     comment = models.TextField(null=True, blank=True)
+    # id of the borrow in the PHP version, set when it is imported from its dump
+    legacy_id = models.PositiveIntegerField(null=True, blank=True, unique=True, editable=False)
+    # first export including the borrow, kept by the later exports, empty while it was never exported
+    export_batch = models.ForeignKey(
+        "ExportBatch", on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="borrows"
+    )
+
+    def save(self, *args, **kwargs):
+        """Save the borrow in the same transaction as the update of the meter reading of its tool"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        """
+        Define the indexes used by the most frequent queries on borrows.
+        """
+        indexes = [
+            # history of a tool and exports, filtered on the tool and sorted by date
+            models.Index(fields=["tool", "date_borrow", "start_time_borrow"], name="borrow_tool_date_idx"),
+            # latest hour-meter reading of a tool
+            models.Index(fields=["tool", "end_time_borrow"], name="borrow_tool_end_time_idx"),
+            # hour-meter ranges of a tool, scanned in order to find their overlaps and gaps
+            models.Index(fields=["tool", "start_time_borrow", "end_time_borrow"], name="borrow_tool_start_time_idx"),
+            # history of a user, filtered on the user and sorted by date
+            models.Index(fields=["user", "date_borrow", "start_time_borrow"], name="borrow_user_date_idx"),
+            # borrows never exported, only these rows are indexed so the index stays small as the table grows
+            models.Index(
+                fields=["tool", "date_borrow"],
+                name="borrow_pending_export_idx",
+                condition=models.Q(export_batch__isnull=True),
+            ),
+        ]
+
+
+class MonthlyUsage(models.Model):
+    """
+    Stores the hours and number of borrows of a tool by a user during a month, related to :model:`auth.User`
+    and :model:`AgriculturalTool`.
+
+    The rows are updated when the borrows are saved or deleted, so that the summaries read them
+    instead of the whole history of borrows.
+    """
+
+    tool = models.ForeignKey(AgriculturalTool, on_delete=models.CASCADE, related_name="monthly_usages")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="monthly_usages")
+    # first day of the month
+    month = models.DateField()
+    hours = models.FloatField(default=0)
+    borrow_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """
+        Define a unique constraint on tool, user and month, and an index to read the months of a user.
+        """
+        unique_together = ("tool", "user", "month")
+        indexes = [
+            models.Index(fields=["user", "month"], name="monthlyusage_user_month_idx"),
+        ]
 
 
 class ToolAccess(models.Model):
@@ -48,6 +133,75 @@ class ToolAccess(models.Model):
 
     class Meta:
         """
-        Define a unique constraint on user and tool.
+        Define a unique constraint on user and tool, and an index to list the users of a tool.
         """
         unique_together = ("user", "tool")
+        indexes = [
+            models.Index(fields=["tool", "user"], name="toolaccess_tool_user_idx"),
+        ]
+
+
+class ExportJob(models.Model):
+    """
+    Stores an export of the borrows of a tool built in the background, related to :model:`auth.User`
+    and :model:`AgriculturalTool`.
+    """
+
+    class Status(models.TextChoices):
+        """
+        Define the steps of an export job.
+        """
+        PENDING = "pending", "En attente"
+        RUNNING = "running", "En cours"
+        DONE = "done", "Terminé"
+        FAILED = "failed", "Échec"
+
+    # the user asking for the export, the only one allowed to download it
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="export_jobs")
+    tool = models.ForeignKey(AgriculturalTool, on_delete=models.CASCADE, related_name="export_jobs")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    summary = models.CharField(max_length=10, default="values")
+    # format of the built file: xlsx, csv or jsonl
+    format = models.CharField(max_length=10, default="xlsx")
+    # only the borrows not exported yet are included
+    pending_only = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    # the built workbook, and the name under which it is downloaded
+    file = models.FileField(upload_to="exports/", blank=True)
+    filename = models.CharField(max_length=150, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        Define the indexes used by the worker to find the next jobs, and to count the active jobs of a user.
+        """
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="exportjob_status_idx"),
+            models.Index(fields=["user", "status"], name="exportjob_user_status_idx"),
+        ]
+
+    @property
+    def is_active(self):
+        """Tell if the job is waiting for or being processed by the worker"""
+        return self.status in (self.Status.PENDING, self.Status.RUNNING)
+
+
+class ExportBatch(models.Model):
+    """
+    Stores an export of borrows, related to :model:`auth.User` and :model:`BorrowTool`.
+
+    The borrows never exported are marked with the batch exporting them, and keep it when they are exported
+    again, so that the next exports can be limited to the borrows not exported yet.
+    """
+
+    # the user asking for the export
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="export_batches")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # only the borrows not exported yet were included
+    pending_only = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,63 @@
+"""Keyset pagination used to browse the history of borrows"""
+
+import datetime
+
+from django.db.models import Q
+
+
+# Number of borrows displayed per page of history
+HISTORY_PAGE_SIZE = 50
+
+# Order of the history, most recent first. The id makes the order total so that no row is skipped between pages.
+HISTORY_ORDERING = ("-date_borrow", "-start_time_borrow", "-id")
+
+
+def encode_cursor(borrow):
+    """Return the cursor pointing after the given borrow in the history"""
+    return f"{borrow.date_borrow.isoformat()}_{borrow.start_time_borrow!r}_{borrow.id}"
+
+
+def decode_cursor(cursor):
+    """Return the (date, start time, id) position of a cursor, or None if the cursor is not valid"""
+    try:
+        date_borrow, start_time, borrow_id = cursor.split("_")
+        return datetime.date.fromisoformat(date_borrow), float(start_time), int(borrow_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def history_filter(borrows, cursor):
+    """Return the given borrows placed after the position of the cursor, in history order"""
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        date_borrow, start_time, borrow_id = position
+        borrows = borrows.filter(
+            Q(date_borrow__lt=date_borrow)
+            | Q(date_borrow=date_borrow, start_time_borrow__lt=start_time)
+            | Q(date_borrow=date_borrow, start_time_borrow=start_time, id__lt=borrow_id)
+        )
+    return borrows.order_by(*HISTORY_ORDERING)
+
+
+def split_page(page, page_size):
+    """Return the borrows of a page fetched with one more row, and the cursor of the next page"""
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+def history_page(borrows, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """
+    Return a page of the given borrows in history order, and the cursor of the next page.
+
+    Instead of an offset, the page starts right after the position of the cursor, so the database
+    only reads the rows of the page whatever its depth in the history. The cursor of the next
+    page is None on the last page.
+    """
+    # One more row is fetched to know if there is a next page
+    return split_page(list(history_filter(borrows, cursor)[: page_size + 1]), page_size)
+
+
+async def ahistory_page(borrows, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    """Async version of history_page"""
+    page = [borrow async for borrow in history_filter(borrows, cursor)[: page_size + 1]]
+    return split_page(page, page_size)
@@ -0,0 +1,118 @@
+"""Monthly rollups of the borrows, kept up to date incrementally and rebuilt on demand"""
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import AgriculturalTool, BorrowTool, MonthlyUsage
+from .usage import invalidate_usage
+
+
+# Difference of hours under which a rollup is considered equal to the borrows it sums
+HOURS_TOLERANCE = 1e-6
+
+
+def borrow_key(borrow):
+    """Return the (tool id, user id, month) rollup a borrow is counted in"""
+    return borrow.tool_id, borrow.user_id, borrow.date_borrow.replace(day=1)
+
+
+def borrow_hours(borrow):
+    """Return the number of hours of a borrow"""
+    return borrow.end_time_borrow - borrow.start_time_borrow
+
+
+def add_to_rollup(key, hours, count):
+    """
+    Add hours and borrows, or remove them when negative, to the rollup of the given (tool id, user id, month).
+
+    The rollup is updated in the database with a single UPDATE, created when it is missing and deleted
+    when it no longer counts any borrow. It is called by the signals of the borrows, within the transaction
+    saving or deleting them.
+    """
+    tool_id, user_id, month = key
+    rollups = MonthlyUsage.objects.filter(tool_id=tool_id, user_id=user_id, month=month)
+    updated = rollups.update(hours=F("hours") + hours, borrow_count=F("borrow_count") + count)
+    if not updated:
+        # A missing rollup being decreased was deleted with its tool or user
+        if count > 0:
+            MonthlyUsage.objects.create(tool_id=tool_id, user_id=user_id, month=month, hours=hours, borrow_count=count)
+    elif count < 0:
+        rollups.filter(borrow_count__lte=0).delete()
+
+
+def compute_rollups(borrows=None):
+    """
+    Return the rollups of the given borrows, by default all of them, computed by the database in a single
+    grouped query. The result maps each (tool id, user id, month) to its (hours, number of borrows).
+    """
+    if borrows is None:
+        borrows = BorrowTool.objects.all()
+    rows = (
+        borrows.order_by()
+        .annotate(month=TruncMonth("date_borrow"))
+        .values("tool_id", "user_id", "month")
+        .annotate(hours=Sum(F("end_time_borrow") - F("start_time_borrow")), borrow_count=Count("id"))
+    )
+    return {(row["tool_id"], row["user_id"], row["month"]): (row["hours"], row["borrow_count"]) for row in rows}
+
+
+def stored_rollups(rollups=None):
+    """Return the stored rollups, by default all of them, in the format of `compute_rollups`"""
+    if rollups is None:
+        rollups = MonthlyUsage.objects.all()
+    rows = rollups.values_list("tool_id", "user_id", "month", "hours", "borrow_count")
+    return {(tool_id, user_id, month): (hours, count) for tool_id, user_id, month, hours, count in rows}
+
+
+def find_drift(tool_ids=None):
+    """
+    Compare the stored rollups to the borrows, for the given tools or all of them.
+
+    Return the list of (key, stored, expected) differences, where a missing rollup is None.
+    """
+    borrows = BorrowTool.objects.all()
+    rollups = MonthlyUsage.objects.all()
+    if tool_ids:
+        borrows = borrows.filter(tool_id__in=tool_ids)
+        rollups = rollups.filter(tool_id__in=tool_ids)
+    expected = compute_rollups(borrows)
+    stored = stored_rollups(rollups)
+
+    drift = []
+    for key in sorted(expected.keys() | stored.keys()):
+        stored_value, expected_value = stored.get(key), expected.get(key)
+        if (
+            stored_value is None
+            or expected_value is None
+            or stored_value[1] != expected_value[1]
+            or abs(stored_value[0] - expected_value[0]) > HOURS_TOLERANCE
+        ):
+            drift.append((key, stored_value, expected_value))
+    return drift
+
+
+def rebuild_rollups(tool_ids=None, batch_size=1000):
+    """
+    Replace the rollups of the given tools, or all of them, by the ones computed from the borrows,
+    and return the number of rollups created.
+    """
+    borrows = BorrowTool.objects.all()
+    rollups = MonthlyUsage.objects.all()
+    if tool_ids:
+        borrows = borrows.filter(tool_id__in=tool_ids)
+        rollups = rollups.filter(tool_id__in=tool_ids)
+
+    with transaction.atomic():
+        rollups.delete()
+        count = len(
+            MonthlyUsage.objects.bulk_create(
+                (
+                    MonthlyUsage(tool_id=tool_id, user_id=user_id, month=month, hours=hours, borrow_count=count)
+                    for (tool_id, user_id, month), (hours, count) in compute_rollups(borrows).items()
+                ),
+                batch_size=batch_size,
+            )
+        )
+    invalidate_usage(*(tool_ids or AgriculturalTool.objects.values_list("id", flat=True)))
+    return count
@@ -0,0 +1,174 @@
+"""Signal handlers keeping the denormalized and cached data of catalog application up to date"""
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .access import invalidate_accessible_tools
+from .fragments import bump_tool_versions
+from .images import create_variants
+from .models import AgriculturalTool, BorrowTool, ExportJob, MonthlyUsage, ToolAccess
+from .rollups import add_to_rollup, borrow_hours, borrow_key
+from .usage import invalidate_usage
+
+
+# Fields of a user shown with the tools and the borrows
+USER_NAME_FIELDS = ("username", "first_name", "last_name")
+
+
+@receiver(post_save, sender=BorrowTool)
+def borrow_saved(sender, instance, **kwargs):
+    """Update the meter reading of the tool of a created or updated borrow, and of its previous tool if it moved"""
+    instance.tool.update_meter_reading()
+    previous = getattr(instance, "_previous_rollup", None)
+    if previous and previous[0][0] != instance.tool_id:
+        AgriculturalTool(pk=previous[0][0]).update_meter_reading()
+
+
+@receiver(post_delete, sender=BorrowTool)
+def borrow_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Update the meter reading of the tool of a deleted borrow, unless the tool itself is deleted.
+
+    The borrows deleted with their user are skipped, each tool they were borrowing being updated once by user_deleted.
+    """
+    if isinstance(origin, AgriculturalTool) and origin.pk == instance.tool_id:
+        return
+    if isinstance(origin, User) and origin.pk == instance.user_id:
+        return
+    AgriculturalTool(pk=instance.tool_id).update_meter_reading()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    """Remember the tools borrowed by a user before the borrows are deleted with the user"""
+    borrows = BorrowTool.objects.filter(user=instance).order_by()
+    instance._borrowed_tool_ids = list(borrows.values_list("tool_id", flat=True).distinct())
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Update once the meter reading of each tool borrowed by a deleted user"""
+    for tool_id in getattr(instance, "_borrowed_tool_ids", []):
+        AgriculturalTool(pk=tool_id).update_meter_reading()
+
+
+@receiver(pre_save, sender=BorrowTool)
+def borrow_saving(sender, instance, **kwargs):
+    """Remember the rollup and hours a borrow was counted in before it is updated"""
+    instance._previous_rollup = None
+    if not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._previous_rollup = borrow_key(previous), borrow_hours(previous)
+
+
+@receiver(post_save, sender=BorrowTool)
+def borrow_rollup_saved(sender, instance, **kwargs):
+    """Move the hours of a created or updated borrow to its monthly rollup"""
+    key, hours = borrow_key(instance), borrow_hours(instance)
+    previous = getattr(instance, "_previous_rollup", None)
+    if previous is None:
+        add_to_rollup(key, hours, 1)
+    elif previous[0] == key:
+        if hours != previous[1]:
+            add_to_rollup(key, hours - previous[1], 0)
+    else:
+        add_to_rollup(previous[0], -previous[1], -1)
+        add_to_rollup(key, hours, 1)
+    invalidate_usage(instance.tool_id, previous[0][0] if previous else None)
+
+
+@receiver(post_delete, sender=BorrowTool)
+def borrow_rollup_deleted(sender, instance, origin=None, **kwargs):
+    """Remove the hours of a deleted borrow from its monthly rollup, unless the rollup is deleted with it"""
+    if isinstance(origin, AgriculturalTool) and origin.pk == instance.tool_id:
+        return
+    if not (isinstance(origin, User) and origin.pk == instance.user_id):
+        add_to_rollup(borrow_key(instance), -borrow_hours(instance), -1)
+    invalidate_usage(instance.tool_id)
+
+
+@receiver(post_save, sender=BorrowTool)
+@receiver(post_delete, sender=BorrowTool)
+def borrow_changed(sender, instance, **kwargs):
+    """Render again the fragments of the tool of a saved or deleted borrow, and of its previous tool if it moved"""
+    previous = getattr(instance, "_previous_rollup", None)
+    bump_tool_versions(instance.tool_id, previous[0][0] if previous else None)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the names of a user before they are updated, unless only other fields are saved, as at login"""
+    instance._previous_names = None
+    if instance._state.adding or (update_fields is not None and not set(update_fields) & set(USER_NAME_FIELDS)):
+        return
+    instance._previous_names = sender.objects.filter(pk=instance.pk).values_list(*USER_NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """
+    Render again the fragments of the tools showing a renamed user: the tools the user is in charge of or
+    borrowed last, and the tools the user borrowed, read from the monthly rollups of the user.
+    """
+    previous = getattr(instance, "_previous_names", None)
+    if previous is None or previous == tuple(getattr(instance, field) for field in USER_NAME_FIELDS):
+        return
+    tools = AgriculturalTool.objects.filter(Q(user=instance) | Q(last_borrow_user=instance))
+    rollups = MonthlyUsage.objects.filter(user=instance).order_by()
+    tool_ids = {*tools.values_list("id", flat=True), *rollups.values_list("tool_id", flat=True).distinct()}
+    bump_tool_versions(*tool_ids)
+
+
+@receiver(pre_save, sender=AgriculturalTool)
+def tool_saving(sender, instance, **kwargs):
+    """Remember the user in charge of a tool before it is saved"""
+    if instance.pk is None:
+        instance._previous_user_id = None
+    else:
+        instance._previous_user_id = sender.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first()
+
+
+@receiver(post_save, sender=AgriculturalTool)
+def tool_saved(sender, instance, created, **kwargs):
+    """Invalidate the accessible tools of the previous and new users in charge of a tool"""
+    previous_user_id = getattr(instance, "_previous_user_id", None)
+    if created or previous_user_id != instance.user_id:
+        invalidate_accessible_tools(previous_user_id, instance.user_id)
+
+
+@receiver(post_save, sender=AgriculturalTool)
+def tool_image_saved(sender, instance, **kwargs):
+    """Create the resized variants of the image of a tool when it is uploaded"""
+    if instance.image:
+        create_variants(instance.image)
+
+
+@receiver(post_save, sender=AgriculturalTool)
+@receiver(post_delete, sender=AgriculturalTool)
+def tool_changed(sender, instance, **kwargs):
+    """Render again the fragments of a saved or deleted tool"""
+    bump_tool_versions(instance.pk)
+
+
+@receiver(post_delete, sender=AgriculturalTool)
+def tool_deleted(sender, instance, **kwargs):
+    """Invalidate the accessible tools of the user in charge of a deleted tool, and the statistics of the tool"""
+    invalidate_accessible_tools(instance.user_id)
+    invalidate_usage(instance.pk)
+
+
+@receiver(post_save, sender=ToolAccess)
+@receiver(post_delete, sender=ToolAccess)
+def tool_access_changed(sender, instance, **kwargs):
+    """Invalidate the accessible tools, and the list of tools rendered, of a user given or removed an access"""
+    invalidate_accessible_tools(instance.user_id)
+
+
+@receiver(post_delete, sender=ExportJob)
+def export_job_deleted(sender, instance, **kwargs):
+    """Delete the file built by a deleted export job"""
+    if instance.file:
+        instance.file.delete(save=False)
@@ -0,0 +1,14 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.filter(name='version_of')
+def version_of(versions, key):
+    """
+    Return the version of a fragment from the dict of versions given by the view.
+
+    Usage: {% cache fragment_timeout tool_card tool.id tool_versions|version_of:tool.id %}
+    """
+    return versions.get(key, "")
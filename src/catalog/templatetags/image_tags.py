@@ -0,0 +1,28 @@
+from django import template
+
+from catalog.images import IMAGE_VARIANTS, variant_url
+
+
+register = template.Library()
+
+
+@register.filter(name='variant_url')
+def variant_url_filter(image, variant):
+    """
+    Return the url of a resized variant of an image.
+
+    Usage: {{ tool.image|variant_url:"card" }}
+    """
+    return variant_url(image, variant)
+
+
+@register.filter(name='variant_srcset')
+def variant_srcset(image):
+    """
+    Return the srcset attribute listing the resized variants of an image with their width.
+
+    Usage: <img srcset="{{ tool.image|variant_srcset }}" sizes="...">
+    """
+    if not image:
+        return ""
+    return ", ".join(f"{variant_url(image, variant)} {size}w" for variant, size in IMAGE_VARIANTS.items())
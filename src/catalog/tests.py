@@ -1,15 +1,46 @@
 """Definition of unit tests of catalog application"""
 
 import datetime
-
+import io
+import json
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+import openpyxl
+from PIL import Image
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
+from catalog import urls as catalog_urls
+from catalog.access import accessible_tool_ids
+from catalog.anomalies import scan_anomalies
+from catalog.exports import SUMMARY_FORMULAS, member_summary_rows, sheet_title
 from catalog.forms import BorrowToolForm, CreateToolForm, ToolAccessForm, DateRangeForm
-from catalog.models import AgriculturalTool, BorrowTool, ToolAccess
+from catalog.images import IMAGE_VARIANTS, variant_name, variant_url
+from catalog.jobs import cleanup_jobs, run_job
+from catalog.legacy import DumpError, iter_rows
+from catalog.models import AgriculturalTool, BorrowTool, ExportBatch, ExportJob, MonthlyUsage, ToolAccess
+from catalog.rollups import find_drift, stored_rollups
+from catalog.usage import coop_usage, tool_usage
+from catalog.views import CoopAnomalyView, ToolAccessListView, ToolDetailView, ToolListView, UserBorrowsView
+from cumaweb.checks import check_on_startup, check_shared_cache
+from cumaweb.testing import QueryBudgetMixin
+from cumaweb.warmup import url_names
 
 # Models
 
@@ -179,6 +210,229 @@ class BorrowToolModelTest(TestCase):
         self.assertEqual(borrow_count_after, 0)
 
 
+class MeterReadingTest(TestCase):
+    """Unit tests for the meter reading stored on AgriculturalTool"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.other_user = User.objects.create_user(username="otheruser", password="otherpassword")
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+
+    def create_borrow(self, user, start_time, end_time, days_ago=0):
+        """Create a borrow of the test tool"""
+        return BorrowTool.objects.create(
+            tool=self.test_tool,
+            user=user,
+            date_borrow=datetime.date.today() - datetime.timedelta(days=days_ago),
+            start_time_borrow=start_time,
+            end_time_borrow=end_time,
+        )
+
+    def assertMeterReading(self, meter_reading, last_borrow):
+        """Check the meter reading and the latest borrow stored on the test tool"""
+        tool = AgriculturalTool.objects.get(id=self.test_tool.id)
+        self.assertEqual(tool.meter_reading, meter_reading)
+        self.assertEqual(tool.last_borrow_date, last_borrow.date_borrow if last_borrow else None)
+        self.assertEqual(tool.last_borrow_user, last_borrow.user if last_borrow else None)
+
+    def test_no_borrow(self):
+        """Test a tool without borrow has no meter reading"""
+        self.assertMeterReading(None, None)
+
+    def test_create_borrow(self):
+        """Test the meter reading follows the created borrows"""
+        latest = self.create_borrow(self.test_user, 10, 12, days_ago=1)
+        self.assertMeterReading(12, latest)
+        latest = self.create_borrow(self.other_user, 12, 15)
+        self.assertMeterReading(15, latest)
+        # A forgotten borrow entered later does not change the reading
+        self.create_borrow(self.test_user, 5, 10, days_ago=5)
+        self.assertMeterReading(15, latest)
+
+    def test_update_borrow(self):
+        """Test the meter reading follows the updated borrows"""
+        previous = self.create_borrow(self.test_user, 10, 12, days_ago=1)
+        latest = self.create_borrow(self.other_user, 12, 15)
+        latest.end_time_borrow = 14
+        latest.save()
+        self.assertMeterReading(14, latest)
+        latest.end_time_borrow = 11
+        latest.save()
+        self.assertMeterReading(12, previous)
+
+    def test_move_borrow(self):
+        """Test the meter readings of both tools follow a borrow moved to another tool"""
+        borrow = self.create_borrow(self.test_user, 10, 12)
+        other_tool = AgriculturalTool.objects.create(name="Herse", description="Herse", user=self.test_user)
+        borrow.tool = other_tool
+        borrow.save()
+        self.assertMeterReading(None, None)
+        self.assertEqual(AgriculturalTool.objects.get(id=other_tool.id).meter_reading, 12)
+
+    def test_delete_borrow(self):
+        """Test the meter reading follows the deleted borrows"""
+        previous = self.create_borrow(self.test_user, 10, 12, days_ago=1)
+        latest = self.create_borrow(self.other_user, 12, 15)
+        latest.delete()
+        self.assertMeterReading(12, previous)
+        previous.delete()
+        self.assertMeterReading(None, None)
+
+    def test_delete_user(self):
+        """Test the meter reading follows the borrows deleted with their user"""
+        previous = self.create_borrow(self.test_user, 10, 12, days_ago=1)
+        self.create_borrow(self.other_user, 12, 15)
+        self.other_user.delete()
+        self.assertMeterReading(12, previous)
+
+    def test_delete_user_queries(self):
+        """Test the tools borrowed by a deleted user are updated once, whatever the number of borrows"""
+        other_tool = AgriculturalTool.objects.create(name="Herse", description="Herse", user=self.test_user)
+        query_counts = []
+        for borrow_count in (2, 20):
+            user = User.objects.create_user(username=f"member{borrow_count}")
+            for index in range(borrow_count):
+                self.create_borrow(user, index, index + 1, days_ago=index)
+                BorrowTool.objects.create(
+                    tool=other_tool, user=user, date_borrow=datetime.date.today(), start_time_borrow=index,
+                    end_time_borrow=index + 1,
+                )
+            with CaptureQueriesContext(connection) as queries:
+                user.delete()
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertMeterReading(None, None)
+        self.assertIsNone(AgriculturalTool.objects.get(id=other_tool.id).meter_reading)
+
+    def test_rebuild_command(self):
+        """Test the command rebuilding the meter readings"""
+        latest = self.create_borrow(self.test_user, 10, 12)
+        AgriculturalTool.objects.update(meter_reading=None, last_borrow_date=None, last_borrow_user=None)
+
+        out = io.StringIO()
+        call_command("rebuild_meter_readings", stdout=out)
+        self.assertMeterReading(12, latest)
+        self.assertIn("1 outil(s) mis à jour", out.getvalue())
+
+    def test_form_initial_start_time(self):
+        """Test the borrow form is filled with the meter reading without reading the borrows"""
+        self.create_borrow(self.test_user, 10, 12.5)
+        tool = AgriculturalTool.objects.get(id=self.test_tool.id)
+        with self.assertNumQueries(0):
+            form = BorrowToolForm(initial={"tool": tool})
+        self.assertEqual(form.fields["start_time_borrow"].widget.attrs["value"], 12.5)
+
+
+class MonthlyUsageTest(TestCase):
+    """Unit tests for the monthly rollups of the borrows stored in MonthlyUsage"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.other_user = User.objects.create_user(username="otheruser", password="otherpassword")
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+        cls.other_tool = AgriculturalTool.objects.create(name="Semoir", description="Semoir", user=cls.test_user)
+
+    def create_borrow(self, user, date_borrow, start_time, end_time, tool=None):
+        """Create a borrow of the test tool by default"""
+        return BorrowTool.objects.create(
+            tool=tool or self.test_tool,
+            user=user,
+            date_borrow=date_borrow,
+            start_time_borrow=start_time,
+            end_time_borrow=end_time,
+        )
+
+    def assertRollups(self, expected):
+        """Check the stored rollups, given as {(tool, user, month): (hours, count)}, and that they do not drift"""
+        self.assertEqual(
+            stored_rollups(),
+            {(tool.id, user.id, month): value for (tool, user, month), value in expected.items()},
+        )
+        self.assertEqual(find_drift(), [])
+
+    def test_create_borrow(self):
+        """Test the borrows are summed by tool, user and month"""
+        self.create_borrow(self.test_user, datetime.date(2024, 3, 5), 10, 12)
+        self.create_borrow(self.test_user, datetime.date(2024, 3, 20), 12, 15.5)
+        self.create_borrow(self.other_user, datetime.date(2024, 3, 21), 15.5, 16)
+        self.create_borrow(self.test_user, datetime.date(2024, 4, 1), 16, 17)
+        self.create_borrow(self.test_user, datetime.date(2024, 4, 2), 0, 4, tool=self.other_tool)
+        march, april = datetime.date(2024, 3, 1), datetime.date(2024, 4, 1)
+        self.assertRollups({
+            (self.test_tool, self.test_user, march): (5.5, 2),
+            (self.test_tool, self.other_user, march): (0.5, 1),
+            (self.test_tool, self.test_user, april): (1, 1),
+            (self.other_tool, self.test_user, april): (4, 1),
+        })
+
+    def test_update_borrow(self):
+        """Test the hours of an updated borrow move to its new rollup"""
+        borrow = self.create_borrow(self.test_user, datetime.date(2024, 3, 5), 10, 12)
+        self.create_borrow(self.test_user, datetime.date(2024, 3, 6), 12, 13)
+        borrow.end_time_borrow = 11
+        borrow.save()
+        march = datetime.date(2024, 3, 1)
+        self.assertRollups({(self.test_tool, self.test_user, march): (2, 2)})
+
+        borrow.date_borrow = datetime.date(2024, 4, 5)
+        borrow.user = self.other_user
+        borrow.save()
+        self.assertRollups({
+            (self.test_tool, self.test_user, march): (1, 1),
+            (self.test_tool, self.other_user, datetime.date(2024, 4, 1)): (1, 1),
+        })
+
+    def test_delete_borrow(self):
+        """Test the rollups follow the deleted borrows, and are removed when they no longer count any"""
+        first = self.create_borrow(self.test_user, datetime.date(2024, 3, 5), 10, 12)
+        second = self.create_borrow(self.test_user, datetime.date(2024, 3, 6), 12, 13)
+        first.delete()
+        self.assertRollups({(self.test_tool, self.test_user, datetime.date(2024, 3, 1)): (1, 1)})
+        second.delete()
+        self.assertRollups({})
+
+    def test_delete_tool_and_user(self):
+        """Test the rollups are deleted with their tool or user"""
+        self.create_borrow(self.test_user, datetime.date(2024, 3, 5), 10, 12)
+        self.create_borrow(self.other_user, datetime.date(2024, 3, 6), 12, 13)
+        self.create_borrow(self.other_user, datetime.date(2024, 3, 6), 0, 3, tool=self.other_tool)
+        self.other_user.delete()
+        self.assertRollups({(self.test_tool, self.test_user, datetime.date(2024, 3, 1)): (2, 1)})
+        self.test_tool.delete()
+        self.assertRollups({})
+
+    def test_rebuild_command(self):
+        """Test the command checking the drift of the rollups and rebuilding them"""
+        self.create_borrow(self.test_user, datetime.date(2024, 3, 5), 10, 12)
+        self.create_borrow(self.test_user, datetime.date(2024, 4, 5), 12, 13)
+        # Borrows inserted in bulk are not counted by the signals
+        BorrowTool.objects.bulk_create([
+            BorrowTool(
+                tool=self.other_tool,
+                user=self.other_user,
+                date_borrow=datetime.date(2024, 3, 5),
+                start_time_borrow=0,
+                end_time_borrow=2,
+            )
+        ])
+        MonthlyUsage.objects.filter(month=datetime.date(2024, 4, 1)).update(hours=5)
+
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "2 écart(s) trouvé(s)"):
+            call_command("rebuild_monthly_usage", check=True, stdout=out)
+        self.assertIn("04/2024: enregistré 5.00 h / 1 emprunt(s), attendu 1.00 h / 1 emprunt(s)", out.getvalue())
+        self.assertIn("03/2024: enregistré -, attendu 2.00 h / 1 emprunt(s)", out.getvalue())
+
+        call_command("rebuild_monthly_usage", self.test_tool.id, stdout=out)
+        self.assertEqual(len(find_drift()), 1)
+        call_command("rebuild_monthly_usage", stdout=out)
+        self.assertIn("3 ligne(s) recalculée(s)", out.getvalue())
+        call_command("rebuild_monthly_usage", check=True, stdout=out)
+        self.assertIn("Aucun écart", out.getvalue())
+
+
 class ToolAccessModelTest(TestCase):
     """Unit tests for the model of ToolAccess"""
 
@@ -841,3 +1095,1960 @@ class ToolListViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
     
+
+    def test_export_streaming(self):
+        """Test the streaming export mode sends the same workbook by chunks"""
+        test_user = User.objects.get(username="testuser")
+        test_tool = AgriculturalTool.objects.get(id=1)
+        today = datetime.date.today()
+
+        BorrowTool.objects.create(
+            tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=10, end_time_borrow=12.5
+        )
+        BorrowTool.objects.create(
+            tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=12.5, end_time_borrow=14
+        )
+
+        response = self.client.post(
+            reverse("catalog:export_tool", kwargs={"tool_id": 1}),
+            data={
+                'start_date': today.strftime('%Y-%m-%d'),
+                'end_date': today.strftime('%Y-%m-%d'),
+                'stream': '1',
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        self.assertTrue(f'attachment; filename="{test_tool.name}_{today.strftime("%d_%m_%Y")}.xlsx"' in response["Content-Disposition"])
+
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], "Nom Prénom")
+        self.assertEqual(len(rows), 3)
+        # Most recent borrow first
+        self.assertEqual(rows[1][:5], ("testuser", today.strftime("%d/%m/%Y"), 12.5, 14, 1.5))
+        self.assertEqual(rows[1][5:], ("testuser", 4))
+        self.assertEqual(rows[2][5:], (None, None))
+
+    def test_export_query_count(self):
+        """Test the number of queries of the export does not depend on the number of borrows"""
+        test_tool = AgriculturalTool.objects.get(id=1)
+        today = datetime.date.today()
+        data = {'start_date': today.strftime('%Y-%m-%d'), 'end_date': today.strftime('%Y-%m-%d')}
+
+        for index in range(20):
+            user = User.objects.create(username=f"member{index}")
+            BorrowTool.objects.create(
+                tool=test_tool, user=user, date_borrow=today, start_time_borrow=index, end_time_borrow=index + 1
+            )
+
+        # Session, user, tool, savepoint, export batch, marked borrows, release, distinct members and borrows
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse("catalog:export_tool", kwargs={"tool_id": 1}), data=data)
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_summary_homonyms(self):
+        """Test the hours per person are computed per user, even when two users share the same name"""
+        test_tool = AgriculturalTool.objects.get(id=1)
+        first_user = User.objects.create(username="jdupont", first_name="Jean", last_name="Dupont")
+        second_user = User.objects.create(username="jdupont2", first_name="Jean", last_name="Dupont")
+        today = datetime.date.today()
+
+        BorrowTool.objects.create(tool=test_tool, user=first_user, date_borrow=today, start_time_borrow=0, end_time_borrow=2)
+        BorrowTool.objects.create(tool=test_tool, user=first_user, date_borrow=today, start_time_borrow=2, end_time_borrow=3)
+        BorrowTool.objects.create(tool=test_tool, user=second_user, date_borrow=today, start_time_borrow=3, end_time_borrow=7)
+
+        response = self.client.post(
+            reverse("catalog:export_tool", kwargs={"tool_id": 1}),
+            data={'start_date': today.strftime('%Y-%m-%d'), 'end_date': today.strftime('%Y-%m-%d')}
+        )
+        workbook = openpyxl.load_workbook(io.BytesIO(response.content))
+        rows = list(workbook.active.iter_rows(values_only=True))
+
+        self.assertEqual(rows[1][0], "Jean Dupont (jdupont2)")
+        self.assertEqual(rows[1][5:], ("Jean Dupont (jdupont)", 3))
+        self.assertEqual(rows[2][5:], ("Jean Dupont (jdupont2)", 4))
+        self.assertEqual(rows[3][5:], (None, None))
+
+    def test_export_summary_formulas(self):
+        """Test the summary can be written as formulas bounded to the rows of the export"""
+        test_user = User.objects.get(username="testuser")
+        test_tool = AgriculturalTool.objects.get(id=1)
+        today = datetime.date.today()
+
+        BorrowTool.objects.create(tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=0, end_time_borrow=2)
+        BorrowTool.objects.create(tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=2, end_time_borrow=3)
+
+        response = self.client.post(
+            reverse("catalog:export_tool", kwargs={"tool_id": 1}),
+            data={
+                'start_date': today.strftime('%Y-%m-%d'),
+                'end_date': today.strftime('%Y-%m-%d'),
+                'summary': 'formulas',
+            }
+        )
+        workbook = openpyxl.load_workbook(io.BytesIO(response.content))
+        rows = list(workbook.active.iter_rows(values_only=True))
+
+        self.assertEqual(rows[1][5:], ("testuser", '=SUMIFS($E$2:$E$3, $A$2:$A$3, "testuser")'))
+
+    def test_summary_formulas_escaped(self):
+        """Test the names in the summary formulas match exactly, whatever their quotes, wildcards and operators"""
+        rows = member_summary_rows(
+            [('Jean "Jeannot" Martin', 1), ("Jea* Mar?in~", 2), ("<Jean>", 3)], 4, summary=SUMMARY_FORMULAS
+        )
+        self.assertEqual(
+            [value for _, value in rows],
+            [
+                '=SUMIFS($E$2:$E$4, $A$2:$A$4, "Jean ""Jeannot"" Martin")',
+                '=SUMIFS($E$2:$E$4, $A$2:$A$4, "Jea~* Mar~?in~~")',
+                '=SUMIFS($E$2:$E$4, $A$2:$A$4, "=<Jean>")',
+            ],
+        )
+
+    def test_export_csv(self):
+        """Test the borrows can be streamed as a CSV file readable by Excel"""
+        test_user = User.objects.get(username="testuser")
+        test_tool = AgriculturalTool.objects.get(id=1)
+        today = datetime.date.today()
+        BorrowTool.objects.create(
+            tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=10, end_time_borrow=12.5,
+            comment="Pneu; avant",
+        )
+
+        response = self.client.post(
+            reverse("catalog:export_tool", kwargs={"tool_id": 1}),
+            data={'start_date': today.strftime('%Y-%m-%d'), 'end_date': today.strftime('%Y-%m-%d'), 'format': 'csv'}
+        )
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn(f'{test_tool.name}_{today.strftime("%d_%m_%Y")}.csv', response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(content.startswith("\ufeff"))
+        self.assertEqual(content[1:].splitlines(), [
+            "Date;Nom Prénom;Identifiant;Heure début;Heure fin;Durée (heures);Commentaire",
+            f'{today.strftime("%d/%m/%Y")};testuser;testuser;10.0;12.5;2.5;"Pneu; avant"',
+        ])
+
+    def test_export_jsonl(self):
+        """Test the borrows can be streamed as JSON Lines, one object per borrow"""
+        test_user = User.objects.get(username="testuser")
+        test_tool = AgriculturalTool.objects.get(id=1)
+        today = datetime.date.today()
+        for start_time in (0, 2):
+            BorrowTool.objects.create(
+                tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=start_time,
+                end_time_borrow=start_time + 2,
+            )
+
+        response = self.client.post(
+            reverse("catalog:export_tool", kwargs={"tool_id": 1}),
+            data={'start_date': today.strftime('%Y-%m-%d'), 'end_date': today.strftime('%Y-%m-%d'), 'format': 'jsonl'}
+        )
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["start_time"] for line in lines], [2, 0])
+        self.assertEqual(json.loads(lines[0]), {
+            "date": today.isoformat(), "name": "testuser", "username": "testuser",
+            "start_time": 2, "end_time": 4, "hours": 2, "comment": "",
+        })
+
+    def test_export_text_streaming(self):
+        """Test the header of a CSV export is sent before the borrows are read, in a single query"""
+        test_user = User.objects.get(username="testuser")
+        test_tool = AgriculturalTool.objects.get(id=1)
+        today = datetime.date.today()
+        BorrowTool.objects.bulk_create(
+            BorrowTool(tool=test_tool, user=test_user, date_borrow=today, start_time_borrow=index,
+                       end_time_borrow=index + 1)
+            for index in range(50)
+        )
+
+        response = self.client.post(
+            reverse("catalog:export_tool", kwargs={"tool_id": 1}),
+            data={'start_date': today.strftime('%Y-%m-%d'), 'end_date': today.strftime('%Y-%m-%d'), 'format': 'csv'}
+        )
+        content = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            self.assertTrue(next(content).decode("utf-8").startswith("\ufeffDate;"))
+        with self.assertNumQueries(1):
+            rows = b"".join(content).decode("utf-8").splitlines()
+        self.assertEqual(len(rows), 50)
+
+
+class ToolDetailViewTest(TestCase):
+    """Unit tests for the history of borrows displayed by ToolDetailView"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+        today = datetime.date.today()
+        # Two borrows share the same date and start time to check the order is total
+        cls.borrows = [
+            BorrowTool.objects.create(
+                tool=cls.test_tool,
+                user=cls.test_user,
+                date_borrow=today - datetime.timedelta(days=index // 2),
+                start_time_borrow=100 - 10 * (index // 3),
+                end_time_borrow=110,
+            )
+            for index in range(7)
+        ]
+
+    def setUp(self):
+        login_successful = self.client.login(username="testuser", password="testpassword")
+        self.assertTrue(login_successful)
+
+    def get_history(self):
+        """Browse all the pages of the history and return the displayed borrows"""
+        url = reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id})
+        response = self.client.get(url)
+        self.assertTrue(response.context["is_first_page"])
+        history = list(response.context["borrows"])
+        while response.context["next_cursor"]:
+            response = self.client.get(url, {"after": response.context["next_cursor"]})
+            self.assertFalse(response.context["is_first_page"])
+            history += response.context["borrows"]
+        return history
+
+    def test_history_pages(self):
+        """Test the history is split in pages, most recent first, without missing or repeated borrows"""
+        expected = sorted(
+            self.borrows, key=lambda borrow: (borrow.date_borrow, borrow.start_time_borrow, borrow.id), reverse=True
+        )
+        with mock.patch.object(ToolDetailView, "history_page_size", 2):
+            self.assertEqual(self.get_history(), expected)
+        with mock.patch.object(ToolDetailView, "history_page_size", 7):
+            self.assertEqual(self.get_history(), expected)
+
+    def test_load_more_link(self):
+        """Test the link to the next page is displayed only when there are more borrows"""
+        url = reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id})
+        with mock.patch.object(ToolDetailView, "history_page_size", 5):
+            response = self.client.get(url)
+            self.assertContains(response, 'id="load-more"')
+            response = self.client.get(url, {"after": response.context["next_cursor"]})
+            self.assertNotContains(response, 'id="load-more"')
+            self.assertEqual(len(response.context["borrows"]), 2)
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor displays the first page"""
+        url = reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id})
+        response = self.client.get(url, {"after": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["borrows"]), 7)
+
+    def test_query_count(self):
+        """Test the number of queries of a page does not depend on the size of the history"""
+        url = reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id})
+        # Session, user, tool with its manager, page of borrows with their users, borrows never exported
+        # and exports of the user
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+        for index in range(20):
+            user = User.objects.create(username=f"member{index}")
+            BorrowTool.objects.create(
+                tool=self.test_tool, user=user, date_borrow=datetime.date.today(), start_time_borrow=200, end_time_borrow=210
+            )
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is specific to SQLite")
+class IndexUsageTest(TestCase):
+    """Check the queries of the most frequent pages are served by the indexes of the catalog models"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_superuser(username="testuser", password="testpassword")
+        cls.other_user = User.objects.create_user(username="otheruser", password="otherpassword")
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+        ToolAccess.objects.create(user=cls.other_user, tool=cls.test_tool)
+        BorrowTool.objects.create(
+            tool=cls.test_tool,
+            user=cls.other_user,
+            date_borrow=datetime.date.today(),
+            start_time_borrow=10,
+            end_time_borrow=12,
+        )
+
+    def setUp(self):
+        login_successful = self.client.login(username="testuser", password="testpassword")
+        self.assertTrue(login_successful)
+
+    def query_plans(self, table, action):
+        """Run the action and return the query plan of each query it runs on the given table"""
+        with CaptureQueriesContext(connection) as queries:
+            action()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if sql.startswith("SELECT") and f'FROM "{table}"' in sql or sql.startswith(f'UPDATE "{table}"'):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.append(" | ".join(row[-1] for row in cursor.fetchall()))
+        self.assertTrue(plans, f"No query on {table}")
+        return plans
+
+    def assertIndexUsed(self, plans, index):
+        """Check each query plan searches the table with the given index"""
+        for plan in plans:
+            self.assertIn(f"INDEX {index}", plan)
+
+    def test_tool_history(self):
+        """
+        Test the history of a tool uses the index on tool and date, and the count of its borrows never exported
+        the partial index on these borrows
+        """
+        url = reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id})
+        plans = self.query_plans("catalog_borrowtool", lambda: self.client.get(url))
+        self.assertIndexUsed(plans[:-1], "borrow_tool_date_idx")
+        self.assertIndexUsed(plans[-1:], "borrow_pending_export_idx")
+
+    def test_export(self):
+        """
+        Test the export marks the borrows never exported using the partial index on these borrows, then reads all
+        the borrows using the index on tool and date
+        """
+        url = reverse("catalog:export_tool", kwargs={"tool_id": self.test_tool.id})
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        plans = self.query_plans(
+            "catalog_borrowtool", lambda: self.client.post(url, {"start_date": today, "end_date": today})
+        )
+        self.assertIndexUsed(plans[:1], "borrow_pending_export_idx")
+        self.assertIndexUsed(plans[1:], "borrow_tool_date_idx")
+
+    def test_export_pending(self):
+        """Test the export of the borrows never exported marks them using the partial index on these borrows"""
+        url = reverse("catalog:export_tool", kwargs={"tool_id": self.test_tool.id})
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        plans = self.query_plans(
+            "catalog_borrowtool",
+            lambda: self.client.post(url, {"start_date": today, "end_date": today, "pending_only": "on"}),
+        )
+        self.assertIndexUsed(plans[:1], "borrow_pending_export_idx")
+
+    def test_latest_meter_reading(self):
+        """Test the latest reading of the hour-meter of a tool uses the index on tool and end time"""
+        plans = self.query_plans("catalog_borrowtool", self.test_tool.update_meter_reading)
+        self.assertIndexUsed(plans, "borrow_tool_end_time_idx")
+
+    def test_user_borrows(self):
+        """Test the borrows of a user listed with their tool before deleting it use the index on user and date"""
+        url = reverse("users:userDelete", kwargs={"pk": self.other_user.id})
+        plans = self.query_plans("catalog_borrowtool", lambda: self.client.get(url))
+        # the check for any borrow of the user may use either index starting with the user
+        self.assertIndexUsed([plan for plan in plans if "catalog_agriculturaltool" in plan], "borrow_user_date_idx")
+
+    def test_user_history(self):
+        """Test the history of the borrows of a user and its totals use the index on user and date"""
+        self.client.login(username="otheruser", password="otherpassword")
+        plans = self.query_plans("catalog_borrowtool", lambda: self.client.get(reverse("catalog:user_borrows")))
+        self.assertIndexUsed(plans, "borrow_user_date_idx")
+
+    def test_tool_accesses(self):
+        """Test the list of the accesses of a tool uses the index on tool and user"""
+        url = reverse("catalog:tool_access_list", kwargs={"tool_id": self.test_tool.id})
+        plans = self.query_plans("catalog_toolaccess", lambda: self.client.get(url))
+        self.assertIndexUsed(plans, "toolaccess_tool_user_idx")
+
+
+class AccessibleToolsTest(TestCase):
+    """Unit tests for the tools listed by ToolListView"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.other_user = User.objects.create_user(username="otheruser", password="otherpassword")
+        cls.managed_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+        cls.shared_tool = AgriculturalTool.objects.create(name="Semoir", description="Semoir", user=cls.other_user)
+        cls.other_tool = AgriculturalTool.objects.create(name="Herse", description="Herse", user=cls.other_user)
+        ToolAccess.objects.create(user=cls.test_user, tool=cls.shared_tool)
+        # An access to a tool the user is in charge of must not list it twice
+        ToolAccess.objects.create(user=cls.test_user, tool=cls.managed_tool)
+
+    def setUp(self):
+        cache.clear()
+        login_successful = self.client.login(username="testuser", password="testpassword")
+        self.assertTrue(login_successful)
+
+    def get_tools(self):
+        """Return the tools listed for the test user"""
+        response = self.client.get(reverse("catalog:index"))
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["all_tools"])
+
+    def test_accessible_tools(self):
+        """Test the user sees the tools in charge and the tools given access to"""
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool])
+
+    def test_query_count(self):
+        """Test the number of queries does not depend on the number of tools, and the access is cached"""
+        for index in range(10):
+            tool = AgriculturalTool.objects.create(name=f"Outil {index}", description="Outil", user=self.other_user)
+            ToolAccess.objects.create(user=self.test_user, tool=tool)
+        # Session, user, accessible tools and tools with their manager
+        with self.assertNumQueries(4):
+            self.assertEqual(len(self.get_tools()), 12)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.get_tools()), 12)
+
+    def test_invalidate_on_access_change(self):
+        """Test the cached tools are updated when an access is given or removed"""
+        self.get_tools()
+        access = ToolAccess.objects.create(user=self.test_user, tool=self.other_tool)
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool, self.other_tool])
+        access.delete()
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool])
+
+    def test_invalidate_on_manager_change(self):
+        """Test the cached tools are updated when the user in charge of a tool changes"""
+        self.get_tools()
+        self.other_tool.user = self.test_user
+        self.other_tool.save()
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool, self.other_tool])
+        self.other_tool.user = self.other_user
+        self.other_tool.save()
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool])
+
+    def test_invalidate_on_new_tool(self):
+        """Test the cached tools are updated when a tool is created or deleted"""
+        self.get_tools()
+        new_tool = AgriculturalTool.objects.create(name="Faucheuse", description="Faucheuse", user=self.test_user)
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool, new_tool])
+        new_tool.delete()
+        self.assertEqual(self.get_tools(), [self.managed_tool, self.shared_tool])
+
+
+class ToolBoundViewsQueryTest(TestCase):
+    """Check the tool bound views fetch their tool or access only once per request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.other_user = User.objects.create_user(username="otheruser", password="otherpassword")
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+        cls.access = ToolAccess.objects.create(user=cls.other_user, tool=cls.test_tool)
+
+    def setUp(self):
+        login_successful = self.client.login(username="testuser", password="testpassword")
+        self.assertTrue(login_successful)
+
+    def test_borrow_create_view(self):
+        """Test the queries of the borrow form"""
+        url = reverse("catalog:borrow_tool", kwargs={"tool_id": self.test_tool.id})
+        # Session, user, tool with its manager and users of the form
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        data = {
+            "tool": self.test_tool.id,
+            "user": self.test_user.id,
+            "date_borrow": datetime.date.today().strftime("%Y-%m-%d"),
+            "start_time_borrow": 10,
+            "end_time_borrow": 12,
+        }
+        # Session, user, tool with its manager, validation of the tool and user fields and of their existence,
+        # saving the borrow, updating the meter reading of its tool and creating its monthly rollup in a transaction
+        with self.assertNumQueries(14):
+            response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("catalog:index"))
+
+    def test_tool_access_create_view(self):
+        """Test the queries of the form giving access to a tool"""
+        url = reverse("catalog:tool_access_add", kwargs={"tool_id": self.test_tool.id})
+        # Session, user, tool with its manager and users of the form
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        new_user = User.objects.create(username="newuser")
+        # Session, user, tool with its manager, validation of the user field and of its existence,
+        # and saving of the access
+        with self.assertNumQueries(6):
+            response = self.client.post(url, {"user": new_user.id})
+        self.assertRedirects(response, reverse("catalog:tool_access_list", kwargs={"tool_id": self.test_tool.id}))
+
+    def test_tool_access_delete_view(self):
+        """Test the queries of the deletion of an access"""
+        url = reverse("catalog:tool_access_delete", kwargs={"pk": self.access.id})
+        # Session, user and access with its user and tool
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # Session, user, access with its user and tool, and its deletion
+        with self.assertNumQueries(4):
+            response = self.client.post(url)
+        self.assertRedirects(response, reverse("catalog:tool_access_list", kwargs={"tool_id": self.test_tool.id}))
+
+
+def create_test_image(width=2000, height=1000, image_format="JPEG"):
+    """Return the content of an image generated for the tests"""
+    content = io.BytesIO()
+    Image.new("RGB", (width, height), "green").save(content, image_format)
+    return content.getvalue()
+
+
+class ImageVariantsTest(TestCase):
+    """Unit tests for the resized variants of the images of the tools"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        self.test_tool = AgriculturalTool.objects.create(
+            name="Tracteur",
+            description="Tracteur",
+            user=self.test_user,
+            image=SimpleUploadedFile("tracteur.jpg", create_test_image(), content_type="image/jpeg"),
+        )
+
+    def test_variants_created_on_upload(self):
+        """Test the variants are created when the image is uploaded, with their maximum size"""
+        storage = self.test_tool.image.storage
+        for variant, size in IMAGE_VARIANTS.items():
+            name = variant_name(self.test_tool.image, variant)
+            self.assertTrue(storage.exists(name))
+            with storage.open(name) as variant_file, Image.open(variant_file) as variant_image:
+                self.assertEqual(variant_image.size, (size, size // 2))
+
+    def test_variant_url(self):
+        """Test the url of a variant, created on first use when it is missing"""
+        name = variant_name(self.test_tool.image, "card")
+        self.test_tool.image.storage.delete(name)
+        self.assertEqual(variant_url(self.test_tool.image, "card"), self.test_tool.image.storage.url(name))
+        self.assertTrue(self.test_tool.image.storage.exists(name))
+
+    def test_unreadable_image(self):
+        """Test the url of the original image is used when it cannot be resized"""
+        with self.assertLogs("catalog.images", "WARNING"):
+            self.test_tool.image = SimpleUploadedFile("notice.jpg", b"not an image", content_type="image/jpeg")
+            self.test_tool.save()
+        with self.assertLogs("catalog.images", "WARNING"):
+            self.assertEqual(variant_url(self.test_tool.image, "card"), self.test_tool.image.url)
+
+    def test_generate_command(self):
+        """Test the command creating the missing variants of the existing images"""
+        self.test_tool.image.storage.delete(variant_name(self.test_tool.image, "icon"))
+
+        out = io.StringIO()
+        call_command("generate_image_variants", stdout=out)
+        self.assertIn("1 variante(s) créée(s)", out.getvalue())
+        call_command("generate_image_variants", "--force", stdout=out)
+        self.assertIn(f"{len(IMAGE_VARIANTS)} variante(s) créée(s)", out.getvalue())
+
+    def test_index_srcset(self):
+        """Test the cards of the catalog display the variants of the images"""
+        self.client.login(username="testuser", password="testpassword")
+        response = self.client.get(reverse("catalog:index"))
+        self.assertContains(response, f'src="{variant_url(self.test_tool.image, "card")}"')
+        self.assertContains(response, f'{variant_url(self.test_tool.image, "full")} 1600w')
+        self.assertNotContains(response, f'src="{self.test_tool.image.url}"')
+
+
+class ExportJobTest(TestCase):
+    """Unit tests for the exports built in the background"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.other_user = User.objects.create_user(username="otheruser", password="otherpassword")
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.test_user)
+        BorrowTool.objects.create(
+            tool=cls.test_tool,
+            user=cls.test_user,
+            date_borrow=datetime.date.today(),
+            start_time_borrow=10,
+            end_time_borrow=12,
+        )
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        login_successful = self.client.login(username="testuser", password="testpassword")
+        self.assertTrue(login_successful)
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        self.data = {"start_date": today, "end_date": today}
+
+    def create_job(self):
+        """Ask for an export of the test tool and return the response"""
+        return self.client.post(reverse("catalog:export_job_create", kwargs={"tool_id": self.test_tool.id}), self.data)
+
+    def test_create_job(self):
+        """Test a job is created and the user sent back to the tool page"""
+        response = self.create_job()
+        self.assertRedirects(response, reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id}))
+        job = ExportJob.objects.get()
+        self.assertEqual(job.user, self.test_user)
+        self.assertEqual(job.status, ExportJob.Status.PENDING)
+
+        response = self.client.get(reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id}))
+        self.assertContains(response, reverse("catalog:export_job_status", kwargs={"pk": job.id}))
+
+    @override_settings(EXPORT_JOBS_MAX_ACTIVE_PER_USER=1)
+    def test_active_jobs_limit(self):
+        """Test a user cannot have more active jobs than the limit"""
+        self.create_job()
+        self.create_job()
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        call_command("run_export_worker", "--once", stdout=io.StringIO())
+        self.create_job()
+        self.assertEqual(ExportJob.objects.count(), 2)
+
+    def test_worker(self):
+        """Test the worker builds the workbook, then available for download"""
+        self.create_job()
+        job = ExportJob.objects.get()
+        status_url = reverse("catalog:export_job_status", kwargs={"pk": job.id})
+        self.assertEqual(self.client.get(status_url).json()["download_url"], None)
+
+        out = io.StringIO()
+        call_command("run_export_worker", "--once", stdout=out)
+        self.assertIn(f"Export {job.id} terminé", out.getvalue())
+
+        download_url = self.client.get(status_url).json()["download_url"]
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(f'filename="{self.test_tool.name}_' in response["Content-Disposition"])
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(workbook.active["A2"].value, "testuser")
+
+    def test_worker_csv(self):
+        """Test the worker builds the file in the format chosen in the form"""
+        self.data["format"] = "csv"
+        self.create_job()
+        self.assertEqual(ExportJob.objects.get().format, "csv")
+        call_command("run_export_worker", "--once", stdout=io.StringIO())
+
+        job = ExportJob.objects.get()
+        self.assertTrue(job.filename.endswith(".csv"))
+        response = self.client.get(reverse("catalog:export_job_download", kwargs={"pk": job.id}))
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("testuser", lines[1])
+
+    def test_failed_job(self):
+        """Test an error while building the workbook is stored on the job"""
+        self.create_job()
+        with mock.patch("catalog.jobs.write_borrows_workbook", side_effect=ValueError("Erreur de test")):
+            call_command("run_export_worker", "--once", stdout=io.StringIO(), stderr=io.StringIO())
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, ExportJob.Status.FAILED)
+        self.assertEqual(job.error, "Erreur de test")
+
+    def test_other_user(self):
+        """Test the jobs of a user cannot be seen or downloaded by another user"""
+        self.create_job()
+        call_command("run_export_worker", "--once", stdout=io.StringIO())
+        job = ExportJob.objects.get()
+
+        self.client.login(username="otheruser", password="otherpassword")
+        self.assertEqual(self.client.get(reverse("catalog:export_job_status", kwargs={"pk": job.id})).status_code, 404)
+        self.assertEqual(self.client.get(reverse("catalog:export_job_download", kwargs={"pk": job.id})).status_code, 404)
+
+    def test_cleanup(self):
+        """Test the expired jobs are deleted with their file and the interrupted jobs marked as failed"""
+        self.create_job()
+        call_command("run_export_worker", "--once", stdout=io.StringIO())
+        job = ExportJob.objects.get()
+        storage, name = job.file.storage, job.file.name
+        self.assertTrue(storage.exists(name))
+        interrupted = ExportJob.objects.create(
+            user=self.test_user,
+            tool=self.test_tool,
+            start_date=datetime.date.today(),
+            end_date=datetime.date.today(),
+            status=ExportJob.Status.RUNNING,
+            started_at=timezone.now(),
+        )
+
+        self.assertEqual(cleanup_jobs(), 0)
+        self.assertEqual(ExportJob.objects.get(id=interrupted.id).status, ExportJob.Status.RUNNING)
+        self.assertEqual(cleanup_jobs(timezone.now() + datetime.timedelta(hours=2)), 0)
+        self.assertEqual(ExportJob.objects.get(id=interrupted.id).status, ExportJob.Status.FAILED)
+        self.assertTrue(storage.exists(name))
+
+        self.assertEqual(cleanup_jobs(timezone.now() + datetime.timedelta(days=8)), 2)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertFalse(storage.exists(name))
+
+
+@override_settings(EXPORT_JOBS_MAX_ACTIVE_PER_USER=100)
+class BorrowImportTest(TestCase):
+    """Unit tests for the import of the borrows of a tool from XLSX and CSV files"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword")
+        cls.member = User.objects.create_user(
+            username="member", password="memberpassword", first_name="Jean", last_name="Martin"
+        )
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        BorrowTool.objects.create(
+            tool=cls.test_tool,
+            user=cls.member,
+            date_borrow=datetime.date(2024, 3, 1),
+            start_time_borrow=100,
+            end_time_borrow=110,
+        )
+
+    def setUp(self):
+        self.url = reverse("catalog:borrow_import", kwargs={"tool_id": self.test_tool.id})
+        self.client.login(username="manager", password="managerpassword")
+
+    def csv_file(self, lines, name="carnet.csv"):
+        """Return an uploaded CSV file with the given lines, separated by semicolons as written by Excel"""
+        content = "\n".join(";".join(str(cell) for cell in line) for line in lines)
+        return SimpleUploadedFile(name, content.encode("utf-8-sig"), content_type="text/csv")
+
+    def xlsx_file(self, rows):
+        """Return an uploaded XLSX file with the given rows"""
+        workbook = openpyxl.Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        content = io.BytesIO()
+        workbook.save(content)
+        return SimpleUploadedFile("carnet.xlsx", content.getvalue())
+
+    def test_import_csv(self):
+        """Test the valid rows of a CSV file are imported, and the others reported by line"""
+        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).strftime("%d/%m/%Y")
+        upload = self.csv_file([
+            ["Membre", "Date", "Heure début", "Heure fin", "Commentaire"],
+            ["member", "02/03/2024", "110", "112,5", "Labour"],
+            ["Jean Martin", "2024-03-05", "112,5", "115", ""],
+            ["inconnu", "06/03/2024", "115", "116", ""],
+            ["member", tomorrow, "116", "117", ""],
+            ["member", "07/03/2024", "120", "119", ""],
+            ["member", "08/03/2024", "105", "108", ""],
+            ["", "", "", "", ""],
+            ["manager", "09/03/2024", "114", "118", ""],
+        ])
+        response = self.client.post(self.url, {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["import_errors"], {
+            4: ["Membre inconnu: inconnu"],
+            5: ["La date ne peut pas être dans le futur"],
+            6: ["L'heure de fin doit être supérieure à l'heure de début"],
+            7: ["Le compteur (105.0 - 108.0) chevauche l'emprunt existant du 01/03/2024 (100.0 - 110.0)"],
+            9: ["Le compteur (114.0 - 118.0) chevauche la ligne 3 (112.5 - 115.0)"],
+        })
+        self.assertContains(response, "2 emprunt(s) importé(s)")
+
+        borrows = BorrowTool.objects.filter(start_time_borrow__gte=110).order_by("start_time_borrow")
+        self.assertEqual(
+            [(borrow.user, borrow.date_borrow, borrow.end_time_borrow, borrow.comment) for borrow in borrows],
+            [
+                (self.member, datetime.date(2024, 3, 2), 112.5, "Labour"),
+                (self.member, datetime.date(2024, 3, 5), 115, None),
+            ],
+        )
+        # The meter reading and the rollups are updated although the borrows are inserted in bulk
+        self.assertEqual(AgriculturalTool.objects.get(id=self.test_tool.id).meter_reading, 115)
+        self.assertEqual(find_drift(), [])
+
+    def test_import_xlsx(self):
+        """Test an export of the tool can be imported back, and is then rejected as already imported"""
+        rows = [
+            ["Nom Prénom", "Date", "Heure début", "Heure fin", "Durée (heures)"],
+            ["Jean Martin", datetime.datetime(2024, 3, 2), 110, 111, 1],
+            ["manager", "03/03/2024", 111, 112.5, 1.5],
+        ]
+        response = self.client.post(self.url, {"file": self.xlsx_file(rows)})
+        self.assertRedirects(response, reverse("catalog:tool_detail", kwargs={"pk": self.test_tool.id}))
+        self.assertEqual(BorrowTool.objects.filter(tool=self.test_tool).count(), 3)
+
+        response = self.client.post(self.url, {"file": self.xlsx_file(rows)})
+        self.assertEqual(sorted(response.context["import_errors"]), [2, 3])
+        self.assertEqual(BorrowTool.objects.filter(tool=self.test_tool).count(), 3)
+
+    def test_invalid_file(self):
+        """Test the files which cannot be imported are rejected as a whole"""
+        for upload, error in [
+            (SimpleUploadedFile("carnet.txt", b"texte"), "Le fichier doit être au format Excel (.xlsx) ou CSV"),
+            (SimpleUploadedFile("carnet.xlsx", b"texte"), "Le fichier Excel ne peut pas être lu"),
+            (self.csv_file([["Membre", "Date"], ["member", "02/03/2024"]]), "Colonnes manquantes"),
+        ]:
+            with self.subTest(name=upload.name):
+                response = self.client.post(self.url, {"file": upload})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, error)
+        self.assertEqual(BorrowTool.objects.count(), 1)
+
+    def test_only_manager(self):
+        """Test the import is reserved to the manager of the tool and to the staff"""
+        self.client.login(username="member", password="memberpassword")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class MeterAnomalyTest(TestCase):
+    """Unit tests for the detection of the overlaps and gaps of the hour-meter readings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword")
+        cls.member = User.objects.create_user(username="member", password="memberpassword")
+        cls.staff = User.objects.create_user(username="staff", password="staffpassword", is_staff=True)
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        cls.other_tool = AgriculturalTool.objects.create(name="Semoir", description="Semoir", user=cls.member)
+        cls.borrows = {}
+        for name, tool, start_time, end_time in [
+            ("first", cls.test_tool, 0, 10),
+            ("second", cls.test_tool, 10, 12),
+            # overlaps the second one
+            ("overlap", cls.test_tool, 11.5, 13),
+            # within the first one
+            ("inside", cls.test_tool, 2, 3),
+            # leaves a gap of 2 hours after the overlap
+            ("gap", cls.test_tool, 15, 16),
+            # small difference of rounding
+            ("rounded", cls.test_tool, 16.02, 17),
+            # the readings of the other tool are compared separately
+            ("other", cls.other_tool, 100, 110),
+            ("other_next", cls.other_tool, 110, 111),
+        ]:
+            cls.borrows[name] = BorrowTool.objects.create(
+                tool=tool,
+                user=cls.member,
+                date_borrow=datetime.date(2024, 3, 1),
+                start_time_borrow=start_time,
+                end_time_borrow=end_time,
+            )
+
+    def summarize(self, anomalies):
+        """Return the kind, borrows and hours of each anomaly"""
+        names = {borrow.id: name for name, borrow in self.borrows.items()}
+        return [
+            (anomaly.kind, names[anomaly.previous.id], names[anomaly.borrow.id], round(anomaly.hours, 2))
+            for anomaly in anomalies
+        ]
+
+    def test_scan_anomalies(self):
+        """Test the overlaps and gaps are found by comparing each borrow to the one reaching the highest reading"""
+        self.assertEqual(self.summarize(scan_anomalies()), [
+            ("overlap", "first", "inside", 1),
+            ("overlap", "second", "overlap", 0.5),
+            ("gap", "overlap", "gap", 2),
+        ])
+        self.assertEqual(self.summarize(scan_anomalies(min_gap=0)), [
+            ("overlap", "first", "inside", 1),
+            ("overlap", "second", "overlap", 0.5),
+            ("gap", "overlap", "gap", 2),
+            ("gap", "gap", "rounded", 0.02),
+        ])
+        self.assertEqual(self.summarize(scan_anomalies(BorrowTool.objects.filter(tool=self.other_tool))), [])
+
+    def test_scan_query(self):
+        """Test the borrows are streamed in the order of the index on tool, start and end times"""
+        with CaptureQueriesContext(connection) as queries:
+            list(scan_anomalies())
+        self.assertEqual(len(queries), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            plan = " | ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("INDEX borrow_tool_start_time_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_tool_anomaly_view(self):
+        """Test the anomalies of a tool are shown to its manager and to the staff only"""
+        url = reverse("catalog:tool_anomalies", kwargs={"tool_id": self.test_tool.id})
+        self.client.login(username="member", password="memberpassword")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username="manager", password="managerpassword")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["anomalies"]), 3)
+        self.assertContains(response, "Chevauchement", count=2)
+        self.assertContains(response, "01/03/2024 - member (11.5 - 13.0)")
+
+        url = reverse("catalog:tool_anomalies", kwargs={"tool_id": self.other_tool.id})
+        self.client.login(username="member", password="memberpassword")
+        self.assertContains(self.client.get(url), "Aucune anomalie")
+
+    def test_coop_anomaly_view(self):
+        """Test the anomalies of all the tools are shown to the staff only, up to a maximum"""
+        url = reverse("catalog:coop_anomalies")
+        self.client.login(username="manager", password="managerpassword")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username="staff", password="staffpassword")
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["anomalies"]), 3)
+        self.assertFalse(response.context["truncated"])
+        with mock.patch.object(CoopAnomalyView, "max_anomalies", 2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["anomalies"]), 2)
+        self.assertContains(response, "Seules les 2 premières anomalies sont affichées")
+
+    def test_command(self):
+        """Test the command listing the anomalies"""
+        out = io.StringIO()
+        call_command("check_meter_anomalies", stdout=out)
+        output = out.getvalue()
+        self.assertIn(
+            f"Outil {self.test_tool.id}: chevauchement de 0.50 h entre l'emprunt {self.borrows['second'].id} "
+            f"du 01/03/2024 (10.0 - 12.0) et l'emprunt {self.borrows['overlap'].id} du 01/03/2024 (11.5 - 13.0)",
+            output,
+        )
+        self.assertIn(f"Outil {self.test_tool.id}: 2 chevauchement(s), 1 trou(s)", output)
+        self.assertIn("3 anomalie(s) sur 1 outil(s)", output)
+
+        out = io.StringIO()
+        call_command("check_meter_anomalies", self.test_tool.id, no_gaps=True, summary=True, stdout=out)
+        self.assertNotIn("entre l'emprunt", out.getvalue())
+        self.assertIn(f"Outil {self.test_tool.id}: 2 chevauchement(s), 0 trou(s)", out.getvalue())
+
+
+class LegacyDumpTest(TestCase):
+    """Unit tests for the import of the dump of the PHP version"""
+
+    def test_iter_rows(self):
+        """Test the rows are parsed from statements written on one or several lines, with escaped strings"""
+        dump = io.StringIO(
+            "CREATE TABLE `materiels` (`id` int(11) NOT NULL);\n"
+            "INSERT INTO `materiels` (`id`, `nom_materiel`) VALUES\n"
+            "(1, 'Charrue; l\\'ancienne'),\n"
+            "(2, NULL);\n"
+            "INSERT INTO `heures_utilisation` (`ID`, `heure_debut`, `commentaires`) VALUES "
+            "(1, 12.5, 'Ligne\\ncoupée'), (2, -1e2, 'C''est fini');\n"
+        )
+        self.assertEqual(list(iter_rows(dump)), [
+            ("materiels", {"id": 1, "nom_materiel": "Charrue; l'ancienne"}),
+            ("materiels", {"id": 2, "nom_materiel": None}),
+            ("heures_utilisation", {"ID": 1, "heure_debut": 12.5, "commentaires": "Ligne\ncoupée"}),
+            ("heures_utilisation", {"ID": 2, "heure_debut": -100.0, "commentaires": "C'est fini"}),
+        ])
+        dump.seek(0)
+        self.assertEqual(len(list(iter_rows(dump, tables={"materiels"}))), 2)
+
+        with self.assertRaisesMessage(DumpError, "Ligne 2: la ligne ne compte pas 2 valeurs"):
+            list(iter_rows(["INSERT INTO `materiels` (`id`, `nom`) VALUES\n", "(1);\n"]))
+        with self.assertRaisesMessage(DumpError, "Ligne 1: valeur non reconnue dans la table materiels"):
+            list(iter_rows(["INSERT INTO `materiels` (`id`) VALUES (now());\n"]))
+
+    def test_import_command(self):
+        """Test the members, tools and borrows of the dump are imported once"""
+        out = io.StringIO()
+        call_command("import_legacy_dump", borrow_date=datetime.date(2024, 1, 10), stdout=out)
+        self.assertIn("Emprunts: 12 créé(s)", out.getvalue())
+
+        admin = User.objects.get(username="admin")
+        self.assertEqual((admin.first_name, admin.last_name), ("Antoine", "Bachelet"))
+        self.assertFalse(admin.has_usable_password())
+        tool = AgriculturalTool.objects.get(legacy_id=2)
+        self.assertEqual((tool.name, tool.user), ("Déchaummeur", admin))
+        self.assertEqual(tool.meter_reading, 156)
+        borrow = BorrowTool.objects.get(legacy_id=1)
+        self.assertEqual(
+            (borrow.tool, borrow.user, borrow.date_borrow, borrow.start_time_borrow, borrow.comment),
+            (tool, admin, datetime.date(2024, 1, 10), 120, "Test commentaire"),
+        )
+        self.assertIsNone(BorrowTool.objects.get(legacy_id=4).comment)
+        self.assertEqual(find_drift(), [])
+
+        out = io.StringIO()
+        call_command("import_legacy_dump", stdout=out)
+        self.assertIn("Membres: 0 créé(s)", out.getvalue())
+        self.assertIn("Outils: 0 créé(s)", out.getvalue())
+        self.assertIn("Emprunts: 0 créé(s)", out.getvalue())
+        self.assertEqual(BorrowTool.objects.count(), 12)
+
+    def test_import_mapping(self):
+        """Test the legacy members and tools can be mapped to existing ones"""
+        member = User.objects.create_user(username="abachelet", password="password")
+        charrue = AgriculturalTool.objects.create(name="Charrue 5 socs", description="Charrue", user=member)
+        out = io.StringIO()
+        call_command(
+            "import_legacy_dump", user_map=["admin=abachelet"], tool_map=[f"1={charrue.id}"], stdout=out
+        )
+        self.assertFalse(User.objects.filter(username="admin").exists())
+        self.assertEqual(AgriculturalTool.objects.count(), 2)
+        self.assertEqual(AgriculturalTool.objects.get(id=charrue.id).legacy_id, 1)
+        self.assertEqual(BorrowTool.objects.filter(tool=charrue, user=member).count(), 2)
+        self.assertEqual(BorrowTool.objects.filter(user__username="test").count(), 2)
+
+        with self.assertRaisesMessage(CommandError, "Membres inconnus dans --user-map: inconnu"):
+            call_command("import_legacy_dump", user_map=["admin=inconnu"], stdout=out)
+
+
+class ToolsExportTest(TestCase):
+    """Unit tests for the export of the borrows of several tools"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="staff", password="staffpassword", is_staff=True)
+        cls.member = User.objects.create_user(
+            username="member", password="memberpassword", first_name="Jean", last_name="Martin"
+        )
+        cls.tractor = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.staff)
+        cls.seeder = AgriculturalTool.objects.create(name="Semoir [6 m]", description="Semoir", user=cls.staff)
+        cls.unused = AgriculturalTool.objects.create(name="Herse", description="Herse", user=cls.staff)
+        today = datetime.date.today()
+        for tool, user, start_time, end_time in [
+            (cls.tractor, cls.member, 10, 12),
+            (cls.tractor, cls.staff, 12, 13.5),
+            (cls.seeder, cls.member, 0, 4),
+        ]:
+            BorrowTool.objects.create(
+                tool=tool, user=user, date_borrow=today, start_time_borrow=start_time, end_time_borrow=end_time
+            )
+        cls.dates = {"start_date": today.strftime("%Y-%m-%d"), "end_date": today.strftime("%Y-%m-%d")}
+
+    def setUp(self):
+        self.url = reverse("catalog:export_tools")
+        self.client.login(username="staff", password="staffpassword")
+
+    def load_workbook(self, response):
+        """Return the workbook sent by a response"""
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        return openpyxl.load_workbook(io.BytesIO(content))
+
+    def test_export_all_tools(self):
+        """Test every tool with borrows has its sheet, after the summary of the hours of each member"""
+        response = self.client.post(self.url, {**self.dates, "stream": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("export_outils_", response["Content-Disposition"])
+        workbook = self.load_workbook(response)
+        self.assertEqual(workbook.sheetnames, ["Synthèse", "Semoir _6 m_", "Tracteur"])
+        self.assertEqual(list(workbook["Synthèse"].values), [
+            ("Outil", "Nom Prénom", "Nombre d'emprunts", "Total heures"),
+            ("Semoir [6 m]", "Jean Martin", 1, 4),
+            ("Tracteur", "Jean Martin", 1, 2),
+            ("Tracteur", "staff", 1, 1.5),
+            ("Total", None, 3, 7.5),
+        ])
+        rows = list(workbook["Tracteur"].values)
+        self.assertEqual(rows[0][:5], ("Nom Prénom", "Date", "Heure début", "Heure fin", "Durée (heures)"))
+        self.assertEqual([row[2:] for row in rows[1:]], [(12, 13.5, 1.5, "Jean Martin", 2), (10, 12, 2, "staff", 1.5)])
+
+    def test_export_selected_tools(self):
+        """Test only the selected tools are exported, with the summary written as formulas if asked"""
+        response = self.client.post(self.url, {**self.dates, "tools": [self.seeder.id], "summary": "formulas"})
+        workbook = self.load_workbook(response)
+        self.assertEqual(workbook.sheetnames, ["Synthèse", "Semoir _6 m_"])
+        self.assertEqual(workbook["Semoir _6 m_"]["G2"].value, '=SUMIFS($E$2:$E$2, $A$2:$A$2, "Jean Martin")')
+
+    def test_export_queries(self):
+        """Test the borrows of all the tools are read in one query, whatever the number of tools"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, self.dates)
+        borrow_queries = [query["sql"] for query in queries if 'FROM "catalog_borrowtool"' in query["sql"]]
+        # the names of the members, the totals of each tool, and the borrows with their tool
+        self.assertEqual(len(borrow_queries), 3)
+        self.assertIn('INNER JOIN "catalog_agriculturaltool"', borrow_queries[-1])
+
+    def test_export_all_tools_csv(self):
+        """Test the borrows of all the tools can be streamed as CSV, grouped by tool"""
+        response = self.client.post(self.url, {**self.dates, "format": "csv"})
+        self.assertIn("export_outils_", response["Content-Disposition"])
+        rows = [line.split(";") for line in b"".join(response.streaming_content).decode("utf-8-sig").splitlines()]
+        self.assertEqual(rows[0][:3], ["Outil", "Date", "Nom Prénom"])
+        self.assertEqual([(row[0], row[2]) for row in rows[1:]], [
+            ("Semoir [6 m]", "Jean Martin"), ("Tracteur", "staff"), ("Tracteur", "Jean Martin"),
+        ])
+
+    def test_sheet_title(self):
+        """Test the titles of the sheets are valid and unique"""
+        used_titles = set()
+        self.assertEqual(sheet_title("Herse: 3/4", used_titles), "Herse_ 3_4")
+        self.assertEqual(sheet_title("herse: 3/4", used_titles), "herse_ 3_4 (2)")
+        self.assertEqual(len(sheet_title("x" * 40, used_titles)), 31)
+
+    def test_only_staff(self):
+        """Test the export of several tools is reserved to the staff"""
+        self.client.login(username="member", password="memberpassword")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.post(self.url, self.dates).status_code, 403)
+
+
+class ExportBatchTest(TestCase):
+    """Unit tests for the tracking of the borrows already exported"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword", is_staff=True)
+        cls.tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        cls.today = datetime.date.today()
+        cls.dates = {"start_date": cls.today.strftime("%Y-%m-%d"), "end_date": cls.today.strftime("%Y-%m-%d")}
+
+    def setUp(self):
+        self.client.login(username="manager", password="managerpassword")
+        self.url = reverse("catalog:export_tool", kwargs={"tool_id": self.tool.id})
+
+    def borrow(self, start_time):
+        """Create a borrow of the tool starting at the given hour"""
+        return BorrowTool.objects.create(
+            tool=self.tool, user=self.manager, date_borrow=self.today, start_time_borrow=start_time,
+            end_time_borrow=start_time + 1,
+        )
+
+    def exported_start_times(self, response):
+        """Return the start times of the borrows of a JSON Lines export"""
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        return [json.loads(line)["start_time"] for line in lines]
+
+    def test_export_marks_borrows(self):
+        """Test an export records a batch and marks the exported borrows with it"""
+        first, second = self.borrow(0), self.borrow(1)
+        response = self.client.post(self.url, {**self.dates, "format": "jsonl"})
+        self.assertEqual(self.exported_start_times(response), [1, 0])
+
+        batch = ExportBatch.objects.get()
+        self.assertEqual((batch.user, batch.start_date, batch.pending_only), (self.manager, self.today, False))
+        self.assertEqual(set(batch.borrows.all()), {first, second})
+
+    def test_export_pending_only(self):
+        """Test only the borrows never exported are exported when asked, while a full export includes all"""
+        self.borrow(0)
+        self.client.post(self.url, self.dates)
+        self.borrow(1)
+
+        response = self.client.post(self.url, {**self.dates, "format": "jsonl", "pending_only": "on"})
+        self.assertEqual(self.exported_start_times(response), [1])
+        response = self.client.post(self.url, {**self.dates, "format": "jsonl", "pending_only": "on"})
+        self.assertEqual(self.exported_start_times(response), [])
+        response = self.client.post(self.url, {**self.dates, "format": "jsonl"})
+        self.assertEqual(self.exported_start_times(response), [1, 0])
+
+    def test_first_batch_kept(self):
+        """Test a later export keeps the borrows in the batch they were first exported with"""
+        first = self.borrow(0)
+        self.client.post(self.url, self.dates)
+        first_batch = ExportBatch.objects.get()
+        second = self.borrow(1)
+        response = self.client.post(self.url, {**self.dates, "format": "jsonl"})
+        self.assertEqual(self.exported_start_times(response), [1, 0])
+
+        second_batch = ExportBatch.objects.exclude(pk=first_batch.pk).get()
+        self.assertEqual(list(first_batch.borrows.all()), [first])
+        self.assertEqual(list(second_batch.borrows.all()), [second])
+
+    def test_failed_job_not_marked(self):
+        """Test the borrows of an export built in the background are not marked as exported when it fails"""
+        self.borrow(0)
+        job = ExportJob.objects.create(
+            user=self.manager, tool=self.tool, start_date=self.today, end_date=self.today,
+            status=ExportJob.Status.RUNNING,
+        )
+        with mock.patch("catalog.jobs.write_borrows_workbook", side_effect=ValueError("Erreur de test")):
+            run_job(job)
+        self.assertEqual(job.status, ExportJob.Status.FAILED)
+        self.assertFalse(ExportBatch.objects.exists())
+        self.assertTrue(BorrowTool.objects.filter(export_batch__isnull=True).exists())
+
+    def test_failed_export_not_marked(self):
+        """Test the borrows are not marked as exported when a direct export fails or is not sent to its end"""
+        self.borrow(0)
+        self.borrow(1)
+        with mock.patch("catalog.views.write_borrows_workbook", side_effect=ValueError("Erreur de test")):
+            with self.assertRaises(ValueError):
+                self.client.post(self.url, self.dates)
+        self.assertFalse(ExportBatch.objects.exists())
+
+        for data in ({"format": "jsonl"}, {"stream": "1"}):
+            response = self.client.post(self.url, {**self.dates, **data})
+            self.assertTrue(ExportBatch.objects.exists())
+            # Connection closed by the client after the first chunk
+            next(iter(response.streaming_content))
+            response.close()
+            self.assertFalse(ExportBatch.objects.exists())
+            self.assertFalse(BorrowTool.objects.filter(export_batch__isnull=False).exists())
+
+        response = self.client.post(self.url, {**self.dates, "format": "jsonl"})
+        self.assertEqual(self.exported_start_times(response), [1, 0])
+        self.assertEqual(ExportBatch.objects.get().borrows.count(), 2)
+
+    def test_member_cannot_export(self):
+        """Test a member neither in charge of the tool nor staff cannot export it and mark its borrows"""
+        self.borrow(0)
+        User.objects.create_user(username="member", password="memberpassword")
+        self.client.login(username="member", password="memberpassword")
+        self.assertEqual(self.client.post(self.url, self.dates).status_code, 403)
+        job_url = reverse("catalog:export_job_create", kwargs={"tool_id": self.tool.id})
+        self.assertEqual(self.client.post(job_url, self.dates).status_code, 403)
+        self.assertFalse(ExportBatch.objects.exists())
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_pending_count(self):
+        """Test the manager sees the number of borrows never exported, again pending when their batch is deleted"""
+        self.borrow(0)
+        self.client.post(self.url, self.dates)
+        self.borrow(1)
+        detail_url = reverse("catalog:tool_detail", kwargs={"pk": self.tool.id})
+        self.assertEqual(self.client.get(detail_url).context["pending_export_count"], 1)
+
+        ExportBatch.objects.all().delete()
+        self.assertEqual(self.client.get(detail_url).context["pending_export_count"], 2)
+
+    def test_job_pending_only(self):
+        """Test an export built in the background can be limited to the borrows never exported"""
+        self.borrow(0)
+        self.client.post(reverse("catalog:export_tools"), self.dates)
+        self.borrow(1)
+        job = ExportJob.objects.create(
+            user=self.manager, tool=self.tool, start_date=self.today, end_date=self.today, pending_only=True,
+            status=ExportJob.Status.RUNNING,
+        )
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            run_job(job)
+            rows = list(openpyxl.load_workbook(job.file.path).active.iter_rows(values_only=True))
+        self.assertEqual(job.status, ExportJob.Status.DONE)
+        self.assertEqual([row[2] for row in rows[1:]], [1])
+        self.assertFalse(BorrowTool.objects.filter(export_batch__isnull=True).exists())
+
+
+class UserBorrowsTest(TestCase):
+    """Unit tests for the history of the borrows of the connected user"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create_user(username="member", password="memberpassword")
+        cls.other = User.objects.create_user(username="other", password="otherpassword")
+        cls.tractor = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.other)
+        cls.seeder = AgriculturalTool.objects.create(name="Semoir", description="Semoir", user=cls.other)
+        cls.today = datetime.date.today()
+        cls.last_year = cls.today.replace(year=cls.today.year - 1, month=6, day=1)
+        for tool, user, date_borrow, start_time in [
+            (cls.tractor, cls.member, cls.today, 0),
+            (cls.tractor, cls.member, cls.today, 2),
+            (cls.seeder, cls.member, cls.today, 0),
+            (cls.tractor, cls.other, cls.today, 10),
+            (cls.tractor, cls.member, cls.last_year, 5),
+        ]:
+            BorrowTool.objects.create(
+                tool=tool, user=user, date_borrow=date_borrow, start_time_borrow=start_time,
+                end_time_borrow=start_time + 1.5,
+            )
+
+    def setUp(self):
+        self.url = reverse("catalog:user_borrows")
+        self.client.login(username="member", password="memberpassword")
+
+    def test_current_season(self):
+        """Test the borrows of the user during the current season are listed by default, with their totals"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([borrow.start_time_borrow for borrow in response.context["borrows"]], [2, 0, 0])
+        self.assertEqual(
+            [(total["tool__name"], total["hours"], total["borrow_count"]) for total in response.context["totals"]],
+            [("Semoir", 1.5, 1), ("Tracteur", 3, 2)],
+        )
+        self.assertEqual((response.context["total_hours"], response.context["total_count"]), (4.5, 3))
+
+    def test_filters(self):
+        """Test the history can be filtered by dates and tool, among the tools borrowed by the user"""
+        response = self.client.get(self.url, {"start_date": "", "tool": self.tractor.id})
+        dates = [borrow.date_borrow for borrow in response.context["borrows"]]
+        self.assertEqual(dates, [self.today, self.today, self.last_year])
+        self.assertEqual(list(response.context["form"].fields["tool"].queryset), [self.seeder, self.tractor])
+        # The tools borrowed are read from the rollups of the user, without joining and deduplicating the borrows
+        sql = str(response.context["form"].fields["tool"].queryset.query)
+        self.assertIn("catalog_monthlyusage", sql)
+        self.assertNotIn("DISTINCT", sql)
+        self.assertNotIn("JOIN", sql)
+
+        end_date = self.last_year.isoformat()
+        response = self.client.get(self.url, {"start_date": "", "end_date": end_date})
+        self.assertEqual(len(response.context["borrows"]), 1)
+        self.assertEqual(response.context["total_count"], 1)
+
+    def test_pagination(self):
+        """Test the next pages of the history keep the filters"""
+        with mock.patch.object(UserBorrowsView, "history_page_size", 2):
+            response = self.client.get(self.url, {"tool": self.tractor.id, "start_date": ""})
+            self.assertEqual(len(response.context["borrows"]), 2)
+            response = self.client.get(f"{self.url}?{response.context['next_query']}")
+        self.assertEqual([borrow.date_borrow for borrow in response.context["borrows"]], [self.last_year])
+        self.assertNotIn("next_query", response.context)
+
+    def test_login_required(self):
+        """Test the history is reserved to the connected users"""
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class FragmentCacheTest(TestCase):
+    """Unit tests for the fragments of the catalog and tool pages kept in cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword")
+        cls.member = User.objects.create_user(username="member", password="memberpassword")
+        cls.tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        ToolAccess.objects.create(user=cls.member, tool=cls.tool)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="member", password="memberpassword")
+        self.index_url = reverse("catalog:index")
+        self.detail_url = reverse("catalog:tool_detail", kwargs={"pk": self.tool.id})
+
+    def test_index_cached(self):
+        """Test the tools are not read again while the list rendered for the user is in cache"""
+        self.client.get(self.index_url)
+        # Session and user, the accessible tools and the rendered list being in cache
+        with self.assertNumQueries(2):
+            response = self.client.get(self.index_url)
+        self.assertContains(response, "Tracteur")
+
+    def test_tool_changed(self):
+        """Test the card and details of a tool are rendered again when the tool is saved"""
+        self.client.get(self.index_url)
+        self.client.get(self.detail_url)
+        self.tool.name = "Tracteur 4RM"
+        self.tool.save()
+        self.assertContains(self.client.get(self.index_url), "Tracteur 4RM")
+        self.assertContains(self.client.get(self.detail_url), "Tracteur 4RM")
+
+    def test_borrow_changed(self):
+        """Test the meter reading and history of a tool are rendered again when a borrow is saved or deleted"""
+        self.client.get(self.index_url)
+        self.client.get(self.detail_url)
+        borrow = BorrowTool.objects.create(
+            tool=self.tool, user=self.member, date_borrow=datetime.date.today(), start_time_borrow=10,
+            end_time_borrow=12.5, comment="Labour",
+        )
+        self.assertContains(self.client.get(self.index_url), "Compteur: 12.5 h")
+        self.assertContains(self.client.get(self.detail_url), "Labour")
+
+        borrow.delete()
+        self.assertNotContains(self.client.get(self.index_url), "Compteur")
+        self.assertNotContains(self.client.get(self.detail_url), "Labour")
+
+    def test_access_changed(self):
+        """Test the list of tools of a user is rendered again when the user is given or removed an access"""
+        seeder = AgriculturalTool.objects.create(name="Semoir", description="Semoir", user=self.manager)
+        self.assertNotContains(self.client.get(self.index_url), "Semoir")
+        access = ToolAccess.objects.create(user=self.member, tool=seeder)
+        self.assertContains(self.client.get(self.index_url), "Semoir")
+        access.delete()
+        self.assertNotContains(self.client.get(self.index_url), "Semoir")
+
+
+class UsageDashboardTest(TestCase):
+    """Unit tests for the usage dashboards of a tool and of the whole cooperative"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword")
+        cls.member = User.objects.create_user(
+            username="member", password="memberpassword", first_name="Jean", last_name="Martin"
+        )
+        cls.staff = User.objects.create_user(username="staff", password="staffpassword", is_staff=True)
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        cls.other_tool = AgriculturalTool.objects.create(name="Semoir", description="Semoir", user=cls.member)
+
+    def setUp(self):
+        cache.clear()
+        self.today = datetime.date.today()
+        self.last_year = self.today.replace(year=self.today.year - 1, day=1)
+
+    def create_borrow(self, user, date_borrow, start_time, end_time, tool=None):
+        """Create a borrow of the test tool by default"""
+        return BorrowTool.objects.create(
+            tool=tool or self.test_tool,
+            user=user,
+            date_borrow=date_borrow,
+            start_time_borrow=start_time,
+            end_time_borrow=end_time,
+        )
+
+    def test_tool_usage(self):
+        """Test the statistics of a tool by month, year and member"""
+        self.create_borrow(self.member, self.today, 0, 3)
+        self.create_borrow(self.manager, self.today, 3, 4)
+        self.create_borrow(self.member, self.last_year, 4, 6)
+        self.create_borrow(self.member, self.today, 0, 10, tool=self.other_tool)
+
+        usage = tool_usage(self.test_tool)
+        self.assertEqual(len(usage["months"]), 24)
+        self.assertEqual(usage["months"][-1], {"month": self.today.replace(day=1), "hours": 4, "borrow_count": 2})
+        self.assertEqual(usage["months"][-13], {"month": self.last_year, "hours": 2, "borrow_count": 1})
+        self.assertEqual(usage["max_month_hours"], 4)
+        self.assertEqual(
+            [(year["year"], year["hours"], year["borrow_count"]) for year in usage["years"]],
+            [(self.today.year, 4, 2), (self.today.year - 1, 2, 1)],
+        )
+        month = usage["year_over_year"][self.today.month - 1]
+        self.assertEqual((month["hours"], month["previous_hours"]), (4, 2))
+        self.assertEqual([(member["name"], member["hours"]) for member in usage["top_members"]], [
+            ("Jean Martin", 3),
+            ("manager", 1),
+        ])
+
+    def test_usage_cache(self):
+        """Test the statistics are cached until a borrow of the tool is written"""
+        borrow = self.create_borrow(self.member, self.today, 0, 3)
+        tool_usage(self.test_tool)
+        coop_usage()
+        with self.assertNumQueries(0):
+            tool_usage(self.test_tool)
+            coop_usage()
+
+        # A borrow of another tool only changes the statistics of the cooperative
+        self.create_borrow(self.member, self.today, 0, 10, tool=self.other_tool)
+        with self.assertNumQueries(0):
+            tool_usage(self.test_tool)
+        self.assertEqual(coop_usage()["months"][-1]["hours"], 13)
+
+        borrow.end_time_borrow = 5
+        borrow.save()
+        self.assertEqual(tool_usage(self.test_tool)["months"][-1]["hours"], 5)
+        borrow.delete()
+        self.assertEqual(tool_usage(self.test_tool)["months"][-1]["hours"], 0)
+        self.assertEqual(coop_usage()["months"][-1]["hours"], 10)
+
+    def test_coop_usage(self):
+        """Test the statistics of the cooperative list the hours of each tool this year and the previous one"""
+        self.create_borrow(self.member, self.today, 0, 3)
+        self.create_borrow(self.member, self.last_year, 3, 5)
+        self.create_borrow(self.member, self.today, 0, 10, tool=self.other_tool)
+
+        usage = coop_usage()
+        self.assertEqual(usage["tools"], [
+            {"tool_id": self.other_tool.id, "name": "Semoir", "hours": 10, "previous_hours": 0},
+            {"tool_id": self.test_tool.id, "name": "Tracteur", "hours": 3, "previous_hours": 2},
+        ])
+        self.assertEqual(usage["top_members"][0]["hours"], 13)
+
+    def test_tool_usage_view(self):
+        """Test the dashboard of a tool is shown to its manager and to the staff only"""
+        self.create_borrow(self.member, self.today, 0, 3)
+        url = reverse("catalog:tool_usage", kwargs={"tool_id": self.test_tool.id})
+
+        self.client.login(username="member", password="memberpassword")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username="manager", password="managerpassword")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "catalog/usage.html")
+        self.assertContains(response, "Utilisation de Tracteur")
+        self.assertContains(response, "Jean Martin")
+        # The statistics are read from the cache once computed
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_coop_usage_view(self):
+        """Test the dashboard of the cooperative is shown to the staff only"""
+        self.create_borrow(self.member, self.today, 0, 3)
+        url = reverse("catalog:coop_usage")
+
+        self.client.login(username="manager", password="managerpassword")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username="staff", password="staffpassword")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Utilisation des outils de la CUMA")
+        self.assertContains(response, reverse("catalog:tool_usage", kwargs={"tool_id": self.test_tool.id}))
+
+
+class AsyncViewsTest(TestCase):
+    """Unit tests for the read-heavy views served with the async ORM"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword")
+        cls.member = User.objects.create_user(username="member", password="memberpassword")
+        cls.tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        ToolAccess.objects.create(tool=cls.tool, user=cls.member)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_are_async(self):
+        """Test the views run their handlers in the event loop of an ASGI server"""
+        for view in (ToolListView, ToolDetailView, ToolAccessListView):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+    def test_login_required(self):
+        """Test the anonymous users are sent to the login page"""
+        for url in (
+            reverse("catalog:index"),
+            reverse("catalog:tool_detail", kwargs={"pk": self.tool.id}),
+            reverse("catalog:tool_access_list", kwargs={"tool_id": self.tool.id}),
+        ):
+            response = self.client.get(url)
+            self.assertRedirects(response, f"/users/login/?next={url}", fetch_redirect_response=False)
+
+    def test_missing_tool(self):
+        """Test the pages of a tool which does not exist are not found"""
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse("catalog:tool_detail", kwargs={"pk": 999})).status_code, 404)
+        response = self.client.get(reverse("catalog:tool_access_list", kwargs={"tool_id": 999}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_client(self):
+        """Test the pages are rendered when requested through the ASGI handler"""
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(reverse("catalog:index"))
+        self.assertContains(response, "Tracteur")
+        response = await self.async_client.get(reverse("catalog:tool_detail", kwargs={"pk": self.tool.id}))
+        self.assertEqual(response.context["tool"], self.tool)
+        self.assertIn("pending_export_count", response.context)
+        response = await self.async_client.get(reverse("catalog:tool_access_list", kwargs={"tool_id": self.tool.id}))
+        self.assertContains(response, "member")
+
+
+class ApiTest(TestCase):
+    """Unit tests for the read-only JSON API and its conditional requests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword", first_name="Jean")
+        cls.member = User.objects.create_user(username="member", password="memberpassword")
+        cls.tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        cls.other_tool = AgriculturalTool.objects.create(name="Herse", description="Herse", user=cls.member)
+        today = datetime.date.today()
+        cls.borrows = [
+            BorrowTool.objects.create(
+                tool=cls.tool, user=cls.member, date_borrow=today - datetime.timedelta(days=index),
+                start_time_borrow=100 - 10 * index, end_time_borrow=105 - 10 * index,
+            )
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.manager)
+        self.list_url = reverse("catalog:api_tools")
+        self.detail_url = reverse("catalog:api_tool_detail", kwargs={"tool_id": self.tool.id})
+        self.borrows_url = reverse("catalog:api_tool_borrows", kwargs={"tool_id": self.tool.id})
+
+    def test_tool_list(self):
+        """Test only the tools accessible by the user are listed, with their manager"""
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 200)
+        tools = response.json()["tools"]
+        self.assertEqual([tool["id"] for tool in tools], [self.tool.id])
+        self.assertEqual(tools[0]["manager"]["name"], "Jean")
+        self.assertEqual(tools[0]["meter_reading"], 105)
+        self.assertEqual(tools[0]["url"], self.detail_url)
+        self.assertIsNone(tools[0]["images"])
+
+        ToolAccess.objects.create(user=self.manager, tool=self.other_tool)
+        tools = self.client.get(self.list_url).json()["tools"]
+        self.assertEqual([tool["id"] for tool in tools], [self.tool.id, self.other_tool.id])
+
+    def test_tool_detail(self):
+        """Test the detail of a tool gives its last borrow, and the tools not accessible are not found"""
+        data = self.client.get(self.detail_url).json()
+        self.assertEqual(data["last_borrow_user"]["username"], "member")
+        self.assertEqual(data["last_borrow_date"], datetime.date.today().isoformat())
+        for url in (
+            reverse("catalog:api_tool_detail", kwargs={"tool_id": self.other_tool.id}),
+            reverse("catalog:api_tool_borrows", kwargs={"tool_id": self.other_tool.id}),
+            reverse("catalog:api_tool_detail", kwargs={"tool_id": 999}),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {"error": "Outil introuvable"})
+
+    def test_tool_images(self):
+        """Test a tool gives the urls of the resized variants of its image, not of the original upload"""
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            self.tool.image = SimpleUploadedFile("tracteur.jpg", create_test_image(), content_type="image/jpeg")
+            self.tool.save()
+            images = self.client.get(self.detail_url).json()["images"]
+        self.assertEqual(set(images), set(IMAGE_VARIANTS))
+        for variant, url in images.items():
+            self.assertEqual(url, self.tool.image.storage.url(variant_name(self.tool.image, variant)))
+            self.assertNotEqual(url, self.tool.image.url)
+
+    def test_borrow_pages(self):
+        """Test the history is split in pages linked by the url of the next page"""
+        history = []
+        url = self.borrows_url
+        with mock.patch("catalog.api.HISTORY_PAGE_SIZE", 2):
+            while url:
+                data = self.client.get(url).json()
+                history += [borrow["id"] for borrow in data["borrows"]]
+                url = data["next"]
+        self.assertEqual(history, [borrow.id for borrow in self.borrows])
+
+    def test_anonymous(self):
+        """Test the anonymous users get an error rather than the login page, and the API is read-only"""
+        self.assertEqual(self.client.post(self.list_url).status_code, 405)
+        self.client.logout()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Authentification requise"})
+
+    def test_etag(self):
+        """Test the client sending the ETag of unchanged data gets a 304 without the data being read"""
+        for url in (self.list_url, self.detail_url, self.borrows_url):
+            response = self.client.get(url)
+            etag = response.headers["ETag"]
+            self.assertIn("private", response.headers["Cache-Control"])
+            # Session, user and accessible tools, the versions being in cache
+            with self.assertNumQueries(3):
+                response = self.client.get(url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers["ETag"], etag)
+            self.assertEqual(response.content, b"")
+
+    def test_etag_changed(self):
+        """Test the ETags change when a borrow of the tool is saved, and when the accesses of the user change"""
+        etags = {url: self.client.get(url).headers["ETag"] for url in (self.list_url, self.detail_url, self.borrows_url)}
+        self.assertNotEqual(
+            self.client.get(self.borrows_url, {"after": "2000-01-01_0.0_1"}).headers["ETag"], etags[self.borrows_url]
+        )
+        BorrowTool.objects.create(
+            tool=self.tool, user=self.manager, date_borrow=datetime.date.today(), start_time_borrow=105,
+            end_time_borrow=110,
+        )
+        for url, etag in etags.items():
+            response = self.client.get(url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json()["borrows"][0]["end_time_borrow"], 110)
+
+        etag = self.client.get(self.list_url).headers["ETag"]
+        ToolAccess.objects.create(user=self.manager, tool=self.other_tool)
+        self.assertEqual(self.client.get(self.list_url, headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_last_modified(self):
+        """Test the client sending the date of unchanged data gets a 304, and the date changes with the data"""
+        with mock.patch("catalog.fragments.time.time", return_value=1_700_000_000):
+            response = self.client.get(self.detail_url)
+        last_modified = response.headers["Last-Modified"]
+        self.assertEqual(last_modified, "Tue, 14 Nov 2023 22:13:20 GMT")
+        response = self.client.get(self.detail_url, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        self.tool.save()
+        response = self.client.get(self.detail_url, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["Last-Modified"], last_modified)
+
+    def test_user_renamed(self):
+        """Test the ETags of the tools and borrows showing a user change when the user is renamed, not at login"""
+        urls = (self.list_url, self.detail_url, self.borrows_url)
+        etags = {url: self.client.get(url).headers["ETag"] for url in urls}
+        self.client.login(username="member", password="memberpassword")
+        self.client.force_login(self.manager)
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+        self.manager.first_name = "Jeanne"
+        self.manager.save()
+        response = self.client.get(self.list_url, headers={"If-None-Match": etags[self.list_url]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tools"][0]["manager"]["name"], "Jeanne")
+        etags = {url: self.client.get(url).headers["ETag"] for url in urls}
+
+        # Borrower of the tool, neither its manager nor its last borrower
+        AgriculturalTool.objects.filter(pk=self.tool.pk).update(last_borrow_user=self.manager)
+        self.member.last_name = "Martin"
+        self.member.save()
+        response = self.client.get(self.borrows_url, headers={"If-None-Match": etags[self.borrows_url]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["borrows"][0]["user"]["name"], "Martin")
+
+    def test_access_not_cached(self):
+        """Test the access of the user is read from the database, even when the cache of another process is stale"""
+        ToolAccess.objects.create(user=self.manager, tool=self.other_tool)
+        other_url = reverse("catalog:api_tool_detail", kwargs={"tool_id": self.other_tool.id})
+        etag = self.client.get(other_url).headers["ETag"]
+        tool_ids = accessible_tool_ids(self.manager)
+        # Access removed by another process, whose cache is not the one of this process
+        with mock.patch("catalog.signals.invalidate_accessible_tools"):
+            ToolAccess.objects.filter(user=self.manager, tool=self.other_tool).delete()
+        self.assertEqual(accessible_tool_ids(self.manager), tool_ids)
+
+        self.assertEqual(self.client.get(other_url, headers={"If-None-Match": etag}).status_code, 404)
+        tools = self.client.get(self.list_url).json()["tools"]
+        self.assertEqual([tool["id"] for tool in tools], [self.tool.id])
+
+
+class SharedCacheCheckTest(TestCase):
+    """Unit tests for the check of the cache shared by the processes"""
+
+    def test_shared_cache(self):
+        """Test the file cache passes the check, and the cache kept by each process is reported"""
+        file_cache = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "x"}}
+        with override_settings(CACHES=file_cache):
+            self.assertEqual(check_shared_cache(), [])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertEqual([message.id for message in check_shared_cache()], ["cumaweb.W001"])
+            with self.assertLogs("cumaweb.checks", "WARNING"):
+                check_on_startup()
+
+
+class CatalogQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Check the number of queries of each route of catalog application does not grow with the data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="managerpassword", is_staff=True)
+        cls.test_tool = AgriculturalTool.objects.create(name="Tracteur", description="Tracteur", user=cls.manager)
+        cls.member_count = 0
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        member = User.objects.create(username="member")
+        self.access = ToolAccess.objects.create(user=member, tool=self.test_tool)
+        self.job = ExportJob.objects.create(
+            user=self.manager,
+            tool=self.test_tool,
+            start_date=datetime.date.today(),
+            end_date=datetime.date.today(),
+            status=ExportJob.Status.DONE,
+            filename="export.xlsx",
+        )
+        self.job.file.save("export.xlsx", ContentFile(b"export"))
+
+    def seed(self, count):
+        """Add members using the test tool, each in charge of a tool the manager can access"""
+        today = datetime.date.today()
+        for _ in range(count):
+            self.member_count += 1
+            member = User.objects.create(username=f"member{self.member_count}", first_name="Membre")
+            ToolAccess.objects.create(user=member, tool=self.test_tool)
+            BorrowTool.objects.create(
+                tool=self.test_tool,
+                user=member,
+                date_borrow=today,
+                start_time_borrow=self.member_count,
+                end_time_borrow=self.member_count + 1,
+            )
+            tool = AgriculturalTool.objects.create(name=f"Outil {self.member_count}", description="Outil", user=member)
+            ToolAccess.objects.create(user=self.manager, tool=tool)
+            BorrowTool.objects.create(
+                tool=tool, user=self.manager, date_borrow=today, start_time_borrow=0, end_time_borrow=1
+            )
+
+    def prepare_request(self):
+        cache.clear()
+        self.client.force_login(self.manager)
+
+    def test_query_budget(self):
+        """Test every route runs the same number of queries whatever the number of rows"""
+        tool_id = self.test_tool.id
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        dates = {"start_date": today, "end_date": today}
+        routes = {
+            "index": lambda: self.client.get(reverse("catalog:index")),
+            "create_tool": lambda: self.client.get(reverse("catalog:create_tool")),
+            "borrow_tool": lambda: self.client.get(reverse("catalog:borrow_tool", kwargs={"tool_id": tool_id})),
+            "borrow_import": lambda: self.client.get(reverse("catalog:borrow_import", kwargs={"tool_id": tool_id})),
+            "tool_detail": lambda: self.client.get(reverse("catalog:tool_detail", kwargs={"pk": tool_id})),
+            "user_borrows": lambda: self.client.get(reverse("catalog:user_borrows")),
+            "tool_update": lambda: self.client.get(reverse("catalog:tool_update", kwargs={"pk": tool_id})),
+            "tool_usage": lambda: self.client.get(reverse("catalog:tool_usage", kwargs={"tool_id": tool_id})),
+            "coop_usage": lambda: self.client.get(reverse("catalog:coop_usage")),
+            "tool_anomalies": lambda: self.client.get(
+                reverse("catalog:tool_anomalies", kwargs={"tool_id": tool_id})
+            ),
+            "coop_anomalies": lambda: self.client.get(reverse("catalog:coop_anomalies")),
+            "export_tool": lambda: self.client.post(reverse("catalog:export_tool", kwargs={"tool_id": tool_id}), dates),
+            "export_tools": lambda: self.client.post(reverse("catalog:export_tools"), dates),
+            "export_job_create": lambda: self.client.post(
+                reverse("catalog:export_job_create", kwargs={"tool_id": tool_id}), dates
+            ),
+            "export_job_status": lambda: self.client.get(
+                reverse("catalog:export_job_status", kwargs={"pk": self.job.id})
+            ),
+            "export_job_download": lambda: self.client.get(
+                reverse("catalog:export_job_download", kwargs={"pk": self.job.id})
+            ),
+            "tool_access_add": lambda: self.client.get(
+                reverse("catalog:tool_access_add", kwargs={"tool_id": tool_id})
+            ),
+            "tool_access_list": lambda: self.client.get(
+                reverse("catalog:tool_access_list", kwargs={"tool_id": tool_id})
+            ),
+            "tool_access_delete": lambda: self.client.get(
+                reverse("catalog:tool_access_delete", kwargs={"pk": self.access.id})
+            ),
+            "api_tools": lambda: self.client.get(reverse("catalog:api_tools")),
+            "api_tool_detail": lambda: self.client.get(reverse("catalog:api_tool_detail", kwargs={"tool_id": tool_id})),
+            "api_tool_borrows": lambda: self.client.get(
+                reverse("catalog:api_tool_borrows", kwargs={"tool_id": tool_id})
+            ),
+        }
+        self.assertRoutesCovered(catalog_urls, routes)
+        self.assertQueryBudget(routes)
+
+
+class BenchmarkCommandTest(TestCase):
+    """Unit tests for the commands seeding synthetic data and measuring the main pages"""
+
+    def test_seed_and_benchmark(self):
+        """Test the synthetic data are created, and the measures saved in JSON without changing the data"""
+        out = io.StringIO()
+        call_command("seed_benchmark_data", members=5, tools=3, borrows=31, access_density=0.5, stdout=out)
+        self.assertEqual(User.objects.filter(username__startswith="bench_").count(), 6)
+        self.assertEqual(AgriculturalTool.objects.count(), 3)
+        self.assertEqual(BorrowTool.objects.count(), 31)
+        # Manager of the first tool with access to all of them, and two tools for each member
+        self.assertEqual(ToolAccess.objects.count(), 3 + 5 * 2)
+        tool = AgriculturalTool.objects.order_by("id").first()
+        latest = BorrowTool.objects.filter(tool=tool).order_by("-end_time_borrow").first()
+        self.assertEqual(AgriculturalTool.objects.get(id=tool.id).meter_reading, latest.end_time_borrow)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = f"{directory}/results.json"
+            call_command("benchmark", repeat=1, output=output, stdout=out)
+            call_command("benchmark", repeat=1, output=f"{directory}/next.json", compare=output, stdout=out)
+            with open(output, encoding="utf-8") as results_file:
+                results = json.load(results_file)
+
+        self.assertEqual(results["database"]["borrows"], 31)
+        self.assertEqual(
+            set(results["scenarios"]), {"tool_list", "tool_detail", "borrow_form", "export", "tool_usage", "user_list"}
+        )
+        for result in results["scenarios"].values():
+            self.assertEqual(result["status"], 200)
+            self.assertGreater(result["queries"], 0)
+            self.assertGreater(result["peak_memory_kb"], 0)
+        self.assertIn("Comparaison avec", out.getvalue())
+        # The export measured is rolled back, so the borrows are still to export
+        self.assertFalse(ExportBatch.objects.exists())
+        self.assertFalse(BorrowTool.objects.filter(export_batch__isnull=False).exists())
+
+
+class WarmupCommandTest(TestCase):
+    """Unit tests for the warm-up of the templates, URLs and heavy modules"""
+
+    def test_warmup(self):
+        """Test every template of the project is compiled in the cached loader, and every named URL resolved"""
+        loader = engines["django"].engine.template_loaders[0]
+        loader.reset()
+        out = io.StringIO()
+        call_command("warmup", stdout=out)
+
+        for name in ("base.html", "catalog/index.html", "catalog/user_borrows.html", "users/user_list.html"):
+            self.assertIn(name, loader.get_template_cache)
+        self.assertNotIn("admin/base.html", loader.get_template_cache)
+        self.assertIn(f"URLs résolues: {len(dict(url_names()))} en", out.getvalue())
+        self.assertIn("Préchauffage terminé", out.getvalue())
+
+    def test_template_error(self):
+        """Test the templates which cannot be compiled make the command fail"""
+        with tempfile.TemporaryDirectory() as directory:
+            with open(f"{directory}/broken.html", "w", encoding="utf-8") as template_file:
+                template_file.write("{% if %}")
+            templates = [{**settings.TEMPLATES[0], "DIRS": [directory]}]
+            with override_settings(BASE_DIR=directory, TEMPLATES=templates):
+                with self.assertRaisesMessage(CommandError, "1 erreur(s)"):
+                    call_command("warmup", stdout=io.StringIO(), stderr=io.StringIO())
+
+
+@skipUnless(connection.vendor == "sqlite", "The tuning is specific to SQLite")
+class SqliteTuningTest(TestCase):
+    """Unit tests for the tuning of the SQLite connections"""
+
+    def new_connection(self, directory):
+        """Return a new connection to a database file of the directory, configured by the connection_created signal"""
+        wrapper = connections["default"].__class__({**connection.settings_dict, "NAME": f"{directory}/db.sqlite3"})
+        wrapper.ensure_connection()
+        return wrapper
+
+    def open_connection(self, directory):
+        """Return a new connection to a database file of the directory, closed at the end of the test"""
+        wrapper = self.new_connection(directory)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def increment(self, wrapper, waits=None):
+        """Increment the counter of the database in a transaction reading it before writing it"""
+        begin = time.perf_counter()
+        wrapper._start_transaction_under_autocommit()
+        if waits is not None:
+            waits.append(time.perf_counter() - begin)
+        value = wrapper.connection.execute("SELECT value FROM counter").fetchone()[0]
+        wrapper.connection.execute("UPDATE counter SET value = ?", [value + 1])
+        wrapper.connection.execute("COMMIT")
+
+    def pragma(self, wrapper, name):
+        """Return the value of a pragma of a connection"""
+        return wrapper.connection.execute(f"PRAGMA {name}").fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={
+        "journal_mode": "WAL", "busy_timeout": 7000, "synchronous": "NORMAL", "mmap_size": 1048576,
+        "cache_size": -4000,
+    })
+    def test_pragmas(self):
+        """Test the pragmas of the settings are run on each new connection"""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open_connection(directory)
+            self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+            self.assertEqual(self.pragma(wrapper, "busy_timeout"), 7000)
+            # NORMAL
+            self.assertEqual(self.pragma(wrapper, "synchronous"), 1)
+            self.assertEqual(self.pragma(wrapper, "mmap_size"), 1048576)
+            self.assertEqual(self.pragma(wrapper, "cache_size"), -4000)
+
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": "", "busy_timeout": "100; DROP TABLE auth_user"})
+    def test_invalid_pragma(self):
+        """Test the empty values are skipped and the values which are not a word or a number refused"""
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ImproperlyConfigured):
+                self.open_connection(directory)
+
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": "WAL", "busy_timeout": 5000}, SQLITE_TRANSACTION_MODE="IMMEDIATE")
+    def test_second_writer_waits(self):
+        """Test a transaction waits for the one writing before it starts, so that no update is lost or refused"""
+        with tempfile.TemporaryDirectory() as directory:
+            first = self.open_connection(directory)
+            first.connection.execute("CREATE TABLE counter (value INTEGER)")
+            first.connection.execute("INSERT INTO counter VALUES (0)")
+            first._start_transaction_under_autocommit()
+
+            waits = []
+
+            def second_writer():
+                wrapper = self.new_connection(directory)
+                try:
+                    self.increment(wrapper, waits)
+                finally:
+                    wrapper.close()
+
+            thread = threading.Thread(target=second_writer)
+            thread.start()
+            time.sleep(0.3)
+            value = first.connection.execute("SELECT value FROM counter").fetchone()[0]
+            first.connection.execute("UPDATE counter SET value = ?", [value + 1])
+            first.connection.execute("COMMIT")
+            thread.join()
+
+            self.assertGreaterEqual(waits[0], 0.2)
+            self.assertEqual(first.connection.execute("SELECT value FROM counter").fetchone()[0], 2)
+
+    @override_settings(SQLITE_TRANSACTION_MODE="NOW")
+    def test_invalid_transaction_mode(self):
+        """Test an unknown transaction mode is refused"""
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ImproperlyConfigured):
+                self.increment(self.open_connection(directory))
+
+    def test_stress_needs_file(self):
+        """Test the stress test refuses to run on the in-memory database of the tests"""
+        with self.assertRaisesMessage(CommandError, "fichier"):
+            call_command("stress_borrows", stdout=io.StringIO())
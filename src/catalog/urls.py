@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 app_name = "catalog"
@@ -8,10 +8,23 @@ urlpatterns = [
     path("", views.ToolListView.as_view(), name="index"),
     path("create_tool/", views.ToolCreateView.as_view(), name="create_tool"),
     path("<int:tool_id>/borrow/", views.BorrowCreateView.as_view(), name="borrow_tool"),
+    path("<int:tool_id>/borrow/import/", views.BorrowImportView.as_view(), name="borrow_import"),
     path("<int:pk>/", views.ToolDetailView.as_view(), name="tool_detail"),
+    path("borrows/", views.UserBorrowsView.as_view(), name="user_borrows"),
+    path("<int:tool_id>/usage/", views.ToolUsageView.as_view(), name="tool_usage"),
+    path("usage/", views.CoopUsageView.as_view(), name="coop_usage"),
+    path("<int:tool_id>/anomalies/", views.ToolAnomalyView.as_view(), name="tool_anomalies"),
+    path("anomalies/", views.CoopAnomalyView.as_view(), name="coop_anomalies"),
     path("<int:pk>/update/", views.ToolUpdateView.as_view(), name="tool_update"),
     path("<int:tool_id>/export/", views.export_to_excel, name="export_tool"),
+    path("export/", views.ToolsExportView.as_view(), name="export_tools"),
+    path("<int:tool_id>/export/jobs/", views.export_job_create, name="export_job_create"),
+    path("export/jobs/<int:pk>/status/", views.export_job_status, name="export_job_status"),
+    path("export/jobs/<int:pk>/download/", views.export_job_download, name="export_job_download"),
     path("<int:tool_id>/accesses/add/", views.ToolAccessCreateView.as_view(), name="tool_access_add"),
     path("<int:tool_id>/accesses/list/", views.ToolAccessListView.as_view(), name="tool_access_list"),
     path("access/<int:pk>/delete/", views.ToolAccessDeleteView.as_view(), name="tool_access_delete"),
+    path("api/tools/", api.tool_list, name="api_tools"),
+    path("api/tools/<int:tool_id>/", api.tool_detail, name="api_tool_detail"),
+    path("api/tools/<int:tool_id>/borrows/", api.tool_borrows, name="api_tool_borrows"),
 ]
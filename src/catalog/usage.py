@@ -0,0 +1,144 @@
+"""Usage statistics of the tools shown on the dashboards of catalog application"""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractYear
+
+from .exports import display_name
+from .models import MonthlyUsage
+
+
+# Time in seconds during which the statistics are kept in cache, unless a borrow is written meanwhile
+USAGE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Number of months of the monthly chart, ending with the current month
+USAGE_MONTHS = 24
+
+# Number of members listed in the rankings
+TOP_MEMBERS = 10
+
+
+def usage_cache_key(tool_id=None, today=None):
+    """
+    Return the cache key of the statistics of a tool, or of the whole cooperative without tool.
+
+    The key contains the current month, so that the statistics are computed again when the months shift.
+    """
+    month = (today or datetime.date.today()).strftime("%Y-%m")
+    return f"catalog:usage:{tool_id or 'coop'}:{month}"
+
+
+def invalidate_usage(*tool_ids):
+    """Remove from the cache the statistics of the given tools and of the whole cooperative"""
+    cache.delete_many([usage_cache_key(tool_id) for tool_id in tool_ids if tool_id is not None] + [usage_cache_key()])
+
+
+def add_months(month, count):
+    """Return the first day of the month `count` months after the given one"""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def compute_usage(rollups, today):
+    """
+    Return the statistics of the given monthly rollups, read by grouped queries on the rollups rather than
+    on the borrows: the hours of each of the last months, the totals of each year, the hours of each month
+    of the current year next to the previous one, and the members using the tools the most this year.
+    """
+    first_month = add_months(today.replace(day=1), 1 - USAGE_MONTHS)
+    month_totals = {
+        row["month"]: row
+        for row in rollups.filter(month__gte=first_month)
+        .values("month")
+        .annotate(hours=Sum("hours"), borrow_count=Sum("borrow_count"))
+        .order_by("month")
+    }
+    months = []
+    for index in range(USAGE_MONTHS):
+        month = add_months(first_month, index)
+        row = month_totals.get(month, {})
+        months.append({"month": month, "hours": row.get("hours") or 0, "borrow_count": row.get("borrow_count") or 0})
+
+    years = list(
+        rollups.annotate(year=ExtractYear("month"))
+        .values("year")
+        .annotate(hours=Sum("hours"), borrow_count=Sum("borrow_count"))
+        .order_by("-year")
+    )
+
+    # The months of the previous year are in the monthly chart
+    hours_by_month = {row["month"]: row["hours"] for row in months}
+    year_over_year = [
+        {
+            "month": datetime.date(today.year, month, 1),
+            "hours": hours_by_month.get(datetime.date(today.year, month, 1), 0),
+            "previous_hours": hours_by_month.get(datetime.date(today.year - 1, month, 1), 0),
+        }
+        for month in range(1, 13)
+    ]
+
+    top_members = list(
+        rollups.filter(month__gte=datetime.date(today.year, 1, 1))
+        .values(
+            "user_id",
+            username=F("user__username"),
+            first_name=F("user__first_name"),
+            last_name=F("user__last_name"),
+        )
+        .annotate(hours=Sum("hours"), borrow_count=Sum("borrow_count"))
+        .order_by("-hours", "username")[:TOP_MEMBERS]
+    )
+    for row in top_members:
+        user = User(username=row["username"], first_name=row["first_name"], last_name=row["last_name"])
+        row["name"] = display_name(user)
+
+    max_hours = max((row["hours"] for row in months), default=0)
+    return {
+        "months": months,
+        "max_month_hours": max_hours,
+        "years": years,
+        "year_over_year": year_over_year,
+        "top_members": top_members,
+        "current_year": today.year,
+    }
+
+
+def tool_usage(tool):
+    """Return the statistics of a tool, kept in cache until one of its borrows is written"""
+    today = datetime.date.today()
+    key = usage_cache_key(tool.pk, today)
+    usage = cache.get(key)
+    if usage is None:
+        usage = compute_usage(MonthlyUsage.objects.filter(tool=tool), today)
+        cache.set(key, usage, USAGE_CACHE_TIMEOUT)
+    return usage
+
+
+def coop_usage():
+    """
+    Return the statistics of the whole cooperative, with the hours of each tool this year and the previous one,
+    kept in cache until a borrow is written.
+    """
+    today = datetime.date.today()
+    key = usage_cache_key(today=today)
+    usage = cache.get(key)
+    if usage is None:
+        rollups = MonthlyUsage.objects.all()
+        usage = compute_usage(rollups, today)
+        tools = {}
+        for row in (
+            rollups.filter(month__gte=datetime.date(today.year - 1, 1, 1))
+            .annotate(year=ExtractYear("month"))
+            .values("tool_id", "year", name=F("tool__name"))
+            .annotate(hours=Sum("hours"), borrow_count=Sum("borrow_count"))
+        ):
+            tool = tools.setdefault(
+                row["tool_id"], {"tool_id": row["tool_id"], "name": row["name"], "hours": 0, "previous_hours": 0}
+            )
+            tool["hours" if row["year"] == today.year else "previous_hours"] = row["hours"]
+        usage["tools"] = sorted(tools.values(), key=lambda tool: (-tool["hours"], tool["name"]))
+        cache.set(key, usage, USAGE_CACHE_TIMEOUT)
+    return usage
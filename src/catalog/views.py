@@ -1,23 +1,81 @@
 """Definition of views for catalog application"""
 
 import datetime
+import itertools
 from typing import Any
+from urllib.parse import urlencode
 
-import openpyxl
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Count, F, Sum
 from django.forms.models import BaseModelForm
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from django.urls import reverse_lazy
-from django.views.generic import CreateView, DetailView, ListView, UpdateView, DeleteView
-
-from .forms import BorrowToolForm, CreateToolForm, ToolAccessForm, DateRangeForm
-from .models import AgriculturalTool, BorrowTool, ToolAccess
-
-
-class ToolListView(LoginRequiredMixin, ListView):
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
+from django.urls import reverse, reverse_lazy
+from django.utils.functional import cached_property
+from django.views.generic import CreateView, DetailView, FormView, TemplateView, UpdateView, DeleteView
+
+from cumaweb.mixins import AsyncListView, AsyncLoginRequiredMixin
+
+from .access import aaccessible_tool_ids
+from .anomalies import describe_anomalies, scan_anomalies
+from .exports import (
+    EXCEL_CONTENT_TYPE,
+    FORMAT_XLSX,
+    TEXT_CONTENT_TYPES,
+    cancel_export,
+    export_filename,
+    period_borrows,
+    record_export,
+    text_export_response,
+    tool_borrows,
+    tools_export_filename,
+    workbook_response,
+    write_borrows_workbook,
+    write_tools_workbook,
+)
+from .forms import (
+    BorrowHistoryForm,
+    BorrowImportForm,
+    BorrowToolForm,
+    CreateToolForm,
+    DateRangeForm,
+    ToolAccessForm,
+    ToolsExportForm,
+)
+from .fragments import acatalog_versions, atool_versions
+from .imports import import_borrows
+from .jobs import can_create_job
+from .models import AgriculturalTool, BorrowTool, ExportJob, ToolAccess
+from .pagination import HISTORY_PAGE_SIZE, ahistory_page, history_page
+from .usage import coop_usage, tool_usage
+
+
+class ToolMixin:
+    """Mixin resolving the tool given in the url once per request, with the user in charge of it"""
+
+    tool_url_kwarg = "tool_id"
+
+    @cached_property
+    def tool(self):
+        """Tool given in the url, fetched on first access"""
+        return get_object_or_404(self.get_tool_queryset(), pk=self.kwargs.get(self.tool_url_kwarg))
+
+    def get_tool_queryset(self):
+        """Return the queryset the tool given in the url is fetched from"""
+        return AgriculturalTool.objects.select_related("user")
+
+    async def aget_tool(self):
+        """Fetch the tool given in the url from an async view, so that `tool` does not fetch it again"""
+        if "tool" not in self.__dict__:
+            self.tool = await aget_object_or_404(self.get_tool_queryset(), pk=self.kwargs.get(self.tool_url_kwarg))
+        return self.tool
+
+
+class ToolListView(AsyncLoginRequiredMixin, AsyncListView):
     """View to display the list of AgriculturalTool"""
 
     login_url = "/users/login/"
@@ -26,13 +84,21 @@ class ToolListView(LoginRequiredMixin, ListView):
     template_name = "catalog/index.html"
 
     def get_queryset(self):
-        user = self.request.user
-        accessible_tools = (AgriculturalTool.objects.filter(user_accesses__user=user) | AgriculturalTool.objects.filter(
-            user=user
-        )).distinct()
+        accessible_tools = AgriculturalTool.objects.filter(id__in=self.tool_ids).select_related("user").order_by("id")
         return accessible_tools
 
-class ToolAccessListView(LoginRequiredMixin, ListView):
+    async def aget_queryset(self):
+        self.tool_ids = await aaccessible_tool_ids(self.request.user)
+        # The tools are only read when the list rendered for these versions is not in cache
+        return self.get_queryset()
+
+    async def aget_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = await super().aget_context_data(**kwargs)
+        context["tool_versions"], context["list_version"] = await acatalog_versions(self.request.user.id, self.tool_ids)
+        context["fragment_timeout"] = settings.FRAGMENT_CACHE_TIMEOUT
+        return context
+
+class ToolAccessListView(AsyncLoginRequiredMixin, ToolMixin, AsyncListView):
     """View to display the list of AgriculturalTool"""
 
     login_url = "/users/login/"
@@ -42,18 +108,19 @@ class ToolAccessListView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        tool = self.kwargs.get("tool_id")
-        tool_object = AgriculturalTool.objects.get(id=tool)
-        context["tool"] = tool_object
+        context["tool"] = self.tool
         return context
 
     def get_queryset(self):
-        tool = self.kwargs.get("tool_id")
-        tool_accesses = ToolAccess.objects.filter(tool = tool)
+        tool_accesses = ToolAccess.objects.filter(tool=self.tool).select_related("user")
         return tool_accesses
 
+    async def aget_queryset(self):
+        await self.aget_tool()
+        return await super().aget_queryset()
 
-class BorrowCreateView(LoginRequiredMixin, CreateView):
+
+class BorrowCreateView(LoginRequiredMixin, ToolMixin, CreateView):
     """View to display BorrowToolForm"""
 
     login_url = "/users/login/"
@@ -64,12 +131,12 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context["tool"] = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
+        context["tool"] = self.tool
         return context
 
     def get_initial(self):
         initial = super().get_initial()
-        initial["tool"] = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
+        initial["tool"] = self.tool
         initial["user"] = self.request.user
         return initial
     
@@ -77,7 +144,7 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
         kwargs = super().get_form_kwargs()
         # Passer l'utilisateur connecté et l'outil au formulaire
         kwargs['user'] = self.request.user
-        kwargs['tool'] = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
+        kwargs['tool'] = self.tool
         return kwargs
 
     def form_valid(self, form):
@@ -96,20 +163,191 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
         return super().form_invalid(form)
 
 
-class ToolDetailView(LoginRequiredMixin, DetailView):
-    """View to display the detail of an AgriculturalTool"""
+class BorrowImportView(LoginRequiredMixin, UserPassesTestMixin, ToolMixin, FormView):
+    """View to import the borrows of an AgriculturalTool from an XLSX or CSV file"""
 
     login_url = "/users/login/"
-    model = AgriculturalTool
+    form_class = BorrowImportForm
+    template_name = "catalog/borrow_import.html"
+
+    def test_func(self):
+        """Check if user is the owner of the tool or is staff with UserPassesTestMixin"""
+        return self.request.user.id == self.tool.user_id or self.request.user.is_staff
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context["tool"] = self.tool
+        return context
+
+    def form_valid(self, form):
+        try:
+            created, errors = import_borrows(self.tool, form.cleaned_data["file"])
+        except ValidationError as error:
+            form.add_error("file", error)
+            return self.form_invalid(form)
+
+        if created:
+            messages.success(self.request, f"{created} emprunt(s) importé(s)")
+        if not errors:
+            return redirect("catalog:tool_detail", pk=self.tool.id)
+        messages.error(self.request, f"{len(errors)} ligne(s) n'ont pas été importées")
+        return self.render_to_response(self.get_context_data(form=form, import_errors=errors))
+
+
+class ToolDetailView(AsyncLoginRequiredMixin, DetailView):
+    """View to display the detail of an AgriculturalTool, read with the async ORM"""
+
+    login_url = "/users/login/"
+    queryset = AgriculturalTool.objects.select_related("user", "last_borrow_user")
     context_object_name = "tool"
     template_name = "catalog/tooldetail.html"
+    history_page_size = HISTORY_PAGE_SIZE
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs.get(self.pk_url_kwarg))
+        context = self.get_context_data(object=self.object)
+        context.update(await self.aget_page_data())
+        return self.render_to_response(context)
+
+    async def aget_page_data(self) -> dict[str, Any]:
+        """Return the borrows, exports and cache versions of the page, read with the async ORM"""
+        data = {}
+        # Get a page of the borrows for this tool, ordered by most recent first
+        cursor = self.request.GET.get("after")
+        borrows = BorrowTool.objects.filter(tool=self.object).select_related("user")
+        data["borrows"], data["next_cursor"] = await ahistory_page(borrows, cursor, self.history_page_size)
+        data["is_first_page"] = not cursor
+        data["tool_version"] = (await atool_versions([self.object.id]))[self.object.id]
+        data["fragment_timeout"] = settings.FRAGMENT_CACHE_TIMEOUT
+        if self.request.user.id == self.object.user_id:
+            # Borrows never exported, counted from the partial index on these rows
+            data["pending_export_count"] = await BorrowTool.objects.filter(
+                tool=self.object, export_batch__isnull=True
+            ).acount()
+        # Latest exports asked in the background for this tool
+        export_jobs = ExportJob.objects.filter(tool=self.object, user=self.request.user).order_by("-created_at")[:5]
+        data["export_jobs"] = [job async for job in export_jobs]
+        data['now'] = datetime.date.today()
+        data['now_minus_30_days'] = datetime.date.today() - datetime.timedelta(days=30)
+        return data
+
+
+class UserBorrowsView(LoginRequiredMixin, TemplateView):
+    """View to display the history of the borrows of the connected user on all the AgriculturalTool"""
+
+    login_url = "/users/login/"
+    template_name = "catalog/user_borrows.html"
+    history_page_size = HISTORY_PAGE_SIZE
+
+    def get_form(self):
+        """Return the filters of the history, by default the current season, from the first of January"""
+        data = self.request.GET
+        if "start_date" not in data:
+            data = {**data.dict(), "start_date": datetime.date.today().replace(month=1, day=1).isoformat()}
+        return BorrowHistoryForm(data, user=self.request.user)
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        # Get all borrows for this tool, ordered by most recent first
-        context["borrows"] = BorrowTool.objects.filter(tool=self.object).order_by("-date_borrow", "-start_time_borrow")
-        context['now'] = datetime.date.today()
-        context['now_minus_30_days'] = datetime.date.today() - datetime.timedelta(days=30)
+        form = self.get_form()
+        # Borrows of the user, read from the index on user and date
+        borrows = BorrowTool.objects.filter(user=self.request.user)
+        if form.is_valid():
+            if form.cleaned_data["start_date"]:
+                borrows = borrows.filter(date_borrow__gte=form.cleaned_data["start_date"])
+            if form.cleaned_data["end_date"]:
+                borrows = borrows.filter(date_borrow__lte=form.cleaned_data["end_date"])
+            if form.cleaned_data["tool"]:
+                borrows = borrows.filter(tool=form.cleaned_data["tool"])
+        else:
+            borrows = borrows.none()
+
+        cursor = self.request.GET.get("after")
+        context["borrows"], next_cursor = history_page(borrows.select_related("tool"), cursor, self.history_page_size)
+        context["is_first_page"] = not cursor
+        filters = {name: form.data.get(name, "") for name in form.fields}
+        context["filters_query"] = urlencode(filters)
+        if next_cursor:
+            context["next_query"] = urlencode({**filters, "after": next_cursor})
+
+        # Hours and number of borrows per tool over the filtered period, computed by a single grouped query
+        context["totals"] = list(
+            borrows.values("tool_id", "tool__name")
+            .annotate(hours=Sum(F("end_time_borrow") - F("start_time_borrow")), borrow_count=Count("id"))
+            .order_by("tool__name")
+        )
+        context["total_hours"] = sum(total["hours"] for total in context["totals"])
+        context["total_count"] = sum(total["borrow_count"] for total in context["totals"])
+        context["form"] = form
+        return context
+
+
+class ToolUsageView(LoginRequiredMixin, UserPassesTestMixin, ToolMixin, TemplateView):
+    """View to display the usage dashboard of an AgriculturalTool"""
+
+    login_url = "/users/login/"
+    template_name = "catalog/usage.html"
+
+    def test_func(self):
+        """Check if user is the owner of the tool or is staff with UserPassesTestMixin"""
+        return self.request.user.id == self.tool.user_id or self.request.user.is_staff
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context["tool"] = self.tool
+        context["usage"] = tool_usage(self.tool)
+        return context
+
+
+class CoopUsageView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """View to display the usage dashboard of all the AgriculturalTool of the cooperative"""
+
+    login_url = "/users/login/"
+    template_name = "catalog/usage.html"
+
+    def test_func(self):
+        """Check if user is staff with UserPassesTestMixin"""
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context["usage"] = coop_usage()
+        return context
+
+
+class ToolAnomalyView(LoginRequiredMixin, UserPassesTestMixin, ToolMixin, TemplateView):
+    """View to display the overlaps and gaps of the hour-meter readings of an AgriculturalTool"""
+
+    login_url = "/users/login/"
+    template_name = "catalog/anomalies.html"
+
+    def test_func(self):
+        """Check if user is the owner of the tool or is staff with UserPassesTestMixin"""
+        return self.request.user.id == self.tool.user_id or self.request.user.is_staff
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context["tool"] = self.tool
+        context["anomalies"] = describe_anomalies(scan_anomalies(BorrowTool.objects.filter(tool=self.tool)))
+        return context
+
+
+class CoopAnomalyView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """View to display the overlaps and gaps of the hour-meter readings of all the AgriculturalTool"""
+
+    login_url = "/users/login/"
+    template_name = "catalog/anomalies.html"
+    # Number of anomalies displayed, the whole list being given by the check_meter_anomalies command
+    max_anomalies = 500
+
+    def test_func(self):
+        """Check if user is staff with UserPassesTestMixin"""
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        anomalies = list(itertools.islice(scan_anomalies(), self.max_anomalies + 1))
+        context["anomalies"] = describe_anomalies(anomalies[: self.max_anomalies])
+        context["truncated"] = len(anomalies) > self.max_anomalies
         return context
 
 
@@ -162,7 +400,7 @@ class ToolCreateView(LoginRequiredMixin, CreateView):
         return super().form_invalid(form)
 
 
-class ToolAccessCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+class ToolAccessCreateView(LoginRequiredMixin, UserPassesTestMixin, ToolMixin, CreateView):
     """View to display ToolAccessForm"""
 
     model = ToolAccess
@@ -171,16 +409,15 @@ class ToolAccessCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
     def test_func(self):
         """Check if user is the owner of the tool or is staff with UserPassesTestMixin"""
-        tool = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
-        return self.request.user == tool.user or self.request.user.is_staff
+        return self.request.user.id == self.tool.user_id or self.request.user.is_staff
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs["tool"] = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
+        kwargs["tool"] = self.tool
         return kwargs
 
     def form_valid(self, form):
-        form.instance.tool = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
+        form.instance.tool = self.tool
         messages.success(self.request, f"Accès accordé à {form.instance.user.username}")
         return super().form_valid(form)
 
@@ -189,99 +426,164 @@ class ToolAccessCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["tool"] = get_object_or_404(AgriculturalTool, pk=self.kwargs.get("tool_id"))
+        context["tool"] = self.tool
         return context
     
 class ToolAccessDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     """View to delete access to a tool"""
     model = ToolAccess
+    queryset = ToolAccess.objects.select_related("user", "tool")
     template_name = 'catalog/tool_access_confirm_delete.html'
+
+    @cached_property
+    def tool_access(self):
+        """Access given in the url, fetched on first access with its user and tool"""
+        return super().get_object()
+
+    def get_object(self, queryset=None):
+        return self.tool_access
     
     def test_func(self):
-        tool_access = self.get_object()
-        return self.request.user == tool_access.tool.user or self.request.user.is_staff
+        return self.request.user.id == self.tool_access.tool.user_id or self.request.user.is_staff
     
     def get_success_url(self):
         messages.success(self.request, f"Accès retiré pour {self.object.user.username}")
         return reverse_lazy('catalog:tool_access_list', kwargs={'tool_id': self.object.tool.id})
 
 
+def get_exported_tool(request, tool_id):
+    """
+    Return the tool given in the url if the connected user is in charge of it or is staff.
+
+    Exporting marks the borrows as exported, so the other members cannot export them.
+    """
+    tool = get_object_or_404(AgriculturalTool, pk=tool_id)
+    if request.user.id != tool.user_id and not request.user.is_staff:
+        raise PermissionDenied
+    return tool
+
+
 @login_required
 def export_to_excel(request, tool_id):
     """Function to export to Excel the list of borrows for a given tool"""
     if request.method == 'POST':
+        # Get the tool
+        tool = get_exported_tool(request, tool_id)
         form = DateRangeForm(request.POST)
         if form.is_valid():
             start_date = form.cleaned_data['start_date']
             end_date = form.cleaned_data['end_date']
-            # Get the tool
-            tool = get_object_or_404(AgriculturalTool, pk=tool_id)
-
-            # Get all borrows for this tool
-            borrows = BorrowTool.objects.filter(
-                tool=tool,
-                date_borrow__gte=start_date,
-                date_borrow__lte=end_date
-            ).order_by("-date_borrow", "-start_time_borrow")
-
-            # Create a new Excel workbook
-            workbook = openpyxl.Workbook()
-            worksheet = workbook.active
-
-            # Set headers
-            worksheet["A1"] = "Nom Prénom"
-            worksheet["B1"] = "Date"
-            worksheet["C1"] = "Heure début"
-            worksheet["D1"] = "Heure fin"
-            worksheet["E1"] = "Durée (heures)"
-            worksheet["F1"] = "Nom"
-            worksheet["G1"] = "Total Heures par Personne"
-
-            # Fill data
-            row = 2
-            for borrow in borrows:
-                # Get full name or username
-                full_name = borrow.user.get_full_name() if borrow.user.get_full_name() else borrow.user.username
-
-                # Get start and end times
-                start_time = borrow.start_time_borrow
-                end_time = borrow.end_time_borrow
-
-                duration = end_time - start_time
-
-                worksheet[f"A{row}"] = full_name
-                worksheet[f"B{row}"] = borrow.date_borrow.strftime("%d/%m/%Y")
-                worksheet[f"C{row}"] = start_time
-                worksheet[f"D{row}"] = end_time
-                worksheet[f"E{row}"] = duration
-
-                row += 1
-
-            # Get unique names
-            distinct_names = set()
-            for borrow in borrows:
-                distinct_names.add(borrow.user.get_full_name() if borrow.user.get_full_name() else borrow.user.username)
-
-            # Add formulas for summing hours by person
-            row = 2
-            for name in distinct_names:
-                worksheet[f"F{row}"] = name
-                worksheet[f"G{row}"] = f'=SUMIFS(E:E, A:A, "{name}")'
-                row += 1
-
-            # Format the filename
-            today = datetime.date.today().strftime("%d_%m_%Y")
-            filename = f"{tool.name}_{today}.xlsx"
-
-            # Prepare the response
-            response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-            # Save the workbook to the response
-            workbook.save(response)
+
+            # Get all borrows for this tool, or the ones not exported yet, marked as exported by this export
+            batch, borrows = record_export(
+                tool_borrows(tool, start_date, end_date),
+                request.user,
+                start_date,
+                end_date,
+                pending_only=form.cleaned_data["pending_only"],
+            )
+
+            export_format = form.cleaned_data["format"]
+            if export_format != FORMAT_XLSX:
+                # Stream the rows as text while they are read from the database
+                return text_export_response(borrows, export_format, export_filename(tool, export_format), batch=batch)
+
+            try:
+                # Create a write-only Excel workbook, filled in a single pass on the borrows
+                workbook = write_borrows_workbook(borrows, summary=form.cleaned_data["summary"])
+
+                # Prepare the response, streamed from a temporary file if asked
+                response = workbook_response(
+                    workbook, export_filename(tool), stream=form.cleaned_data["stream"], batch=batch
+                )
+            except Exception:
+                # The borrows are not marked as exported by an export which was not delivered
+                cancel_export(batch)
+                raise
 
             return response
     return HttpResponse("Méthode non autorisée", status=405)
 
 
+class ToolsExportView(LoginRequiredMixin, UserPassesTestMixin, FormView):
+    """View to export to Excel the borrows of several AgriculturalTool, one sheet per tool"""
+
+    login_url = "/users/login/"
+    form_class = ToolsExportForm
+    template_name = "catalog/export_tools.html"
+
+    def test_func(self):
+        """Check if user is staff with UserPassesTestMixin"""
+        return self.request.user.is_staff
+
+    def form_valid(self, form):
+        start_date, end_date = form.cleaned_data["start_date"], form.cleaned_data["end_date"]
+        batch, borrows = record_export(
+            period_borrows(start_date, end_date, form.cleaned_data["tools"]),
+            self.request.user,
+            start_date,
+            end_date,
+            pending_only=form.cleaned_data["pending_only"],
+        )
+        export_format = form.cleaned_data["format"]
+        if export_format != FORMAT_XLSX:
+            # Stream the rows of all the tools as text, in the order of the sheets of the workbook
+            borrows = borrows.order_by("tool__name", "tool_id", "-date_borrow", "-start_time_borrow")
+            return text_export_response(
+                borrows, export_format, tools_export_filename(export_format), with_tool=True, batch=batch
+            )
+        try:
+            # Create a write-only Excel workbook, filled in a single pass on the borrows of all the tools
+            workbook = write_tools_workbook(borrows, summary=form.cleaned_data["summary"])
+            return workbook_response(workbook, tools_export_filename(), stream=form.cleaned_data["stream"], batch=batch)
+        except Exception:
+            # The borrows are not marked as exported by an export which was not delivered
+            cancel_export(batch)
+            raise
+
+
+@login_required
+def export_job_create(request, tool_id):
+    """Function to ask for an export of the borrows of a tool, built in the background"""
+    if request.method != 'POST':
+        return HttpResponse("Méthode non autorisée", status=405)
+
+    tool = get_exported_tool(request, tool_id)
+    form = DateRangeForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, "Les dates de l'export ne sont pas valides.")
+    elif not can_create_job(request.user):
+        messages.error(request, "Vous avez déjà des exports en cours de préparation. Merci d'attendre leur fin.")
+    else:
+        ExportJob.objects.create(
+            user=request.user,
+            tool=tool,
+            start_date=form.cleaned_data['start_date'],
+            end_date=form.cleaned_data['end_date'],
+            summary=form.cleaned_data['summary'],
+            format=form.cleaned_data['format'],
+            pending_only=form.cleaned_data['pending_only'],
+        )
+        messages.success(request, "L'export est en préparation. Le lien de téléchargement apparaîtra sur cette page.")
+    return redirect("catalog:tool_detail", pk=tool.id)
+
+
+@login_required
+def export_job_status(request, pk):
+    """Function returning the status of an export job of the connected user"""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    data = {"status": job.status, "label": job.get_status_display(), "download_url": None}
+    if job.status == ExportJob.Status.DONE:
+        data["download_url"] = reverse("catalog:export_job_download", kwargs={"pk": job.pk})
+    return JsonResponse(data)
+
+
+@login_required
+def export_job_download(request, pk):
+    """Function to download the file built by an export job of the connected user"""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user, status=ExportJob.Status.DONE)
+    content_type = TEXT_CONTENT_TYPES.get(job.format, EXCEL_CONTENT_TYPE)
+    return FileResponse(job.file.open("rb"), as_attachment=True, filename=job.filename, content_type=content_type)
+
+
 # @login_required
@@ -0,0 +1,30 @@
+"""SQLite backend of the project, starting its transactions in the mode set by the SQLITE_TRANSACTION_MODE setting"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+# Modes of the BEGIN statement of SQLite
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+def transaction_mode():
+    """Return the mode of the transactions set by SQLITE_TRANSACTION_MODE, or None to keep the default of SQLite"""
+    mode = (getattr(settings, "SQLITE_TRANSACTION_MODE", None) or "").upper()
+    if mode and mode not in TRANSACTION_MODES:
+        raise ImproperlyConfigured(f"Invalid SQLite transaction mode: {mode}")
+    return mode or None
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite connection starting its transactions with `BEGIN <mode>`.
+
+    Django only accepts the `transaction_mode` option from 5.1, so the statement is run here, as Django 5.1 does,
+    for the versions of Django the project supports.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        mode = transaction_mode()
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
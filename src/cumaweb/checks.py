@@ -0,0 +1,39 @@
+"""Checks of the configuration of the project, run by the management commands and at the startup of the servers"""
+
+import logging
+
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+logger = logging.getLogger(__name__)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    """
+    Warn when the cache is kept in the memory of each process. The accessible tools, the versions of the fragments
+    and the ETags of the API would then only change in the process which saved the data, and the other processes
+    would serve stale pages and answer 304 Not Modified to clients whose data changed.
+    """
+    if not isinstance(caches["default"], LocMemCache):
+        return []
+    return [
+        checks.Warning(
+            "The cache is kept in the memory of each process, so the changes made by a process are not seen by "
+            "the others.",
+            hint="Use the default CUMAWEB_CACHE_BACKEND=file, or a shared cache, unless the server runs a single "
+            "process.",
+            id="cumaweb.W001",
+        )
+    ]
+
+
+def check_on_startup():
+    """
+    Log the warnings of the cache checks, which the servers do not run. Called by the WSGI and ASGI modules once
+    the application is loaded.
+    """
+    for message in checks.run_checks(tags=[checks.Tags.caches]):
+        logger.warning("%s", message)
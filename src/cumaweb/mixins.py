@@ -0,0 +1,56 @@
+"""
+Access mixins and generic views of the async class-based views, the mixins of Django only checking the user
+of sync views
+"""
+
+from typing import Any
+
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.views.generic import ListView
+
+
+async def load_user(request):
+    """
+    Fetch the user of the request without blocking the event loop, and set it as `request.user`.
+
+    `request.user` would otherwise fetch the user again from a sync context, when read by the view or the templates.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """Verify that the current user of an async view is authenticated"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await load_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncUserPassesTestMixin(UserPassesTestMixin):
+    """Deny a request to an async view when the user fails the sync test of `test_func`"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        await load_user(request)
+        if not self.get_test_func()():
+            return self.handle_no_permission()
+        return await super(UserPassesTestMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncListView(ListView):
+    """ListView whose list is read with the async ORM, served without a thread by an ASGI server"""
+
+    async def aget_queryset(self):
+        """Return the list of items displayed by the view, read before rendering the page"""
+        return [item async for item in self.get_queryset()]
+
+    async def aget_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        """Return the context of the page, with the data read from the database and the cache by the async ORM"""
+        return self.get_context_data(**kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        context = await self.aget_context_data()
+        return self.render_to_response(context)
@@ -82,11 +82,27 @@ WSGI_APPLICATION = "cumaweb.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        # SQLite backend of Django, starting the transactions in the mode of SQLITE_TRANSACTION_MODE
+        "ENGINE": "cumaweb.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
 
+# Take the write lock when a transaction starts, so that it waits for the busy timeout instead of failing with
+# "database is locked" when it writes after reading. An empty value keeps the deferred transactions of SQLite.
+SQLITE_TRANSACTION_MODE = os.environ.get("CUMAWEB_SQLITE_TRANSACTION_MODE", "IMMEDIATE")
+
+# PRAGMA statements run by cumaweb.sqlite on each new SQLite connection, an empty value leaves the default of SQLite.
+# The write-ahead log lets the pages be read while a borrow is written, the busy timeout (in milliseconds) makes the
+# writers wait for each other, and the database is read through a memory map and a page cache (in KiB when negative).
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("CUMAWEB_SQLITE_JOURNAL_MODE", "WAL"),
+    "busy_timeout": os.environ.get("CUMAWEB_SQLITE_BUSY_TIMEOUT", "5000"),
+    "synchronous": os.environ.get("CUMAWEB_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": os.environ.get("CUMAWEB_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.environ.get("CUMAWEB_SQLITE_CACHE_SIZE", "-20000"),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -124,9 +140,56 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (images of the tools and their resized variants)
+
+MEDIA_URL = "media/"
+
+MEDIA_ROOT = os.environ.get("DJANGO_MEDIA_ROOT", BASE_DIR / "media")
+
+# Cache of the accessible tools, the usage dashboards and the rendered fragments of the pages.
+# "file", the default, keeps it in a directory shared by the processes of the server and by the commands, which is
+# needed for the changes made by one process to be seen by the others. "locmem" keeps it in the memory of each
+# process, for a server running a single process. A backend path can also be given.
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+}
+
+CACHE_BACKEND = os.environ.get("CUMAWEB_CACHE_BACKEND", "file")
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        "LOCATION": os.environ.get(
+            "CUMAWEB_CACHE_LOCATION", BASE_DIR / "cache" if CACHE_BACKEND == "file" else "cumaweb"
+        ),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("CUMAWEB_CACHE_MAX_ENTRIES", 10000))},
+    }
+}
+
+# Time in seconds during which a rendered fragment of a page is kept, the changes of the tools, borrows and
+# accesses render it again sooner
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get("CUMAWEB_FRAGMENT_CACHE_TIMEOUT", 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_REDIRECT_URL = 'catalog:index'
+
+
+# Exports built in the background by the `run_export_worker` command
+
+# Number of export jobs a user can have waiting or running at the same time
+EXPORT_JOBS_MAX_ACTIVE_PER_USER = int(os.environ.get("CUMAWEB_EXPORT_JOBS_MAX_ACTIVE_PER_USER", 2))
+
+# Number of days during which the built exports can be downloaded
+EXPORT_JOBS_RETENTION_DAYS = int(os.environ.get("CUMAWEB_EXPORT_JOBS_RETENTION_DAYS", 7))
+
+# Time in seconds after which a running export is considered as interrupted
+EXPORT_JOBS_TIMEOUT = int(os.environ.get("CUMAWEB_EXPORT_JOBS_TIMEOUT", 3600))
+
+# Compile the templates, resolve the URLs and import the heavy modules when the server loads the application
+WARMUP_ON_STARTUP = os.environ.get("CUMAWEB_WARMUP", "1") != "0"
@@ -0,0 +1,31 @@
+"""Tuning of the SQLite connections, for the writes of several processes at the same time"""
+
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Names and values accepted in the PRAGMA statements, which cannot be given as parameters of a query
+PRAGMA_RE = re.compile(r"-?\w+")
+
+
+def configure_connection(connection, pragmas):
+    """Run a PRAGMA statement on a new SQLite connection for each name and value, skipping the empty values"""
+    for name, value in pragmas.items():
+        value = "" if value is None else str(value)
+        if not value:
+            continue
+        if not PRAGMA_RE.fullmatch(name) or not PRAGMA_RE.fullmatch(value):
+            raise ImproperlyConfigured(f"Invalid SQLite pragma: {name} = {value}")
+        # Run on the driver connection, so that the statements are not counted as queries of a request
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def sqlite_connection_created(sender, connection, **kwargs):
+    """Apply the SQLITE_PRAGMAS setting to each new SQLite connection"""
+    if connection.vendor == "sqlite":
+        configure_connection(connection, getattr(settings, "SQLITE_PRAGMAS", {}))
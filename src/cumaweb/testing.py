@@ -0,0 +1,77 @@
+"""Helpers shared by the unit tests of the applications"""
+
+import re
+from collections import Counter
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def capture_queries(action):
+    """Run the action and return its result with the SQL of the queries it ran"""
+    with CaptureQueriesContext(connection) as context:
+        result = action()
+    return result, [query["sql"] for query in context.captured_queries]
+
+
+def query_shape(sql):
+    """Return the SQL of a query without its values, so that the same query run for each row is recognised"""
+    return re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", "?", sql)
+
+
+def format_queries(queries):
+    """Return a report of the queries, the repeated ones first with their number of runs"""
+    shapes = Counter(query_shape(sql) for sql in queries)
+    lines = [f"{count} x {shape}" for shape, count in shapes.most_common()]
+    return "\n".join(lines)
+
+
+class QueryBudgetMixin:
+    """
+    Mixin for a TestCase checking that the number of queries run by routes does not grow with the data.
+
+    The test case defines `seed(count)`, adding `count` more rows of each kind to the database. Each route
+    is requested after seeding the data of each size of `seed_sizes`, and must run the same number of
+    queries every time.
+    """
+
+    seed_sizes = (2, 10)
+
+    def seed(self, count):
+        """Add `count` more rows of each kind to the database"""
+        raise NotImplementedError
+
+    def prepare_request(self):
+        """Prepare the client before each request, called outside of the counted queries"""
+
+    def assertRoutesCovered(self, urlconf, routes):
+        """Check every named url of the urlconf module has a route in the budget"""
+        names = {pattern.name for pattern in urlconf.urlpatterns if pattern.name}
+        self.assertEqual(names - set(routes), set(), "Routes without query budget")
+
+    def assertQueryBudget(self, routes):
+        """
+        Check the number of queries of each route does not grow with the data.
+
+        `routes` maps the name of each route to a function requesting it with the client and returning
+        the response. The failure message lists the queries of the routes over budget.
+        """
+        runs = {name: [] for name in routes}
+        seeded = 0
+        for size in self.seed_sizes:
+            self.seed(size - seeded)
+            seeded = size
+            for name, request in routes.items():
+                self.prepare_request()
+                response, queries = capture_queries(request)
+                self.assertLess(response.status_code, 400, f"Route {name} failed with {response.status_code}")
+                runs[name].append(queries)
+
+        failures = []
+        for name, queries in runs.items():
+            counts = [len(run) for run in queries]
+            if len(set(counts)) > 1:
+                sizes = ", ".join(f"{count} queries for {size} rows" for count, size in zip(counts, self.seed_sizes))
+                failures.append(f"Route {name}: {sizes}\n{format_queries(queries[-1])}")
+        if failures:
+            self.fail("The number of queries grows with the data:\n\n" + "\n\n".join(failures))
@@ -0,0 +1,142 @@
+"""Warm-up of a process of the application, so that its first requests are not slowed down by the startup costs"""
+
+import importlib
+import logging
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.urls import NoReverseMatch, Resolver404, get_resolver, resolve, reverse
+
+
+logger = logging.getLogger(__name__)
+
+# Modules imported by the exports, imports and images, slow to import on the first request using them
+WARMUP_MODULES = ("openpyxl", "PIL.Image")
+
+# Extensions of the files compiled as templates
+TEMPLATE_EXTENSIONS = (".html", ".txt")
+
+# Value given to each argument of the URLs resolved, valid for the converters used by the applications,
+# and values of the arguments restricted to some values, such as the applications listed by the admin
+URL_ARGUMENT = 1
+URL_ARGUMENTS = {"app_label": "auth"}
+
+
+class WarmupStep(NamedTuple):
+    """Result of a step of the warm-up"""
+
+    name: str
+    count: int
+    seconds: float
+    errors: list
+
+
+def project_template_dirs():
+    """Return the template directories of the project and of its applications, not the ones of Django"""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    dirs = []
+    for loader in engines["django"].engine.template_loaders:
+        for inner_loader in getattr(loader, "loaders", [loader]):
+            for directory in inner_loader.get_dirs():
+                directory = Path(directory).resolve()
+                if directory.is_relative_to(base_dir) and directory not in dirs:
+                    dirs.append(directory)
+    return dirs
+
+
+def warm_templates():
+    """
+    Compile every template of the project, so that they are kept by the cached loader of the process.
+
+    Return the number of templates compiled and the errors of the templates which cannot be compiled.
+    """
+    engine = engines["django"]
+    count, errors = 0, []
+    for directory in project_template_dirs():
+        for path in sorted(directory.rglob("*")):
+            if path.suffix not in TEMPLATE_EXTENSIONS:
+                continue
+            name = path.relative_to(directory).as_posix()
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as error:
+                errors.append(f"{name}: {error}")
+            else:
+                count += 1
+    return count, errors
+
+
+def url_names(resolver=None, namespace=""):
+    """Yield the full name of each named URL of the resolver and of its namespaces, with the names of its arguments"""
+    resolver = resolver or get_resolver()
+    for name, patterns in resolver.reverse_dict.lists():
+        if isinstance(name, str):
+            possibilities = patterns[0][0]
+            yield f"{namespace}{name}", possibilities[0][1]
+    for sub_namespace, (_, sub_resolver) in resolver.namespace_dict.items():
+        yield from url_names(sub_resolver, f"{namespace}{sub_namespace}:")
+
+
+def warm_urls():
+    """
+    Reverse then resolve every named URL, so that the resolver is populated and the patterns are compiled.
+
+    Return the number of URLs resolved and the names of the ones which cannot be reversed with sample arguments.
+    """
+    count, errors = 0, []
+    for name, arguments in sorted(dict(url_names()).items()):
+        try:
+            resolve(reverse(name, kwargs={argument: URL_ARGUMENTS.get(argument, URL_ARGUMENT) for argument in arguments}))
+        except (NoReverseMatch, Resolver404):
+            errors.append(name)
+        else:
+            count += 1
+    return count, errors
+
+
+def warm_modules():
+    """Import the heavy modules used by some pages, with the image plugins of Pillow. Return their number."""
+    for module in WARMUP_MODULES:
+        importlib.import_module(module)
+    from PIL import Image
+
+    Image.init()
+    return len(WARMUP_MODULES), []
+
+
+WARMUP_STEPS = (
+    ("templates", warm_templates),
+    ("urls", warm_urls),
+    ("modules", warm_modules),
+)
+
+
+def warmup():
+    """Run each step of the warm-up and return its result, with the time it took"""
+    results = []
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        count, errors = step()
+        results.append(WarmupStep(name, count, time.perf_counter() - start, errors))
+    return results
+
+
+def warmup_on_startup():
+    """
+    Warm up the process serving the application, unless CUMAWEB_WARMUP is set to 0.
+
+    Called by the WSGI and ASGI modules once the application is loaded. When the server loads the application
+    before forking its workers, as `gunicorn --preload` does, the workers start already warmed up.
+    """
+    if not settings.WARMUP_ON_STARTUP:
+        return
+    try:
+        for step in warmup():
+            logger.info("Warm-up of %s: %d in %.3f s", step.name, step.count, step.seconds)
+            for error in step.errors:
+                logger.warning("Warm-up of %s failed for %s", step.name, error)
+    except Exception:  # the server starts even if the warm-up fails
+        logger.exception("Warm-up failed")
@@ -15,3 +15,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cumaweb.settings")
 
 application = get_wsgi_application()
+
+# Warn about a cache not shared by the processes, and pay the startup costs before the first request, rather
+# than during it
+from cumaweb.checks import check_on_startup  # noqa: E402
+from cumaweb.warmup import warmup_on_startup  # noqa: E402
+
+
+check_on_startup()
+warmup_on_startup()
@@ -1,9 +1,16 @@
 """Unit tests for users application"""
+import datetime
+
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from catalog.models import AgriculturalTool, BorrowTool
+from cumaweb.testing import QueryBudgetMixin
+
+from . import urls as users_urls
 from .forms import CustomUserCreationForm, CustomUserEditForm
+from .views import UserListView
 
 # Models
 
@@ -239,3 +246,62 @@ class UsersViewTest(TestCase):
             response = self.client.get(reverse(url_name, kwargs=kwargs_dict))
             self.assertEqual(response.status_code, 200)
             self.assertTemplateUsed(response, template)
+
+
+class UserListViewTest(TestCase):
+    """Unit tests for the list of users served with the async ORM"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="adminpassword", is_staff=True)
+        cls.member = User.objects.create_user(username="member", password="memberpassword")
+
+    def test_admin_only(self):
+        """Test only the admins can list the users"""
+        self.assertTrue(UserListView.view_is_async)
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse("users:listUser")).status_code, 403)
+
+    async def test_async_client(self):
+        """Test the users are listed when requested through the ASGI handler"""
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse("users:listUser"))
+        self.assertContains(response, "member")
+        self.assertEqual(len(response.context["users"]), 2)
+
+
+class UsersQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Check the number of queries of each route of users application does not grow with the data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(username="superuser", password="superpassword")
+        cls.test_user = User.objects.create_user(username="testuser", password="testpassword")
+        cls.member_count = 0
+
+    def seed(self, count):
+        """Add members, each in charge of a tool borrowed by the test user"""
+        for _ in range(count):
+            self.member_count += 1
+            member = User.objects.create(username=f"member{self.member_count}")
+            tool = AgriculturalTool.objects.create(name=f"Outil {self.member_count}", description="Outil", user=member)
+            BorrowTool.objects.create(
+                tool=tool, user=self.test_user, date_borrow=datetime.date.today(), start_time_borrow=0, end_time_borrow=1
+            )
+            AgriculturalTool.objects.create(name=f"Outil {self.member_count}", description="Outil", user=self.test_user)
+
+    def prepare_request(self):
+        self.client.force_login(self.superuser)
+
+    def test_query_budget(self):
+        """Test every route runs the same number of queries whatever the number of rows"""
+        routes = {
+            "login": lambda: self.client.get(reverse("users:login")),
+            "createUser": lambda: self.client.get(reverse("users:createUser")),
+            "listUser": lambda: self.client.get(reverse("users:listUser")),
+            "userEdit": lambda: self.client.get(reverse("users:userEdit", kwargs={"pk": self.test_user.id})),
+            "userDelete": lambda: self.client.get(reverse("users:userDelete", kwargs={"pk": self.test_user.id})),
+            "logout": lambda: self.client.post(reverse("users:logout")),
+        }
+        self.assertRoutesCovered(users_urls, routes)
+        self.assertQueryBudget(routes)
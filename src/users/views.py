@@ -7,9 +7,10 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, DeleteView, ListView, UpdateView
+from django.views.generic import CreateView, DeleteView, UpdateView
 
 from catalog.models import AgriculturalTool, BorrowTool
+from cumaweb.mixins import AsyncListView, AsyncUserPassesTestMixin
 
 from .forms import CustomUserCreationForm, CustomUserEditForm
 
@@ -40,8 +41,8 @@ class CreateUserView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         return super().form_invalid(form)
 
 
-class UserListView(UserPassesTestMixin, ListView):
-    """View to list all users"""
+class UserListView(AsyncUserPassesTestMixin, AsyncListView):
+    """View to list all users, read with the async ORM"""
 
     model = User
     template_name = "users/user_list.html"
@@ -79,7 +80,7 @@ class UserDeleteView(UserPassesTestMixin, DeleteView):
 
         # Vérifier les dépendances
         tools_responsible = AgriculturalTool.objects.filter(user=user_to_delete)
-        borrowings = BorrowTool.objects.filter(user=user_to_delete)
+        borrowings = BorrowTool.objects.filter(user=user_to_delete).select_related("tool").order_by("-date_borrow")
 
         context["tools_responsible"] = tools_responsible
         context["borrowings"] = borrowings